@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+"""
+Caches /homes and /trends responses. Data only changes when a scrape session is loaded, so entries are tagged with the
+counties their homes are in and dropped when load.py reports that county was ingested
+
+Pages with no homes are tagged with ANY_COUNTY, those are dropped on every ingest. A radius that crosses a
+county line can still be stale until the ttl runs out if only the other county is ingested
+
+configured with env vars
+    CACHE_BACKEND - lru or none, defaults to lru
+    CACHE_MAX_ENTRIES - defaults to 10000
+    CACHE_MAX_BYTES - defaults to 256MB
+    CACHE_TTL_SECONDS - defaults to 3600
+    CACHE_INVALIDATE_TOKEN - /cache/invalidate requires it in the X-Cache-Token header, without it the endpoint is off
+"""
+
+ANY_COUNTY = "*"
+
+# the request's exact parameters, (lat, lng, r, address, year_start, year_end, cursor, limit). Rounding them would
+# hand 1 location's page to its neighbors, whose radius covers other homes
+CacheKey = Tuple
+
+def county_tag(name: str, state: str) -> str:
+    return f"{name}|{state}"
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: CacheKey, value: bytes, tags: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def invalidate(self, tag: str) -> int:
+        """
+        Drops every entry with the tag and every ANY_COUNTY entry, returns how many were dropped
+        """
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+class NoCache(CacheBackend):
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        return None
+
+    def set(self, key: CacheKey, value: bytes, tags: Iterable[str]):
+        pass
+
+    def invalidate(self, tag: str) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+class LRUCache(CacheBackend):
+    """
+    In process cache bounded by entry count and total bytes, least recently used entries are evicted first
+    """
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, value, tags)
+        self.entries: OrderedDict[CacheKey, Tuple[float, bytes, Set[str]]] = OrderedDict()
+        self.keys_by_tag: Dict[str, Set[CacheKey]] = {}
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            (expires_at, value, _) = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: CacheKey, value: bytes, tags: Iterable[str]):
+        if len(value) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            tags = set(tags)
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+            self.size_bytes += len(value)
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+
+            while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                (oldest_key, _) = next(iter(self.entries.items()))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, tag: str) -> int:
+        with self.lock:
+            keys = self.keys_by_tag.get(tag, set()) | self.keys_by_tag.get(ANY_COUNTY, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: CacheKey):
+        (_, value, tags) = self.entries.pop(key)
+        self.size_bytes -= len(value)
+        for tag in tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self.keys_by_tag[tag]
+
+def create_cache() -> CacheBackend:
+    backend = os.environ.get("CACHE_BACKEND", "lru")
+    if backend == "none":
+        return NoCache()
+    if backend == "lru":
+        return LRUCache(
+            max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.environ.get("CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttl_seconds=float(os.environ.get("CACHE_TTL_SECONDS", "3600")),
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND {backend}")
+
+def check_invalidate_token(token: Optional[str]) -> Optional[bool]:
+    """
+    None if invalidation is off, CACHE_INVALIDATE_TOKEN isn't set, otherwise whether token matches it
+    """
+    expected = os.environ.get("CACHE_INVALIDATE_TOKEN")
+    if not expected:
+        return None
+    return token is not None and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
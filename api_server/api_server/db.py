@@ -0,0 +1,38 @@
+import os
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+"""
+One async engine is shared by every request, it is created when the app starts and disposed when it stops
+
+configured with env vars
+    DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+    DB_POOL_SIZE - connections kept open, defaults to 10
+    DB_MAX_OVERFLOW - extra connections opened under load, defaults to 20
+    DB_POOL_TIMEOUT - seconds to wait for a free connection, defaults to 30
+    DB_STATEMENT_TIMEOUT_MS - queries running longer than this are cancelled by postgres, defaults to 5000
+"""
+
+def get_url() -> URL:
+    return URL.create(
+        "postgresql+asyncpg",
+        username=os.environ.get("DB_USER", "trends"),
+        password=os.environ.get("DB_PASSWORD", "example"),
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=int(os.environ["DB_PORT"]) if "DB_PORT" in os.environ else None,
+        database=os.environ.get("DB_NAME", "trends"),
+    )
+
+def create_engine() -> AsyncEngine:
+    return create_async_engine(
+        get_url(),
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        pool_pre_ping=True,
+        connect_args={
+            "server_settings": {
+                "statement_timeout": os.environ.get("DB_STATEMENT_TIMEOUT_MS", "5000"),
+            },
+        },
+    )
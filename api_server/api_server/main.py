@@ -1,8 +1,34 @@
-from typing import Union
+from contextlib import asynccontextmanager
+import os
+from typing import AsyncIterator, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-app = FastAPI()
+from api_server.cache import check_invalidate_token, create_cache, county_tag, ANY_COUNTY
+from api_server.db import create_engine
+from api_server.queries import (
+    build_homes_query, build_trends_query, stream_page, to_trends, DEFAULT_LIMIT, MAX_LIMIT, MAX_RADIUS_MILES
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.cache = create_cache()
+    snapshot_path = os.environ.get("HOMES_SNAPSHOT")
+    if snapshot_path:
+        # imported only in snapshot mode, it needs numpy
+        from api_server.snapshot import Snapshot
+        app.state.snapshot = Snapshot(snapshot_path)
+        app.state.engine = None
+        yield
+        return
+
+    app.state.snapshot = None
+    app.state.engine = create_engine()
+    yield
+    await app.state.engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 """
 
@@ -17,20 +43,149 @@ get houses near a location in a year in a range of years
 Get a house's information
 /homes/encoded_address?year_start=&year_end&r=
 
-r - radius in miles
+r - radius in miles, at most MAX_RADIUS_MILES
+
+both return a page of homes, pass next_cursor back as cursor to get the next page
+{ "homes": [...], "next_cursor": "..." }
+
+How prices moved near a location, answered from precomputed per grid cell per year aggregates
+/trends?lat=&lng=&r=&year_start=&year_end=
+{ "years": [{"year_assessed", "count", "mean", "median"}, ...], "change": {...}, "cells": [...] }
+
+Responses are cached until the counties in them are ingested again
+/cache/stats - hit, miss and eviction counters
+/cache/invalidate?county=&state= - called by load.py after it ingests a county, with CACHE_INVALIDATE_TOKEN in the
+    X-Cache-Token header
+
+With HOMES_SNAPSHOT set to a snapshot exported by snapshot.py, /homes is served from the memory mapped snapshot
+instead of postgres, without the cache. /trends needs the database
 """
 
+def query_snapshot(request: Request, limit: int, **filters) -> Response:
+    from api_server.snapshot import iter_rows
+
+    try:
+        rows = request.app.state.snapshot.homes(limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(stream_page(iter_rows(rows), limit), media_type="application/json")
+
+async def query_homes(request: Request, limit: int, **filters) -> Response:
+    if request.app.state.snapshot is not None:
+        return query_snapshot(request, limit, **filters)
+
+    if filters.get("address") is not None:
+        filters["address"] = filters["address"].lower()
+
+    cache = request.app.state.cache
+    cache_key = tuple(sorted(filters.items())) + (("limit", limit),)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
+    try:
+        (query, params) = build_homes_query(limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # run the query before responding so database errors still get an error status,
+    # the connection goes back to the pool once the last row is written
+    conn = await request.app.state.engine.connect()
+    try:
+        rows = await conn.stream(query, params)
+    except Exception:
+        await conn.close()
+        raise
+
+    async def body() -> AsyncIterator[str]:
+        chunks = []
+        counties = set()
+        try:
+            async for chunk in stream_page(rows, limit, counties):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await conn.close()
+
+        tags = [county_tag(name, state) for (name, state) in counties] or [ANY_COUNTY]
+        cache.set(cache_key, "".join(chunks).encode('utf-8'), tags)
+
+    return StreamingResponse(body(), media_type="application/json", headers={"X-Cache": "MISS"})
+
 @app.get("/homes")
-def homes(year_start: Union[int, None] = None,
+async def homes(request: Request,
+        year_start: Union[int, None] = None,
         year_end: Union[int, None] = None,
         address: Union[str, None] = None,
-        lat: Union[str, None] = None,
-        lng: Union[str, None] = None,
-        r: Union[int, None] = None):
-    print(locals().values())
-    return []
+        lat: Union[float, None] = None,
+        lng: Union[float, None] = None,
+        r: Union[float, None] = Query(default=None, gt=0, le=MAX_RADIUS_MILES),
+        cursor: Union[str, None] = None,
+        limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    has_location = lat is not None and lng is not None and r is not None
+    if not has_location and address is None:
+        raise HTTPException(status_code=400, detail="Either lat, lng and r or address are required")
+
+    return await query_homes(
+        request,
+        limit,
+        lat=lat,
+        lng=lng,
+        r=r,
+        address=address if not has_location else None,
+        year_start=year_start,
+        year_end=year_end,
+        cursor=cursor)
 
 @app.get("/homes/{address}")
-def homes(address: str, year_start: Union[int, None] = None, year_end: Union[int, None] = None):
-    print(locals().values())
-    return []
+async def home(request: Request,
+        address: str,
+        year_start: Union[int, None] = None,
+        year_end: Union[int, None] = None,
+        cursor: Union[str, None] = None,
+        limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    return await query_homes(
+        request, limit, address=address, year_start=year_start, year_end=year_end, cursor=cursor)
+
+@app.get("/trends")
+async def trends(request: Request,
+        lat: float,
+        lng: float,
+        r: float = Query(gt=0, le=MAX_RADIUS_MILES),
+        year_start: Union[int, None] = None,
+        year_end: Union[int, None] = None):
+    if request.app.state.snapshot is not None:
+        raise HTTPException(status_code=501, detail="/trends needs the database, it isn't served from a snapshot")
+
+    cache = request.app.state.cache
+    cache_key = ("trends", lat, lng, r, year_start, year_end)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
+    (query, params) = build_trends_query(lat, lng, r, year_start, year_end)
+    async with request.app.state.engine.connect() as conn:
+        rows = (await conn.execute(query, params)).all()
+
+    body = to_trends(rows)
+    response = JSONResponse(content=body, headers={"X-Cache": "MISS"})
+    tags = [county_tag(c["county"]["name"], c["county"]["state"]) for c in body["cells"]] or [ANY_COUNTY]
+    cache.set(cache_key, response.body, set(tags))
+    return response
+
+@app.get("/cache/stats")
+async def cache_stats(request: Request):
+    return request.app.state.cache.stats()
+
+@app.post("/cache/invalidate")
+async def cache_invalidate(
+        request: Request,
+        county: str,
+        state: str,
+        x_cache_token: Union[str, None] = Header(default=None)):
+    allowed = check_invalidate_token(x_cache_token)
+    if allowed is None:
+        raise HTTPException(status_code=403, detail="Cache invalidation is off, set CACHE_INVALIDATE_TOKEN to enable it")
+    if not allowed:
+        raise HTTPException(status_code=401, detail="Missing or wrong X-Cache-Token")
+    return {"invalidated": request.app.state.cache.invalidate(county_tag(county, state))}
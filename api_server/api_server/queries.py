@@ -0,0 +1,257 @@
+import base64
+import json
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import text, TextClause
+
+"""
+Queries against premise_details. Results are ordered by (year_assessed, id) and paged with a keyset cursor,
+the cursor is the sort key of the last row of the previous page, so later pages cost the same as the first
+
+radius queries use ST_DWithin on the gist index over premise_location, address lookups use the
+lower(premise_address) index
+
+/trends reads trend_aggregates, stats per county grid cell per year kept by trend_aggregates.py when sessions load
+"""
+
+METERS_PER_MILE = 1609.344
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# radius queries read every home in the radius before paging
+MAX_RADIUS_MILES = 100.0
+
+HOMES_SELECT = """
+SELECT
+    p.id,
+    p.premise_address,
+    p.year_assessed,
+    p.dollar_value,
+    p.parcel_number,
+    p.sq_feet,
+    p.year_built,
+    p.bed_count,
+    p.bath_count,
+    ST_Y(p.premise_location::geometry) AS lat,
+    ST_X(p.premise_location::geometry) AS lng,
+    c.name AS county_name,
+    c.state AS county_state,
+    ARRAY(SELECT u.url FROM assessment_urls u WHERE u.premise_id = p.id) AS assessment_urls
+FROM premise_details p
+JOIN county c ON c.id = p.county_id
+"""
+
+def encode_cursor(year_assessed: int, premise_id: str) -> str:
+    raw = json.dumps([year_assessed, str(premise_id)]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        (year_assessed, premise_id) = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (int(year_assessed), str(premise_id))
+    except Exception:
+        raise ValueError(f"Invalid cursor {cursor}")
+
+def build_homes_query(
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        r: Optional[float] = None,
+        address: Optional[str] = None,
+        year_start: Optional[int] = None,
+        year_end: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_LIMIT) -> Tuple[TextClause, dict]:
+    """
+    Returns the query and its params. Fetches 1 extra row to tell if there is a next page
+    """
+    where = []
+    params = {"limit": min(limit, MAX_LIMIT) + 1}
+
+    if lat is not None and lng is not None and r is not None:
+        where.append(
+            "ST_DWithin(p.premise_location, "
+            "ST_SetSRID(ST_MakePoint(CAST(:lng AS float8), CAST(:lat AS float8)), 4326)::geography, "
+            "CAST(:meters AS float8))"
+        )
+        params.update({"lat": lat, "lng": lng, "meters": r * METERS_PER_MILE})
+
+    if address is not None:
+        where.append("lower(p.premise_address) = lower(CAST(:address AS text))")
+        params["address"] = address
+
+    if year_start is not None:
+        where.append("p.year_assessed >= CAST(:year_start AS integer)")
+        params["year_start"] = year_start
+
+    if year_end is not None:
+        where.append("p.year_assessed <= CAST(:year_end AS integer)")
+        params["year_end"] = year_end
+
+    if cursor is not None:
+        (after_year, after_id) = decode_cursor(cursor)
+        where.append("(p.year_assessed, p.id) > (CAST(:after_year AS integer), CAST(:after_id AS uuid))")
+        params.update({"after_year": after_year, "after_id": after_id})
+
+    sql = HOMES_SELECT
+    if len(where) > 0:
+        sql += "WHERE " + " AND ".join(where) + "\n"
+    sql += "ORDER BY p.year_assessed, p.id\nLIMIT :limit"
+
+    return (text(sql), params)
+
+def to_home(row) -> dict:
+    """
+    Shapes a row like the PremiseDetails the parsers produce
+    """
+    return {
+        "assessment_urls": list(row.assessment_urls or []),
+        "premise_address": row.premise_address,
+        "year_assessed": row.year_assessed,
+        "dollar_value": row.dollar_value,
+        "county": {"name": row.county_name, "state": row.county_state},
+        "premise_location": {"lat": row.lat, "lng": row.lng},
+        "parcel_number": row.parcel_number,
+        "sq_feet": row.sq_feet,
+        "year_built": row.year_built,
+        "bed_count": row.bed_count,
+        "bath_count": row.bath_count,
+    }
+
+async def stream_page(rows: AsyncIterator, limit: int, counties: Optional[Set[Tuple[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Writes the page as json while rows arrive from the database instead of building it in memory first,
+    the query fetches 1 row past the limit, which only sets next_cursor
+
+    if counties is provided, the (name, state) of every home's county is added to it
+    """
+    limit = min(limit, MAX_LIMIT)
+    count = 0
+    last = None
+    next_cursor = None
+
+    yield '{"homes":['
+    async for row in rows:
+        if count == limit:
+            next_cursor = encode_cursor(last.year_assessed, last.id)
+            break
+        if count > 0:
+            yield ','
+        yield json.dumps(to_home(row))
+        if counties is not None:
+            counties.add((row.county_name, row.county_state))
+        last = row
+        count += 1
+    yield f'],"next_cursor":{json.dumps(next_cursor)}}}'
+
+TRENDS_SELECT = """
+SELECT
+    t.cell_row,
+    t.cell_col,
+    t.year_assessed,
+    t.cell_miles,
+    ST_Y(t.cell_center::geometry) AS lat,
+    ST_X(t.cell_center::geometry) AS lng,
+    t.count,
+    t.mean,
+    t.median,
+    t.p10,
+    t.p25,
+    t.p75,
+    t.p90,
+    c.name AS county_name,
+    c.state AS county_state
+FROM trend_aggregates t
+JOIN county c ON c.id = t.county_id
+"""
+
+def build_trends_query(
+        lat: float,
+        lng: float,
+        r: float,
+        year_start: Optional[int] = None,
+        year_end: Optional[int] = None) -> Tuple[TextClause, dict]:
+    """
+    Reads the precomputed aggregates of every grid cell whose center is within r miles, 1 row per cell per year,
+    so the cost grows with the number of cells and years rather than the number of homes
+    """
+    where = [
+        "ST_DWithin(t.cell_center, "
+        "ST_SetSRID(ST_MakePoint(CAST(:lng AS float8), CAST(:lat AS float8)), 4326)::geography, "
+        "CAST(:meters AS float8))"
+    ]
+    params = {"lat": lat, "lng": lng, "meters": r * METERS_PER_MILE}
+
+    if year_start is not None:
+        where.append("t.year_assessed >= CAST(:year_start AS integer)")
+        params["year_start"] = year_start
+
+    if year_end is not None:
+        where.append("t.year_assessed <= CAST(:year_end AS integer)")
+        params["year_end"] = year_end
+
+    sql = TRENDS_SELECT + "WHERE " + " AND ".join(where) + "\n"
+    sql += "ORDER BY t.year_assessed, c.state, c.name, t.cell_row, t.cell_col"
+    return (text(sql), params)
+
+def weighted_median(values: List[float], weights: List[int]) -> float:
+    pairs = sorted(zip(values, weights))
+    half = sum(weights) / 2
+    seen = 0
+    for (value, weight) in pairs:
+        seen += weight
+        if seen >= half:
+            return value
+    return pairs[-1][0]
+
+def to_trends(rows: Iterable) -> dict:
+    """
+    Per cell stats as stored, and per year totals over the cells. The per year mean is exact, the per year median
+    is the median of the cell medians weighted by their counts, close to but not the median of every home.
+    change is from the first year to the last year in the response
+    """
+    cells = {}
+    by_year = {}
+    for row in rows:
+        key = (row.county_state, row.county_name, row.cell_row, row.cell_col)
+        if key not in cells:
+            cells[key] = {
+                "county": {"name": row.county_name, "state": row.county_state},
+                "cell_row": row.cell_row,
+                "cell_col": row.cell_col,
+                "cell_miles": row.cell_miles,
+                "center": {"lat": row.lat, "lng": row.lng},
+                "years": [],
+            }
+        cells[key]["years"].append({
+            "year_assessed": row.year_assessed,
+            "count": row.count,
+            "mean": row.mean,
+            "median": row.median,
+            "p10": row.p10,
+            "p25": row.p25,
+            "p75": row.p75,
+            "p90": row.p90,
+        })
+        by_year.setdefault(row.year_assessed, []).append(row)
+
+    years = []
+    for (year, year_rows) in sorted(by_year.items()):
+        count = sum(r.count for r in year_rows)
+        years.append({
+            "year_assessed": year,
+            "count": count,
+            "cells": len(year_rows),
+            "mean": sum(r.mean * r.count for r in year_rows) / count,
+            "median": weighted_median([r.median for r in year_rows], [r.count for r in year_rows]),
+        })
+
+    change = None
+    if len(years) > 1:
+        (first, last) = (years[0], years[-1])
+        change = {
+            "year_start": first["year_assessed"],
+            "year_end": last["year_assessed"],
+            "mean": last["mean"] / first["mean"] - 1 if first["mean"] else None,
+            "median": last["median"] / first["median"] - 1 if first["median"] else None,
+        }
+
+    return {"years": years, "change": change, "cells": list(cells.values())}
@@ -0,0 +1,395 @@
+import asyncio
+import bisect
+import click
+import json
+import os
+import shutil
+from collections import namedtuple
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise Exception("Snapshot mode needs numpy, pip install numpy")
+
+from api_server.queries import HOMES_SELECT, METERS_PER_MILE, MAX_LIMIT, decode_cursor, to_home
+
+"""
+Serves /homes without postgres, from a snapshot exported once from the database or from dataset.py output
+
+A snapshot is a directory of .npy columns and a meta.json. Columns are memory mapped when the server starts, so
+startup doesn't parse or copy anything and pages are only read from disk when a query touches them
+
+    rows are sorted by year_assessed, so a row's index is its position in the (year_assessed, id) order /homes pages
+    by, and the year column is the year index, a year range is a binary search
+    strings are a utf-8 blob and an offsets column, row i is blob[offsets[i]:offsets[i + 1]]
+    optional numbers are float64 with NaN for None
+    address_order - row indices sorted by lowercased address then row, an address is a binary search
+    spatial_order, bucket_keys, bucket_starts - row indices grouped by the cell_degrees lat lng grid bucket they're
+        in, a radius query reads the buckets overlapping the radius' bounding box then filters them by distance
+
+Distances are haversine on a sphere, within a few meters of postgis' spheroid at county scale
+
+    python -m api_server.snapshot --i out.jsonl --out snapshot/
+    python -m api_server.snapshot --db --out snapshot/
+    HOMES_SNAPSHOT=snapshot/ uvicorn api_server.main:app
+"""
+
+FORMAT_VERSION = 1
+DEFAULT_CELL_DEGREES = 0.01
+EARTH_RADIUS_METERS = 6371008.8
+
+# grid bucket row and col are packed into 1 int64 key
+BUCKET_OFFSET = 1 << 31
+
+STRING_COLUMNS = ["premise_address", "address_key", "parcel_number", "assessment_urls"]
+OPTIONAL_NUMBER_COLUMNS = ["sq_feet", "year_built", "bed_count", "bath_count"]
+INT_COLUMNS = ["sq_feet", "year_built", "bed_count"]
+
+# quacks like the database rows stream_page reads
+SnapshotRow = namedtuple("SnapshotRow", [
+    "id",
+    "premise_address",
+    "year_assessed",
+    "dollar_value",
+    "parcel_number",
+    "sq_feet",
+    "year_built",
+    "bed_count",
+    "bath_count",
+    "lat",
+    "lng",
+    "county_name",
+    "county_state",
+    "assessment_urls",
+])
+
+def bucket_keys_of(lat: np.ndarray, lng: np.ndarray, cell_degrees: float) -> np.ndarray:
+    rows = np.floor(lat / cell_degrees).astype(np.int64) + BUCKET_OFFSET
+    cols = np.floor(lng / cell_degrees).astype(np.int64) + BUCKET_OFFSET
+    return (rows << 32) | cols
+
+def haversine_meters(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    (lat1, lng1) = (np.radians(lat), np.radians(lng))
+    (lat2, lng2) = (np.radians(lats), np.radians(lngs))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class StringColumn:
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, nulls: Optional[np.ndarray] = None):
+        self.data = memoryview(data)
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def get_many(self, indices: np.ndarray) -> List[Optional[str]]:
+        starts = self.offsets[indices].tolist()
+        ends = self.offsets[indices + 1].tolist()
+        values = [str(self.data[start:end], 'utf-8') for (start, end) in zip(starts, ends)]
+        if self.nulls is not None:
+            values = [None if null else v for (v, null) in zip(values, self.nulls[indices].tolist())]
+        return values
+
+class Snapshot:
+    """
+    Read only, memory mapped snapshot
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise Exception(f"{path} is snapshot format {self.meta.get('format_version')}, expected {FORMAT_VERSION}")
+
+        self.size: int = self.meta["rows"]
+        self.cell_degrees: float = self.meta["cell_degrees"]
+        self.counties: List[Tuple[str, str]] = [tuple(c) for c in self.meta["counties"]]
+
+        self.year_assessed = self._load("year_assessed")
+        self.dollar_value = self._load("dollar_value")
+        self.lat = self._load("lat")
+        self.lng = self._load("lng")
+        self.county = self._load("county")
+        self.numbers = dict([(c, self._load(c)) for c in OPTIONAL_NUMBER_COLUMNS])
+        self.strings = dict([(c, StringColumn(
+            self._load(f"{c}.data"),
+            self._load(f"{c}.offsets"),
+            self._load(f"{c}.nulls") if c == "parcel_number" else None)) for c in STRING_COLUMNS])
+
+        self.address_order = self._load("address_order")
+        self.spatial_order = self._load("spatial_order")
+        self.bucket_keys = self._load("bucket_keys")
+        self.bucket_starts = self._load("bucket_starts")
+
+    def _load(self, name: str) -> np.ndarray:
+        # a plain ndarray over the mapping, indexing np.memmap is several times slower
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r').view(np.ndarray)
+
+    def year_range(self, year_start: Optional[int], year_end: Optional[int]) -> Tuple[int, int]:
+        """
+        [start, end) rows assessed in the years
+        """
+        start = int(np.searchsorted(self.year_assessed, year_start, 'left')) if year_start is not None else 0
+        end = int(np.searchsorted(self.year_assessed, year_end, 'right')) if year_end is not None else self.size
+        return (start, end)
+
+    def address_rows(self, address: str) -> np.ndarray:
+        key = address.lower().encode('utf-8')
+        keys = self.strings["address_key"]
+        start = bisect.bisect_left(self.address_order, key, key=keys.raw)
+        end = bisect.bisect_right(self.address_order, key, lo=start, key=keys.raw)
+        # sorted by row within an address, so by (year_assessed, id)
+        return np.asarray(self.address_order[start:end])
+
+    def radius_rows(self, lat: float, lng: float, r: float, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        Rows within r miles, of those in [start, end)
+        """
+        meters = r * METERS_PER_MILE
+        lat_degrees = meters / (EARTH_RADIUS_METERS * np.pi / 180)
+        lng_degrees = lat_degrees / max(np.cos(np.radians(min(abs(lat) + lat_degrees, 89.9))), 1e-6)
+
+        (row_min, row_max) = (np.floor((lat - lat_degrees) / self.cell_degrees), np.floor((lat + lat_degrees) / self.cell_degrees))
+        (col_min, col_max) = (np.floor((lng - lng_degrees) / self.cell_degrees), np.floor((lng + lng_degrees) / self.cell_degrees))
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.bucket_keys):
+            # the box has more cells than the snapshot has buckets, filter the buckets instead of
+            # looking up every cell, so the work is bounded by the snapshot's size rather than r
+            # keys of positive rows have the sign bit set, shift them unsigned
+            bucket_rows = (self.bucket_keys.view(np.uint64) >> np.uint64(32)).astype(np.int64) - BUCKET_OFFSET
+            bucket_cols = (self.bucket_keys & 0xFFFFFFFF) - BUCKET_OFFSET
+            found = np.flatnonzero(
+                (bucket_rows >= row_min) & (bucket_rows <= row_max) & (bucket_cols >= col_min) & (bucket_cols <= col_max))
+        else:
+            rows = np.arange(row_min, row_max + 1).astype(np.int64)
+            cols = np.arange(col_min, col_max + 1).astype(np.int64)
+            keys = (((rows[:, None] + BUCKET_OFFSET) << 32) | (cols[None, :] + BUCKET_OFFSET)).ravel()
+
+            found = np.searchsorted(self.bucket_keys, keys)
+            in_bounds = found < len(self.bucket_keys)
+            (found, keys) = (found[in_bounds], keys[in_bounds])
+            found = found[self.bucket_keys[found] == keys]
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate([
+            self.spatial_order[self.bucket_starts[i]:self.bucket_starts[i + 1]] for i in found])
+        candidates = candidates[(candidates >= start) & (candidates < (end if end is not None else self.size))]
+        candidates.sort()
+        within = haversine_meters(lat, lng, self.lat[candidates], self.lng[candidates]) <= meters
+        return candidates[within]
+
+    def homes(
+            self,
+            lat: Optional[float] = None,
+            lng: Optional[float] = None,
+            r: Optional[float] = None,
+            address: Optional[str] = None,
+            year_start: Optional[int] = None,
+            year_end: Optional[int] = None,
+            cursor: Optional[str] = None,
+            limit: int = 100) -> List[SnapshotRow]:
+        """
+        The rows of a /homes page, in the order the database query returns them, 1 past the limit
+        """
+        (start, end) = self.year_range(year_start, year_end)
+        if cursor is not None:
+            (_, after_id) = decode_cursor(cursor)
+            try:
+                start = max(start, int(after_id) + 1)
+            except ValueError:
+                raise ValueError(f"Invalid cursor {cursor}")
+
+        if lat is not None and lng is not None and r is not None:
+            rows = self.radius_rows(lat, lng, r, start, end)
+        elif address is not None:
+            rows = self.address_rows(address)
+            rows = rows[(rows >= start) & (rows < end)]
+        else:
+            raise ValueError("Either lat, lng and r or address are required")
+
+        return self.rows(rows[:min(limit, MAX_LIMIT) + 1])
+
+    def rows(self, indices: np.ndarray) -> List[SnapshotRow]:
+        """
+        Reads the rows at indices, each column is gathered once for the whole page
+        """
+        numbers = {}
+        for c in OPTIONAL_NUMBER_COLUMNS:
+            values = self.numbers[c][indices]
+            present = ~np.isnan(values)
+            values = np.where(present, values, 0).astype(np.int64) if c in INT_COLUMNS else values
+            numbers[c] = [v if p else None for (v, p) in zip(values.tolist(), present.tolist())]
+
+        strings = dict([(c, self.strings[c].get_many(indices)) for c in STRING_COLUMNS if c != "address_key"])
+        counties = [self.counties[c] for c in self.county[indices].tolist()]
+        return [
+            SnapshotRow(
+                id=i,
+                premise_address=address,
+                year_assessed=year,
+                dollar_value=value,
+                parcel_number=parcel_number,
+                sq_feet=sq_feet,
+                year_built=year_built,
+                bed_count=bed_count,
+                bath_count=bath_count,
+                lat=lat,
+                lng=lng,
+                county_name=county_name,
+                county_state=county_state,
+                assessment_urls=urls.split("\n") if urls else [])
+            for (i, address, year, value, parcel_number, sq_feet, year_built, bed_count, bath_count, lat, lng,
+                (county_name, county_state), urls) in zip(
+                indices.tolist(),
+                strings["premise_address"],
+                self.year_assessed[indices].tolist(),
+                self.dollar_value[indices].tolist(),
+                strings["parcel_number"],
+                numbers["sq_feet"],
+                numbers["year_built"],
+                numbers["bed_count"],
+                numbers["bath_count"],
+                self.lat[indices].tolist(),
+                self.lng[indices].tolist(),
+                counties,
+                strings["assessment_urls"])
+        ]
+
+async def iter_rows(rows: Iterable[SnapshotRow]) -> AsyncIterator[SnapshotRow]:
+    for row in rows:
+        yield row
+
+def write_string_column(out_dir: str, name: str, values: List[Optional[str]], nullable: bool = False):
+    encoded = [(v or "").encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in encoded], out=offsets[1:])
+    np.save(os.path.join(out_dir, f"{name}.data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(out_dir, f"{name}.offsets.npy"), offsets)
+    if nullable:
+        np.save(os.path.join(out_dir, f"{name}.nulls.npy"), np.array([v is None for v in values], dtype=bool))
+
+def write_snapshot(homes: Iterable[dict], out_dir: str, cell_degrees: float = DEFAULT_CELL_DEGREES) -> int:
+    """
+    Writes homes shaped like PremiseDetails, as dataset.py writes them and /homes returns them, to a snapshot
+    directory. The snapshot is written next to out_dir and swapped in, so a running server never sees half of one.
+    Returns the number of rows
+    """
+    columns = dict([(c, []) for c in [
+        "premise_address", "parcel_number", "assessment_urls", "year_assessed", "dollar_value", "lat", "lng", "county"
+    ] + OPTIONAL_NUMBER_COLUMNS])
+    county_ids = {}
+    for h in homes:
+        county = (h["county"]["name"], h["county"]["state"])
+        columns["county"].append(county_ids.setdefault(county, len(county_ids)))
+        columns["premise_address"].append(h["premise_address"])
+        columns["parcel_number"].append(h.get("parcel_number"))
+        columns["assessment_urls"].append("\n".join(u for u in h.get("assessment_urls") or [] if u is not None))
+        columns["year_assessed"].append(h["year_assessed"])
+        columns["dollar_value"].append(h["dollar_value"])
+        columns["lat"].append(h["premise_location"]["lat"])
+        columns["lng"].append(h["premise_location"]["lng"])
+        for c in OPTIONAL_NUMBER_COLUMNS:
+            columns[c].append(h.get(c) if h.get(c) is not None else np.nan)
+
+    years = np.array(columns["year_assessed"], dtype=np.int32)
+    order = np.argsort(years, kind="stable")
+    size = len(order)
+
+    def sort(values: list) -> list:
+        return [values[i] for i in order]
+
+    tmp_dir = f"{out_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    lat = np.array(columns["lat"], dtype=np.float64)[order]
+    lng = np.array(columns["lng"], dtype=np.float64)[order]
+    np.save(os.path.join(tmp_dir, "year_assessed.npy"), years[order])
+    np.save(os.path.join(tmp_dir, "dollar_value.npy"), np.array(columns["dollar_value"], dtype=np.int64)[order])
+    np.save(os.path.join(tmp_dir, "lat.npy"), lat)
+    np.save(os.path.join(tmp_dir, "lng.npy"), lng)
+    np.save(os.path.join(tmp_dir, "county.npy"), np.array(columns["county"], dtype=np.int32)[order])
+    for c in OPTIONAL_NUMBER_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{c}.npy"), np.array(columns[c], dtype=np.float64)[order])
+
+    addresses = sort(columns["premise_address"])
+    address_keys = [a.lower() for a in addresses]
+    write_string_column(tmp_dir, "premise_address", addresses)
+    write_string_column(tmp_dir, "address_key", address_keys)
+    write_string_column(tmp_dir, "parcel_number", sort(columns["parcel_number"]), nullable=True)
+    write_string_column(tmp_dir, "assessment_urls", sort(columns["assessment_urls"]))
+
+    encoded_keys = [k.encode('utf-8') for k in address_keys]
+    address_order = sorted(range(size), key=lambda i: (encoded_keys[i], i))
+    np.save(os.path.join(tmp_dir, "address_order.npy"), np.array(address_order, dtype=np.int64))
+
+    buckets = bucket_keys_of(lat, lng, cell_degrees)
+    spatial_order = np.argsort(buckets, kind="stable")
+    (bucket_keys, bucket_starts) = np.unique(buckets[spatial_order], return_index=True)
+    np.save(os.path.join(tmp_dir, "spatial_order.npy"), spatial_order.astype(np.int64))
+    np.save(os.path.join(tmp_dir, "bucket_keys.npy"), bucket_keys.astype(np.int64))
+    np.save(os.path.join(tmp_dir, "bucket_starts.npy"), np.append(bucket_starts, size).astype(np.int64))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "rows": size,
+        "cell_degrees": cell_degrees,
+        "counties": [list(c) for c in sorted(county_ids, key=county_ids.get)],
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    old_dir = f"{out_dir.rstrip(os.sep)}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return size
+
+def iter_file_homes(path: str) -> Iterator[dict]:
+    """
+    Reads the output of dataset.py, either 1 json array or json lines
+    """
+    with open(path, 'r') as f:
+        first_char = f.read(1)
+        while first_char.isspace():
+            first_char = f.read(1)
+        f.seek(0)
+
+        if first_char == '[':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+async def read_db_homes() -> List[dict]:
+    from sqlalchemy import text
+    from api_server.db import create_engine
+
+    engine = create_engine()
+    try:
+        async with engine.connect() as conn:
+            rows = await conn.stream(text(HOMES_SELECT))
+            return [to_home(row) async for row in rows]
+    finally:
+        await engine.dispose()
+
+@click.command(help="Exports premise details to a snapshot the api server can serve without postgres")
+@click.option("--i", "in_path", help="dataset.py output, json or json lines", default=None, type=click.Path(exists=True))
+@click.option("--db", is_flag=True, help="Export every home in the database", default=False)
+@click.option("--out", help="Snapshot directory, replaced if it exists", required=True, type=click.Path())
+@click.option("--cell_degrees", help="Spatial index bucket size", default=DEFAULT_CELL_DEGREES, type=click.FloatRange(min=0, min_open=True))
+def cli(in_path: Optional[str], db: bool, out: str, cell_degrees: float):
+    if (in_path is None) == (not db):
+        raise click.UsageError("One of --i or --db is required")
+    homes = iter_file_homes(in_path) if in_path is not None else asyncio.run(read_db_homes())
+    count = write_snapshot(homes, out, cell_degrees)
+    print(f"Wrote {count} homes to {out}")
+
+if __name__ == "__main__":
+    cli()
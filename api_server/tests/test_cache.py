@@ -0,0 +1,112 @@
+import pytest
+from api_server import cache
+from api_server.cache import ANY_COUNTY, LRUCache, NoCache, check_invalidate_token, county_tag, create_cache
+
+KING = county_tag("King", "WA")
+PIERCE = county_tag("Pierce", "WA")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock.monotonic)
+    return clock
+
+def test_get_returns_what_was_set():
+    c = LRUCache()
+    assert c.get(("a",)) is None
+    c.set(("a",), b"1", [KING])
+    assert c.get(("a",)) == b"1"
+    assert (c.stats()["hits"], c.stats()["misses"]) == (1, 1)
+
+def test_least_recently_used_entry_is_evicted_first():
+    c = LRUCache(max_entries=2)
+    c.set(("a",), b"1", [KING])
+    c.set(("b",), b"2", [KING])
+    c.get(("a",))
+    c.set(("c",), b"3", [KING])
+
+    assert c.get(("b",)) is None
+    assert (c.get(("a",)), c.get(("c",))) == (b"1", b"3")
+    assert c.stats()["evictions"] == 1
+
+def test_entries_are_evicted_to_stay_under_max_bytes():
+    c = LRUCache(max_bytes=10)
+    c.set(("a",), b"12345", [KING])
+    c.set(("b",), b"12345", [KING])
+    c.set(("c",), b"123", [KING])
+
+    assert c.get(("a",)) is None
+    assert c.stats()["bytes"] == 8
+
+def test_a_value_larger_than_max_bytes_isnt_cached():
+    c = LRUCache(max_bytes=4)
+    c.set(("a",), b"12345", [KING])
+    assert c.get(("a",)) is None
+    assert c.stats()["entries"] == 0
+
+def test_setting_a_key_again_replaces_it():
+    c = LRUCache()
+    c.set(("a",), b"1", [KING])
+    c.set(("a",), b"22", [PIERCE])
+    assert c.get(("a",)) == b"22"
+    assert (c.stats()["entries"], c.stats()["bytes"]) == (1, 2)
+    # no longer tagged with King
+    assert c.invalidate(KING) == 0
+
+def test_entries_expire_after_the_ttl(clock):
+    c = LRUCache(ttl_seconds=60)
+    c.set(("a",), b"1", [KING])
+    clock.now = 60
+    assert c.get(("a",)) == b"1"
+    clock.now = 60.1
+    assert c.get(("a",)) is None
+    assert c.stats()["expirations"] == 1
+    assert c.stats()["entries"] == 0
+
+def test_invalidate_drops_the_countys_entries_and_empty_pages():
+    c = LRUCache()
+    c.set(("king",), b"1", [KING])
+    c.set(("both",), b"2", [KING, PIERCE])
+    c.set(("pierce",), b"3", [PIERCE])
+    c.set(("empty",), b"[]", [ANY_COUNTY])
+
+    assert c.invalidate(KING) == 3
+    assert [c.get((k,)) for k in ["king", "both", "pierce", "empty"]] == [None, None, b"3", None]
+    assert c.stats()["invalidations"] == 3
+    assert c.invalidate(KING) == 0
+
+def test_no_cache_caches_nothing():
+    c = NoCache()
+    c.set(("a",), b"1", [KING])
+    assert c.get(("a",)) is None
+    assert c.invalidate(KING) == 0
+
+def test_create_cache_reads_the_environment(monkeypatch):
+    monkeypatch.setenv("CACHE_BACKEND", "none")
+    assert isinstance(create_cache(), NoCache)
+
+    monkeypatch.setenv("CACHE_BACKEND", "lru")
+    monkeypatch.setenv("CACHE_MAX_ENTRIES", "5")
+    monkeypatch.setenv("CACHE_TTL_SECONDS", "1.5")
+    c = create_cache()
+    assert (c.max_entries, c.ttl_seconds) == (5, 1.5)
+
+    monkeypatch.setenv("CACHE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        create_cache()
+
+def test_check_invalidate_token(monkeypatch):
+    monkeypatch.delenv("CACHE_INVALIDATE_TOKEN", raising=False)
+    assert check_invalidate_token("anything") is None
+
+    monkeypatch.setenv("CACHE_INVALIDATE_TOKEN", "secret")
+    assert check_invalidate_token("secret") is True
+    assert check_invalidate_token("wrong") is False
+    assert check_invalidate_token(None) is False
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from api_server.cache import LRUCache
+from api_server.main import app
+from api_server.queries import MAX_RADIUS_MILES
+
+def home_row(lat, lng):
+    return SimpleNamespace(
+        id="3f2a9c1e-6d7b-4c1e-9a57-0d3c7d2b8e11",
+        premise_address="1 Main St",
+        year_assessed=2021,
+        dollar_value=500000,
+        parcel_number="0001",
+        sq_feet=None,
+        year_built=1990,
+        bed_count=None,
+        bath_count=None,
+        lat=lat,
+        lng=lng,
+        county_name="King",
+        county_state="WA",
+        assessment_urls=[])
+
+def trend_row(lat, lng):
+    return SimpleNamespace(
+        cell_row=1, cell_col=2, year_assessed=2021, cell_miles=0.5, lat=lat, lng=lng, count=3,
+        mean=1.0, median=1.0, p10=1.0, p25=1.0, p75=1.0, p90=1.0, county_name="King", county_state="WA")
+
+class FakeConnection:
+    """
+    Answers every query with 1 row at the queried location, so responses differ by location
+    """
+    def __init__(self, queries):
+        self.queries = queries
+
+    async def stream(self, query, params):
+        self.queries.append(params)
+
+        async def rows():
+            yield home_row(params["lat"], params["lng"])
+        return rows()
+
+    async def execute(self, query, params):
+        self.queries.append(params)
+        return SimpleNamespace(all=lambda: [trend_row(params["lat"], params["lng"])])
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class FakeEngine:
+    def __init__(self):
+        self.queries = []
+
+    def connect(self):
+        return AwaitableConnection(FakeConnection(self.queries))
+
+class AwaitableConnection:
+    """
+    Awaited by /homes, used as a context manager by /trends, like AsyncEngine.connect()
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __await__(self):
+        async def connection():
+            return self.connection
+        return connection().__await__()
+
+    async def __aenter__(self):
+        return self.connection
+
+    async def __aexit__(self, *exc):
+        pass
+
+@pytest.fixture
+def client():
+    # the lifespan isn't run, it would connect to postgres
+    app.state.cache = LRUCache()
+    app.state.engine = FakeEngine()
+    app.state.snapshot = None
+    return TestClient(app)
+
+def test_repeated_homes_request_is_a_hit(client):
+    first = client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1})
+    second = client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1})
+
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.json() == first.json()
+    assert len(app.state.engine.queries) == 1
+
+@pytest.mark.parametrize("path", ["/homes", "/trends"])
+def test_nearby_locations_are_queried_on_their_own(client, path):
+    first = client.get(path, params={"lat": 47.60001, "lng": -122.3, "r": 0.05})
+    second = client.get(path, params={"lat": 47.60002, "lng": -122.3, "r": 0.05})
+    wider = client.get(path, params={"lat": 47.60002, "lng": -122.3, "r": 0.051})
+
+    assert [r.headers["X-Cache"] for r in (first, second, wider)] == ["MISS", "MISS", "MISS"]
+    assert [(q["lat"], q["meters"]) for q in app.state.engine.queries] == \
+        [(47.60001, pytest.approx(80.4672)), (47.60002, pytest.approx(80.4672)), (47.60002, pytest.approx(82.0765, rel=1e-4))]
+    assert first.json() != second.json()
+
+def test_pages_of_a_location_are_cached_apart(client):
+    client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1})
+    page = client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1, "limit": 1})
+    assert page.headers["X-Cache"] == "MISS"
+
+def test_ingesting_the_county_drops_its_pages(client, monkeypatch):
+    monkeypatch.setenv("CACHE_INVALIDATE_TOKEN", "secret")
+    client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1})
+
+    response = client.post(
+        "/cache/invalidate", params={"county": "King", "state": "WA"}, headers={"X-Cache-Token": "secret"})
+    assert response.json() == {"invalidated": 1}
+    assert client.get("/homes", params={"lat": 47.6, "lng": -122.3, "r": 1}).headers["X-Cache"] == "MISS"
+
+@pytest.mark.parametrize("path", ["/homes", "/trends"])
+@pytest.mark.parametrize("r", [0, -1, MAX_RADIUS_MILES + 0.1])
+def test_radius_out_of_range_is_rejected(client, path, r):
+    response = client.get(path, params={"lat": 47.6, "lng": -122.3, "r": r})
+    assert response.status_code == 422
+    assert app.state.engine.queries == []
@@ -0,0 +1,30 @@
+import base64
+import pytest
+from api_server.queries import decode_cursor, encode_cursor
+
+@pytest.mark.parametrize("year_assessed,premise_id", [
+    (2021, "42"),
+    (1999, "3f2a9c1e-6d7b-4c1e-9a57-0d3c7d2b8e11"),
+    (0, ""),
+])
+def test_cursor_round_trips(year_assessed, premise_id):
+    cursor = encode_cursor(year_assessed, premise_id)
+    assert decode_cursor(cursor) == (year_assessed, premise_id)
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(2021, "??>>??")
+    assert "+" not in cursor and "/" not in cursor
+
+def test_premise_ids_are_strings():
+    assert decode_cursor(encode_cursor(2021, 42)) == (2021, "42")
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[2021]").decode('ascii'),
+    base64.urlsafe_b64encode(b'{"year": 2021}').decode('ascii'),
+    base64.urlsafe_b64encode(b'["twenty", "42"]').decode('ascii'),
+    "é",
+])
+def test_invalid_cursor_raises(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
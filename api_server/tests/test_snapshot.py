@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from api_server.queries import METERS_PER_MILE
+from api_server.snapshot import Snapshot, haversine_meters, write_snapshot
+
+def make_homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # around Seattle, plus a few far away and either side of the equator and prime meridian
+    lats = np.concatenate([rng.uniform(47.4, 47.8, n), [0.001, -0.001, 64.8, -33.9]])
+    lngs = np.concatenate([rng.uniform(-122.5, -122.1, n), [-0.001, 0.001, -147.7, 151.2]])
+    years = rng.integers(2015, 2023, len(lats))
+    return [{
+        "premise_address": f"{i} Main St",
+        "parcel_number": str(i),
+        "assessment_urls": [f"https://example.com/{i}"],
+        "year_assessed": int(years[i]),
+        "dollar_value": 100000 + i,
+        "premise_location": {"lat": float(lats[i]), "lng": float(lngs[i])},
+        "county": {"name": "King", "state": "WA"},
+    } for i in range(len(lats))]
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    out_dir = str(tmp_path_factory.mktemp("snapshot") / "snapshot")
+    write_snapshot(make_homes(2000), out_dir, cell_degrees=0.01)
+    return Snapshot(out_dir)
+
+def brute_force(snapshot, lat, lng, r, start=0, end=None):
+    rows = np.arange(start, end if end is not None else snapshot.size)
+    within = haversine_meters(lat, lng, snapshot.lat[rows], snapshot.lng[rows]) <= r * METERS_PER_MILE
+    return rows[within]
+
+def test_rows_are_sorted_by_year(snapshot):
+    assert snapshot.size == 2004
+    assert (np.diff(snapshot.year_assessed) >= 0).all()
+
+@pytest.mark.parametrize("r", [0.01, 0.5, 2.0, 10.0, 100.0])
+def test_radius_rows_match_a_brute_force_search(snapshot, r):
+    rng = np.random.default_rng(1)
+    for (lat, lng) in zip(rng.uniform(47.4, 47.8, 25), rng.uniform(-122.5, -122.1, 25)):
+        assert snapshot.radius_rows(lat, lng, r).tolist() == brute_force(snapshot, lat, lng, r).tolist()
+
+def test_radius_rows_within_a_row_range(snapshot):
+    (start, end) = snapshot.year_range(2017, 2019)
+    rows = snapshot.radius_rows(47.6, -122.3, 5.0, start, end)
+    assert rows.tolist() == brute_force(snapshot, 47.6, -122.3, 5.0, start, end).tolist()
+    assert set(snapshot.year_assessed[rows].tolist()) <= {2017, 2018, 2019}
+
+def test_radius_rows_with_more_cells_than_buckets(snapshot):
+    # the box covers far more cells than the snapshot has buckets, buckets are filtered instead
+    for r in [1000.0, 5000.0, 20000.0]:
+        assert snapshot.radius_rows(47.6, -122.3, r).tolist() == brute_force(snapshot, 47.6, -122.3, r).tolist()
+
+@pytest.mark.parametrize("lat,lng", [(0.0, 0.0), (0.0005, -0.0005), (-0.0005, 0.0005)])
+def test_radius_rows_across_negative_buckets(snapshot, lat, lng):
+    # buckets south and west of 0 have negative rows and cols
+    for r in [0.01, 1.0, 50000.0]:
+        assert snapshot.radius_rows(lat, lng, r).tolist() == brute_force(snapshot, lat, lng, r).tolist()
+
+def test_radius_rows_far_from_any_home(snapshot):
+    assert len(snapshot.radius_rows(10.0, 10.0, 5.0)) == 0
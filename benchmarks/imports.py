@@ -0,0 +1,103 @@
+import click
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple, Optional
+
+"""
+Times importing the command entry points, each in a fresh interpreter, and lists the heavy dependencies each
+import pulled in. Commands should only import what they use, dataset.py --help shouldn't load pydantic or
+pyarrow and gen_county_dataset.py shouldn't load googlemaps until it calls the api
+
+    python benchmarks/imports.py --repeat 10 --max_seconds 0.15
+
+Exits non zero if a budgeted import takes longer than --max_seconds or loads a module it shouldn't
+"""
+
+DATA_GEN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "house_trend_discovery", "data_gen")
+
+HEAVY_MODULES = ["pydantic", "bs4", "lxml", "numpy", "pandas", "pyarrow", "sqlalchemy", "geoalchemy2", "googlemaps"]
+
+class Target(NamedTuple):
+    module: str
+    # gen_county_dataset.py imports its siblings as top level modules
+    path: Optional[str]
+    # heavy modules the import shouldn't load
+    forbidden: List[str]
+    # held to --max_seconds
+    budgeted: bool
+
+TARGETS = [
+    Target("house_trend_discovery.data_gen.parsers.registry", None, HEAVY_MODULES, True),
+    Target("house_trend_discovery.data_gen.dataset.dataset", None, HEAVY_MODULES, True),
+    # its models need pydantic, the api client and the lattice wait for gen-addrs
+    Target("gen_county_dataset", DATA_GEN_DIR, ["numpy", "googlemaps", "sqlalchemy", "geoalchemy2", "bs4"], False),
+    Target("house_trend_discovery.data_gen.parsers.parser", None, ["sqlalchemy", "geoalchemy2", "googlemaps"], False),
+    Target("house_trend_discovery.data_gen.parsers.kingcounty", None, ["sqlalchemy", "geoalchemy2", "googlemaps"], False),
+    Target("house_trend_discovery.data_gen.dataset.load", None, [], False),
+]
+
+# runs in the child, prints the import's seconds and the heavy modules it loaded
+CHILD = """
+import json, sys, time
+if {path!r} is not None:
+    sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def time_import(target: Target) -> dict:
+    code = CHILD.format(path=target.path, module=target.module, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def interpreter_seconds(repeat: int) -> float:
+    """
+    Median seconds to start and exit python, the floor under every command
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+@click.command(help="Times importing each command's module in a fresh interpreter, prints json")
+@click.option("--repeat", help="Imports per module, the median is reported", default=5, type=click.IntRange(min=1))
+@click.option("--max_seconds", help="Import budget of registry.py and dataset.py", default=0.15, type=float)
+def cli(repeat: int, max_seconds: float):
+    report = {"python": sys.version.split()[0], "interpreter_seconds": interpreter_seconds(repeat), "imports": {}}
+    over_budget = []
+    for target in TARGETS:
+        runs = [time_import(target) for _ in range(repeat)]
+        errors = [r["error"] for r in runs if "error" in r]
+        if errors:
+            # a missing optional dependency, reported and not budgeted
+            report["imports"][target.module] = {"error": errors[0]}
+            continue
+
+        seconds = statistics.median(r["seconds"] for r in runs)
+        loaded = runs[0]["loaded"]
+        report["imports"][target.module] = {"seconds": seconds, "loaded": loaded}
+
+        unwanted = [m for m in loaded if m in target.forbidden]
+        if unwanted:
+            over_budget.append(f"{target.module} loaded {', '.join(unwanted)}")
+        if target.budgeted and seconds > max_seconds:
+            over_budget.append(f"{target.module} took {seconds:.3f}s, over the {max_seconds}s budget")
+
+    print(json.dumps(report, indent=2))
+    if over_budget:
+        for problem in over_budget:
+            print(problem, file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,141 @@
+import click
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from house_trend_discovery.data_gen.dataset.dataset import get_parser, write_records_jsonl
+from house_trend_discovery.data_gen.models import PremiseDetailsDictList, PremiseRecord, iter_dicts, iter_premise_details
+from house_trend_discovery.data_gen.parsers import houseinfo, kingcounty
+from house_trend_discovery.data_gen.parsers.utils import DEFAULT_HTML_BACKEND, HTML_BACKENDS, extract_tables, get_file
+from synthetic import SCRAPER_NAMES, write_session
+
+"""
+Times each stage of turning a crawler session into a dataset, on synthetic sessions of increasing size
+
+    discovery - finding every home's pages, urls and inputs in the session
+    html_parsing - extracting the parser's tables from every page, pages are read before the timer starts
+    parse_homes - the parser's parse_home over every home, reading files, parsing html and building PremiseRecords
+    construction - expanding the records into a PremiseDetails per year assessed, which outputs no longer do
+    output_json, output_jsonl, output_parquet - writing the results, parquet only if pyarrow is installed
+
+Results are written as json so runs on different commits can be compared
+
+    python benchmarks/pipeline.py --homes 1000 --homes 10000 --out bench.json
+"""
+
+# page number -> table ids each parser extracts from it
+PAGE_TABLE_IDS: Dict[str, Dict[int, List[str]]] = {
+    "kingcounty": {1: kingcounty.TABLE_IDS},
+    "houseinfo": {1: houseinfo.P1_TABLE_IDS, 2: houseinfo.P2_TABLE_IDS},
+}
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def time_stage(stages: Dict[str, float], name: str, f):
+    start = time.perf_counter()
+    result = f()
+    stages[name] = time.perf_counter() - start
+    return result
+
+def time_html_parsing(homes: list, scraper_name: str, backend: str) -> float:
+    table_ids = PAGE_TABLE_IDS[scraper_name]
+    elapsed = 0.0
+    for home in homes:
+        for (page_number, _, page_path, _) in home:
+            ids = table_ids.get(page_number)
+            if ids is None:
+                continue
+            html = get_file(page_path)
+            start = time.perf_counter()
+            extract_tables(html, ids, backend)
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+def time_output(stages: Dict[str, float], records: List[PremiseRecord], out_dir: str):
+    time_stage(stages, "output_json", lambda: PremiseDetailsDictList.dump_json(list(iter_dicts(records))))
+
+    with open(os.path.join(out_dir, "out.jsonl"), 'w') as f:
+        time_stage(stages, "output_jsonl", lambda: write_records_jsonl(iter(records), f))
+
+    try:
+        # imported before the timer starts, so the first run doesn't pay for it
+        importlib.import_module("pyarrow.dataset")
+    except ImportError:
+        return
+    from house_trend_discovery.data_gen.dataset.parquet import write_parquet
+    time_stage(stages, "output_parquet", lambda: write_parquet(records, os.path.join(out_dir, "parquet")))
+
+def run_benchmark(data_dir: str, scraper_name: str, homes: int, workers: int, html_backend: str) -> dict:
+    write_session(data_dir, scraper_name, homes)
+    stages: Dict[str, float] = {}
+
+    parser = get_parser(scraper_name, data_dir, workers=workers, html_backend=html_backend)
+    home_results = time_stage(
+        stages, "discovery", lambda: parser._get_homes(parser._get_scraper_output_file_paths()))
+
+    stages["html_parsing"] = time_html_parsing(home_results, scraper_name, html_backend)
+
+    records = time_stage(stages, "parse_homes", lambda: parser.parse_records({parser.name: home_results}))
+
+    results = time_stage(stages, "construction", lambda: list(iter_premise_details(records)))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        time_output(stages, records, out_dir)
+
+    return {
+        "scraper_name": scraper_name,
+        "homes": homes,
+        "homes_parsed": len(home_results) - len(parser.get_failures()),
+        "records": len(results),
+        "workers": workers,
+        "html_backend": html_backend,
+        "seconds": stages,
+    }
+
+@click.command(help="Times discovery, html parsing, result construction and output on synthetic sessions")
+@click.option("--homes", help="Session sizes to run, repeatable", default=[1000], multiple=True, type=click.IntRange(min=1))
+@click.option("--scraper_name", help="Parsers to run, defaults to all", multiple=True, type=click.Choice(SCRAPER_NAMES))
+@click.option("--workers", default=1, type=click.IntRange(min=1))
+@click.option("--html_backend", default=DEFAULT_HTML_BACKEND, type=click.Choice(HTML_BACKENDS))
+@click.option("--data", help="Where sessions are generated, a temporary directory by default", default=None, type=click.Path())
+@click.option("--out", help="Results json path, defaults to stdout", default=None, type=click.Path())
+def cli(homes: tuple, scraper_name: tuple, workers: int, html_backend: str, data: Optional[str], out: Optional[str]):
+    runs = []
+    for name in scraper_name or SCRAPER_NAMES:
+        for n in homes:
+            data_dir = tempfile.mkdtemp(dir=data)
+            try:
+                runs.append(run_benchmark(data_dir, name, n, workers, html_backend))
+            finally:
+                shutil.rmtree(data_dir)
+            print(f"{name} {n} homes: {json.dumps(runs[-1]['seconds'])}", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    if out:
+        with open(out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,163 @@
+import click
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+from house_trend_discovery.data_gen.models import (
+    County, LatLng, PremiseDetails, PremiseDetailsDictList, PremiseDetailsList, PremiseRecord, iter_dicts
+)
+
+"""
+Compares building and serializing PremiseDetails the old way, validating County and LatLng for every record and
+dumping through json.dumps([json.loads(m.model_dump_json())]), against sharing 1 County and LatLng per home and
+TypeAdapter.dump_json. model_construct is timed too, in pydantic 2 it's slower than validating.
+Building 1 PremiseRecord per home, what parsers do now, is compared to both for time, memory held and serialization
+
+    python benchmarks/serialization.py --records 100000
+"""
+
+def make_fields(i: int) -> dict:
+    return {
+        "premise_address": f"{i} Main St, Seattle, WA 98101, USA",
+        "assessment_urls": [f"https://example.com/parcel/{i}"],
+        "year_assessed": 2000 + i % 24,
+        "dollar_value": 300000 + i,
+        "parcel_number": str(1000000 + i),
+        "sq_feet": 1500,
+        "year_built": 1990,
+        "bed_count": 3,
+        "bath_count": 2.5,
+        "county": {"name": "King County", "state": "Washington"},
+        "premise_location": {"lat": 47.6 + i * 1e-6, "lng": -122.3 - i * 1e-6},
+    }
+
+def build_per_record(fields: List[dict]) -> List[PremiseDetails]:
+    return [PremiseDetails(**f) for f in fields]
+
+def build_shared(fields: List[dict], years_per_home: int) -> List[PremiseDetails]:
+    results = []
+    for i in range(0, len(fields), years_per_home):
+        county = County(**fields[i]["county"])
+        premise_location = LatLng(**fields[i]["premise_location"])
+        for f in fields[i:i + years_per_home]:
+            results.append(PremiseDetails(**{**f, "county": county, "premise_location": premise_location}))
+    return results
+
+def build_model_construct(fields: List[dict]) -> List[PremiseDetails]:
+    return [PremiseDetails.model_construct(**{
+        **f,
+        "county": County.model_construct(**f["county"]),
+        "premise_location": LatLng.model_construct(**f["premise_location"]),
+    }) for f in fields]
+
+def build_records(fields: List[dict], years_per_home: int) -> List[PremiseRecord]:
+    records = []
+    for i in range(0, len(fields), years_per_home):
+        f = fields[i]
+        record = PremiseRecord(
+            assessment_urls=f["assessment_urls"],
+            premise_address=f["premise_address"],
+            county=f["county"],
+            premise_location=f["premise_location"],
+            parcel_number=f["parcel_number"],
+            sq_feet=f["sq_feet"],
+            year_built=f["year_built"],
+            bed_count=f["bed_count"],
+            bath_count=f["bath_count"])
+        for year in fields[i:i + years_per_home]:
+            record.add(year["year_assessed"], year["dollar_value"])
+        records.append(record)
+    return records
+
+def allocated_bytes(f: Callable) -> int:
+    """
+    Bytes still allocated by f's result once it returns
+    """
+    tracemalloc.start()
+    try:
+        result = f()
+        (current, _) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current
+
+def timed(f: Callable, repeat: int):
+    """
+    Returns the best time of repeat runs and the last result
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, result)
+
+def round_trip(results: List[PremiseDetails]) -> str:
+    return json.dumps([json.loads(r.model_dump_json()) for r in results])
+
+def type_adapter(results: List[PremiseDetails]) -> bytes:
+    return PremiseDetailsList.dump_json(results)
+
+def records_json(records: List[PremiseRecord]) -> bytes:
+    return PremiseDetailsDictList.dump_json(list(iter_dicts(records)))
+
+@click.command(help="Times PremiseDetails construction and json serialization, prints the timings as json")
+@click.option("--records", default=100000, help="Number of records")
+@click.option("--years_per_home", default=10, help="Records that share a home's County and LatLng")
+@click.option("--repeat", default=3, help="Best of this many runs is reported")
+def cli(records: int, years_per_home: int, repeat: int):
+    # every years_per_home records are the same home
+    fields = [make_fields(i // years_per_home) for i in range(records)]
+
+    (per_record_s, validated) = timed(lambda: build_per_record(fields), repeat)
+    (shared_s, _) = timed(lambda: build_shared(fields, years_per_home), repeat)
+    (model_construct_s, _) = timed(lambda: build_model_construct(fields), repeat)
+    (round_trip_s, old_json) = timed(lambda: round_trip(validated), repeat)
+    (type_adapter_s, new_json) = timed(lambda: type_adapter(validated), repeat)
+
+    # fields repeat per home, so each years_per_home chunk has its own years for records to pack
+    year_fields = [{**f, "year_assessed": 2000 + i % years_per_home} for (i, f) in enumerate(fields)]
+    (records_s, premise_records) = timed(lambda: build_records(year_fields, years_per_home), repeat)
+    (shared_years_s, shared) = timed(lambda: build_shared(year_fields, years_per_home), repeat)
+    (records_json_s, records_out) = timed(lambda: records_json(premise_records), repeat)
+
+    if json.loads(old_json) != json.loads(new_json):
+        raise Exception("TypeAdapter output differs from the round trip output")
+    if records_out != type_adapter(shared):
+        raise Exception("PremiseRecord output differs from the PremiseDetails output")
+
+    shared_bytes = allocated_bytes(lambda: build_shared(year_fields, years_per_home))
+    records_bytes = allocated_bytes(lambda: build_records(year_fields, years_per_home))
+
+    report = {
+        "records": records,
+        "construct": {
+            "per_record_seconds": per_record_s,
+            "shared_per_home_seconds": shared_s,
+            "model_construct_seconds": model_construct_s,
+            "speedup": per_record_s / shared_s,
+        },
+        "serialize": {
+            "round_trip_seconds": round_trip_s,
+            "type_adapter_seconds": type_adapter_s,
+            "speedup": round_trip_s / type_adapter_s,
+        },
+        "premise_records": {
+            "premise_details_seconds": shared_years_s,
+            "premise_records_seconds": records_s,
+            "construct_speedup": shared_years_s / records_s,
+            "premise_details_bytes": shared_bytes,
+            "premise_records_bytes": records_bytes,
+            "memory_reduction": shared_bytes / records_bytes,
+            "premise_records_json_seconds": records_json_s,
+        },
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    cli()
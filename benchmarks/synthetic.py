@@ -0,0 +1,129 @@
+import click
+import json
+import os
+import random
+from urllib.parse import quote
+
+"""
+Writes synthetic crawler sessions in the layout puppeteer_crawler saves them in, with pages shaped like the
+kingcounty and houseinfo sites, so parsers can be benchmarked at any scale without crawling
+
+    {data}/{scraper_name}-{session_ts}/{key}/page_1.html
+                                            /urls/url_1.txt
+                                            /inputs/inputs.json
+
+    python benchmarks/synthetic.py --data /tmp/bench_data --homes 10000
+"""
+
+SCRAPER_NAMES = ["kingcounty", "houseinfo"]
+
+def kingcounty_pages(i: int, rng: random.Random, padding: int) -> list:
+    year_built = rng.randint(1950, 2020)
+    years = range(2024, 2004, -1)
+    base_value = rng.randint(200000, 900000)
+    tax_rows = "".join(
+        f"<tr><td>{y}</td><td>{base_value + (y - 2004) * 9000:,}</td><td>{rng.randint(1000, 9000):,}</td></tr>"
+        for y in years)
+
+    html = f"""<html><head><script>var viewState = "{'x' * padding}";</script></head><body>
+<table id="cphContent_DetailsViewDashboardHeader">
+<tr><td>Parcel Number</td><td>{1000000 + i}</td></tr>
+<tr><td>Name</td><td>OWNER {i}</td></tr>
+<tr><td>Site Address</td><td>{i} MAIN ST</td></tr>
+</table>
+<table id="cphContent_DetailsViewPropTypeR">
+<tr><td>Year Built</td><td>{year_built}</td></tr>
+<tr><td>Total Square Footage</td><td>{rng.randint(700, 4500)}</td></tr>
+<tr><td>Number Of Bedrooms</td><td>{rng.randint(1, 6)}</td></tr>
+<tr><td>Number Of Baths</td><td>{rng.choice([1, 1.5, 2, 2.5, 3])}</td></tr>
+</table>
+<table id="cphContent_GridViewDBTaxRoll">
+<tr><th>Tax Year</th><th>Appraised Total ($)</th><th>Taxes Billed ($)</th></tr>
+{tax_rows}
+</table>
+</body></html>"""
+    return [(f"https://blue.kingcounty.com/Assessor/eRealProperty/Dashboard.aspx?ParcelNbr={1000000 + i}", html)]
+
+def houseinfo_pages(i: int, rng: random.Random, padding: int) -> list:
+    years = [2024, 2023, 2022, 2021, 2020]
+    base_value = rng.randint(200000, 900000)
+
+    p1 = f"""<html><head><script>var viewState = "{'x' * padding}";</script></head><body>
+<table id="mGrid">
+<tr><th>Parcel Number</th><th>Location Address</th><th>Owner</th></tr>
+<tr><td>{5000000 + i}</td><td>{i} MAIN ST</td><td>OWNER {i}</td></tr>
+</table>
+</body></html>"""
+
+    p2 = f"""<html><head><script>var viewState = "{'x' * padding}";</script></head><body>
+<table id="mPropertyValues">
+<tr><th>Value Type</th>{"".join(f"<th>Tax Year {y}</th>" for y in years)}</tr>
+<tr><td>Market Land</td>{"".join(f"<td>${base_value // 3:,}</td>" for _ in years)}</tr>
+<tr><td>Market Total</td>{"".join(f"<td>${base_value + (y - 2020) * 15000:,}</td>" for y in years)}</tr>
+</table>
+<table id="mRealPropertyStructures">
+<tr><th>Year Built</th><th>Square Feet</th></tr>
+<tr><td>{rng.randint(1950, 2020)}</td><td>{rng.randint(700, 4500)}</td></tr>
+</table>
+</body></html>"""
+
+    url = f"https://www.snoco.org/proptax/search.aspx?parcel_number={5000000 + i}"
+    return [(url, p1), (f"{url}&tab=values", p2)]
+
+PAGE_BUILDERS = {
+    "kingcounty": kingcounty_pages,
+    "houseinfo": houseinfo_pages,
+}
+
+def write_file(path: str, content: str):
+    with open(path, 'w') as f:
+        f.write(content)
+
+def write_session(
+        data_dir: str,
+        scraper_name: str,
+        homes: int,
+        session_ts: int = 1000,
+        padding: int = 4096,
+        seed: int = 0) -> str:
+    """
+    Writes a session of `homes` homes and returns its session id. Pages are padded with `padding` bytes of
+    script, like the view state real assessor pages carry
+    """
+    rng = random.Random(seed)
+    session_id = f"{scraper_name}-{session_ts}"
+    build_pages = PAGE_BUILDERS[scraper_name]
+
+    for i in range(homes):
+        address = f"{i} Main St, Seattle, WA 98101, USA"
+        home_dir = os.path.join(data_dir, session_id, quote(address, safe=','))
+        os.makedirs(os.path.join(home_dir, "urls"), exist_ok=True)
+        os.makedirs(os.path.join(home_dir, "inputs"), exist_ok=True)
+
+        inputs = {
+            "address": address,
+            "county": {"name": "King County", "state": "Washington"},
+            "location": {"lat": 47.5 + rng.random() * 0.2, "lng": -122.4 + rng.random() * 0.2},
+        }
+        write_file(os.path.join(home_dir, "inputs", "inputs.json"), json.dumps(inputs))
+
+        for (page_number, (url, html)) in enumerate(build_pages(i, rng, padding), start=1):
+            write_file(os.path.join(home_dir, "urls", f"url_{page_number}.txt"), url)
+            write_file(os.path.join(home_dir, f"page_{page_number}.html"), html)
+
+    return session_id
+
+@click.command(help="Writes synthetic crawler sessions for benchmarking parsers")
+@click.option("--data", help="Data directory to write sessions to", required=True, type=click.Path())
+@click.option("--homes", help="Homes per session", default=1000, type=click.IntRange(min=1))
+@click.option("--scraper_name", help="Layouts to write, defaults to all", multiple=True, type=click.Choice(SCRAPER_NAMES))
+@click.option("--session_ts", help="Session timestamp, sessions are named {scraper_name}-{session_ts}", default=1000)
+@click.option("--padding", help="Bytes of filler script per page", default=4096)
+@click.option("--seed", default=0)
+def cli(data: str, homes: int, scraper_name: tuple, session_ts: int, padding: int, seed: int):
+    for name in scraper_name or SCRAPER_NAMES:
+        session_id = write_session(data, name, homes, session_ts=session_ts, padding=padding, seed=seed)
+        print(f"Wrote {homes} homes to {os.path.join(data, session_id)}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,55 @@
+import click
+import json
+import sys
+import time
+import numpy as np
+from house_trend_discovery.data_gen.trends import parcel_cagr, price_index, to_frame, yoy_changes
+
+"""
+Times the trend computations on a synthetic county, parcels are assessed every year
+
+    python benchmarks/trends.py --parcels 100000 --years 20
+"""
+
+def make_columns(parcels: int, years: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    n = parcels * years
+    parcel_ids = np.repeat(np.arange(parcels), years)
+    base = rng.integers(200000, 900000, parcels)
+    growth = 1 + rng.normal(0.04, 0.02, n)
+    return {
+        "parcel_number": parcel_ids.astype(str),
+        "premise_address": np.char.add(parcel_ids.astype(str), " Main St").astype(object),
+        "year_assessed": np.tile(np.arange(2024 - years, 2024), parcels),
+        "dollar_value": (np.repeat(base, years) * growth).astype(np.int64),
+        "lat": np.repeat(47.2 + rng.random(parcels) * 0.6, years),
+        "lng": np.repeat(-122.5 + rng.random(parcels) * 0.7, years),
+        "county_name": np.full(n, "King County", dtype=object),
+        "county_state": np.full(n, "Washington", dtype=object),
+    }
+
+@click.command(help="Times building the trend frame, yoy changes, parcel cagr and the price index, prints json")
+@click.option("--parcels", default=100000)
+@click.option("--years", default=20)
+@click.option("--cell_miles", default=0.5)
+def cli(parcels: int, years: int, cell_miles: float):
+    columns = make_columns(parcels, years)
+    seconds = {}
+
+    start = time.perf_counter()
+    df = to_frame(columns)
+    seconds["to_frame"] = time.perf_counter() - start
+
+    for (name, f) in [
+            ("yoy_changes", lambda: yoy_changes(df)),
+            ("parcel_cagr", lambda: parcel_cagr(df)),
+            ("price_index", lambda: price_index(df, cell_miles))]:
+        start = time.perf_counter()
+        f()
+        seconds[name] = time.perf_counter() - start
+
+    json.dump({"parcels": parcels, "rows": len(df), "seconds": seconds}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    cli()
@@ -1,11 +1,33 @@
-from sqlalchemy import create_engine, URL, text
+from functools import lru_cache
+import os
+from sqlalchemy import create_engine, URL, Engine
 
-url_object = URL.create(
-    "postgresql",
-    username="trends",
-    password="example",
-    host="localhost",
-    database="trends",
-)
+"""
+The engine is created on first use, so commands that never touch the database don't need one
 
-engine = create_engine(url_object, echo=True)
+configured with env vars
+    DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+    DB_ECHO - log every statement, defaults to off
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE - connection pool settings
+"""
+
+def get_url() -> URL:
+    return URL.create(
+        "postgresql+psycopg2",
+        username=os.environ.get("DB_USER", "trends"),
+        password=os.environ.get("DB_PASSWORD", "example"),
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=int(os.environ["DB_PORT"]) if "DB_PORT" in os.environ else None,
+        database=os.environ.get("DB_NAME", "trends"),
+    )
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    return create_engine(
+        get_url(),
+        echo=os.environ.get("DB_ECHO", "false").lower() in ("1", "true"),
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "-1")),
+        pool_pre_ping=True,
+    )
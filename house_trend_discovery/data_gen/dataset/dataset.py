@@ -1,34 +1,198 @@
 import click
-import json
-from typing import Optional, List
-import importlib
-from house_trend_discovery.data_gen.models import PremiseDetails
+import os
+import sys
+from typing import TYPE_CHECKING, Iterator, Optional, List
+from house_trend_discovery.data_gen.parsers.registry import list_parsers, load_parser_class
+from house_trend_discovery.data_gen.parsers.utils import DEFAULT_HTML_BACKEND, HTML_BACKENDS
 from house_trend_discovery.get_logger import get_logger
+from house_trend_discovery.metrics import Metrics, active
+from house_trend_discovery.profiling import maybe_profiled, profile_options
+
+if TYPE_CHECKING:
+    from house_trend_discovery.data_gen.models import PremiseDetails, PremiseRecord
+    from house_trend_discovery.data_gen.parsers.parser import Parser as ParserBase
 
 logger = get_logger(__name__)
 
-def get_parser_results(scraper_name: str, data_dir: str) -> List[PremiseDetails]:
-    mod = importlib.import_module(f"house_trend_discovery.data_gen.parsers.{scraper_name}")
-    ParserClass = mod.Parser
-    return ParserClass(scraper_name=scraper_name, data_base_path=data_dir).run().get_results()
+"""
+pydantic, the parsers and pyarrow are imported by the functions that use them, --help and --list_parsers
+start without them. benchmarks/imports.py measures it
+"""
+
+def get_parser(scraper_name: str, data_dir: str, **parser_options) -> "ParserBase":
+    """
+    parser_options are passed to the Parser, workers, cache_dir, html_backend, metrics, max_homes,
+    merge_sessions, session_ids
+    """
+    ParserClass = load_parser_class(scraper_name)
+    return ParserClass(scraper_name=scraper_name, data_base_path=data_dir, **parser_options)
+
+def get_parser_results(scraper_name: str, data_dir: str, **parser_options) -> List["PremiseDetails"]:
+    parser = get_parser(scraper_name, data_dir, **parser_options).run()
+    log_failures(parser)
+    return parser.get_results()
+
+def iter_parser_results(scraper_name: str, data_dir: str, **parser_options) -> Iterator["PremiseDetails"]:
+    parser = get_parser(scraper_name, data_dir, **parser_options)
+    yield from parser.iter_results()
+    log_failures(parser)
+
+def iter_parser_records(scraper_name: str, data_dir: str, **parser_options) -> Iterator["PremiseRecord"]:
+    parser = get_parser(scraper_name, data_dir, **parser_options)
+    yield from parser.iter_records()
+    log_failures(parser)
+
+def log_failures(parser: "ParserBase"):
+    for failure in parser.get_failures():
+        logger.warning(f"Skipped home {failure.home}: {failure.reason}")
+
+def write_jsonl(results: Iterator["PremiseDetails"], f) -> int:
+    """
+    Writes 1 json record per line as results arrive, returns the number of records written
+    """
+    metrics = active()
+    count = 0
+    for r in results:
+        with metrics.stage("output"):
+            f.write(r.model_dump_json())
+            f.write("\n")
+        count += 1
+    return count
+
+def write_records_jsonl(records: Iterator["PremiseRecord"], f) -> int:
+    """
+    Writes the same lines as write_jsonl without building a PremiseDetails per line, returns the number of lines
+    """
+    metrics = active()
+    count = 0
+    for r in records:
+        with metrics.stage("output"):
+            f.write(r.to_json_lines())
+        count += len(r)
+    return count
+
+def print_parsers(ctx: click.Context, param: click.Parameter, value: bool):
+    if not value or ctx.resilient_parsing:
+        return
+    for p in list_parsers():
+        click.echo(f"{p.name}\t{p.target}\t{p.source}")
+    ctx.exit()
 
 @click.command(help="Saves data from scraper into the database")
 @click.option("--scraper_name", help="name of scraper", default=None)
 @click.option("--data", help="Path to data directory", default="./puppeteer_crawler/data", type=click.Path(exists=True))
 @click.option("--to_json", is_flag=True, help="Format the ouput as json", default=True)
 @click.option("--out", help="Outpath for data", default=None, type=click.Path())
-def cli(scraper_name: Optional[str], data: str, to_json: bool, out: str):
-    if scraper_name is not None:
-        results = get_parser_results(scraper_name, data)
-
-        if to_json:
-            results = json.dumps([json.loads(m.model_dump_json()) for m in results])
-
-        if out:
-            with open(out, 'w') as f:
-                f.write(results)
-        else:
-            print(results)
+@click.option("--workers", help="Number of processes to parse homes with", default=1, type=click.IntRange(min=1))
+@click.option(
+    "--format",
+    "out_format",
+    help="json writes 1 array once parsing finishes, jsonl streams 1 record per line as homes are parsed, "
+        "parquet streams record batches into a dataset directory partitioned by county and year assessed",
+    default="json",
+    type=click.Choice(["json", "jsonl", "parquet"]))
+@click.option("--incremental", is_flag=True, help="Only parse homes that changed since the last run", default=False)
+@click.option(
+    "--cache_dir",
+    help="Where incremental parse results are kept, defaults to .parse_cache in the data directory",
+    default=None,
+    type=click.Path())
+@click.option(
+    "--html_backend",
+    help="How pages are parsed, all backends give the same results",
+    default=DEFAULT_HTML_BACKEND,
+    type=click.Choice(HTML_BACKENDS))
+@click.option(
+    "--metrics_out",
+    help="Also save the run's stage timings and counts to this json file",
+    default=None,
+    type=click.Path())
+@click.option("--max_homes", help="Only parse the first N homes, to profile a sample of a session", default=None, type=click.IntRange(min=1))
+@click.option(
+    "--merge",
+    is_flag=True,
+    help="Parse every session of the scraper instead of the latest, homes in several sessions are parsed from the "
+        "newest and records are deduplicated on parcel number and year assessed",
+    default=False)
+@click.option("--session", help="Sessions to merge, repeatable, defaults to every session", multiple=True)
+@click.option(
+    "--list_parsers",
+    is_flag=True,
+    help="Print the parsers --scraper_name can name, where they're loaded from, and exit",
+    expose_value=False,
+    is_eager=True,
+    callback=print_parsers)
+@profile_options
+def cli(
+        scraper_name: Optional[str],
+        data: str,
+        to_json: bool,
+        out: str,
+        workers: int,
+        out_format: str,
+        incremental: bool,
+        cache_dir: Optional[str],
+        html_backend: str,
+        metrics_out: Optional[str],
+        max_homes: Optional[int],
+        merge: bool,
+        session: tuple,
+        profile: Optional[str],
+        profile_top: int,
+        profiler: str):
+    if incremental and cache_dir is None:
+        cache_dir = os.path.join(data, ".parse_cache")
+    elif not incremental:
+        cache_dir = None
+
+    if out_format == "parquet" and not out:
+        raise click.UsageError("--format parquet writes a dataset directory, pass it with --out")
+
+    if profile is not None and workers > 1:
+        logger.warning("Parsing in process while profiling, pool workers aren't profiled")
+        workers = 1
+
+    metrics = Metrics()
+    parser_options = dict(
+        workers=workers,
+        cache_dir=cache_dir,
+        html_backend=html_backend,
+        metrics=metrics,
+        max_homes=max_homes,
+        merge_sessions=merge or len(session) > 0,
+        session_ids=list(session) or None)
+
+    with maybe_profiled(profile, profile_top, profiler), metrics.activate(), metrics.stage("total"):
+        if scraper_name is not None and out_format == "parquet":
+            from house_trend_discovery.data_gen.dataset.parquet import write_parquet
+
+            records = iter_parser_records(scraper_name, data, **parser_options)
+            count = write_parquet(records, out)
+            logger.info(f"Wrote {count} records to {out}")
+        elif scraper_name is not None and out_format == "jsonl":
+            records = iter_parser_records(scraper_name, data, **parser_options)
+            if out:
+                with open(out, 'w') as f:
+                    count = write_records_jsonl(records, f)
+            else:
+                count = write_records_jsonl(records, sys.stdout)
+            logger.info(f"Wrote {count} records")
+        elif scraper_name is not None:
+            parser = get_parser(scraper_name, data, **parser_options).run()
+            log_failures(parser)
+
+            with metrics.stage("output"):
+                results = parser.to_json() if to_json else parser.get_results()
+
+                if out:
+                    with open(out, 'w') as f:
+                        f.write(results)
+                else:
+                    print(results)
+
+    logger.info(f"Run metrics, stage seconds from pool workers are summed across workers\n{metrics.summary()}")
+    if metrics_out:
+        metrics.save(metrics_out)
 
 if __name__ == "__main__":
     cli()
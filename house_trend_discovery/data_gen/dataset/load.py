@@ -0,0 +1,299 @@
+import click
+import csv
+import io
+import json
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from house_trend_discovery.data_gen import trend_aggregates
+from house_trend_discovery.data_gen.create_db_engine import get_engine
+from house_trend_discovery.data_gen.dataset.dataset import iter_parser_results
+from house_trend_discovery.data_gen.models import PremiseDetails, County
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Bulk loads PremiseDetails into postgres. Rows are written in batches with COPY, counties are
+deduplicated into the county table once and premise locations are sent as EWKT so postgis builds the
+geography points server side
+
+Each batch is copied into temp staging tables and upserted on the premise key, county, parcel number or the
+lowercased address without one, and year assessed. Loading a session again updates its rows instead of
+duplicating them, and replaces their assessment urls
+"""
+
+PREMISE_COLUMNS = [
+    "id",
+    "county_id",
+    "premise_address",
+    "year_assessed",
+    "dollar_value",
+    "premise_location",
+    "parcel_number",
+    "sq_feet",
+    "year_built",
+    "bed_count",
+    "bath_count",
+    "failure_reason",
+]
+
+ASSESSMENT_URL_COLUMNS = ["id", "premise_id", "url"]
+
+# COPY reads unquoted \N as NULL, so empty strings survive as empty strings
+NULL = "\\N"
+
+# the expression of ux_premise_details_premise_year
+PREMISE_KEY = "county_id, (coalesce(parcel_number, lower(premise_address))), year_assessed"
+
+# seq is the row's place in the batch, the last row of a premise and year wins
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE premise_staging (LIKE premise_details INCLUDING DEFAULTS, seq bigint) ON COMMIT DROP;
+CREATE TEMP TABLE assessment_url_staging (LIKE assessment_urls INCLUDING DEFAULTS) ON COMMIT DROP;
+"""
+
+UPSERT_PREMISES_SQL = f"""
+INSERT INTO premise_details ({", ".join(PREMISE_COLUMNS)})
+SELECT DISTINCT ON ({PREMISE_KEY}) {", ".join(PREMISE_COLUMNS)}
+FROM premise_staging
+ORDER BY {PREMISE_KEY}, seq DESC
+ON CONFLICT ({PREMISE_KEY}) DO UPDATE SET
+    {", ".join(f"{c} = EXCLUDED.{c}" for c in PREMISE_COLUMNS if c not in ("id", "county_id", "year_assessed"))}
+"""
+
+# staged rows -> the id of the premise_details row they were upserted into
+STAGED_PREMISE_IDS_SQL = """
+SELECT s.id AS staged_id, p.id AS premise_id
+FROM premise_staging s
+JOIN premise_details p
+  ON p.county_id = s.county_id
+ AND coalesce(p.parcel_number, lower(p.premise_address)) = coalesce(s.parcel_number, lower(s.premise_address))
+ AND p.year_assessed = s.year_assessed
+"""
+
+REPLACE_URLS_SQL = f"""
+WITH staged AS ({STAGED_PREMISE_IDS_SQL}), deleted AS (
+    DELETE FROM assessment_urls a
+    USING staged
+    WHERE a.premise_id = staged.premise_id
+)
+INSERT INTO assessment_urls (id, premise_id, url)
+SELECT DISTINCT ON (staged.premise_id, u.url) u.id, staged.premise_id, u.url
+FROM assessment_url_staging u
+JOIN staged ON staged.staged_id = u.premise_id
+"""
+
+class BulkLoader:
+    def __init__(self, batch_size: int = 10000):
+        self.batch_size = batch_size
+        self.county_ids: dict[Tuple[str, str], uuid.UUID] = {}
+        # (name, state) of every county that got new rows
+        self.loaded_counties: set[Tuple[str, str]] = set()
+        # (name, state) -> years assessed of the new rows, the trend aggregates to refresh
+        self.loaded_years: dict[Tuple[str, str], set[int]] = {}
+        self.rows_loaded = 0
+        self.seconds_loading = 0.0
+
+    def load(self, results: Iterable[PremiseDetails]) -> int:
+        """
+        Loads results in batches, each batch is committed in its own transaction.
+        Returns the number of premise rows loaded
+        """
+        connection = get_engine().raw_connection()
+        try:
+            self._load_county_ids(connection)
+
+            start = time.perf_counter()
+            for batch in batched(results, self.batch_size):
+                self._load_batch(connection, batch)
+                self.seconds_loading = time.perf_counter() - start
+                logger.info(f"Loaded {self.rows_loaded} rows, {self.rows_per_second():.0f} rows/sec")
+        finally:
+            connection.close()
+
+        return self.rows_loaded
+
+    def rows_per_second(self) -> float:
+        if self.seconds_loading == 0:
+            return 0.0
+        return self.rows_loaded / self.seconds_loading
+
+    def _load_county_ids(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, name, state FROM county")
+            for (county_id, name, state) in cursor.fetchall():
+                self.county_ids[(name, state)] = uuid.UUID(str(county_id))
+
+    def _get_county_id(self, cursor, county: County) -> uuid.UUID:
+        key = (county.name, county.state)
+        if key not in self.county_ids:
+            cursor.execute(
+                "INSERT INTO county (id, name, state) VALUES (%s, %s, %s) "
+                "ON CONFLICT (name, state) DO NOTHING",
+                (str(uuid.uuid4()), county.name, county.state)
+            )
+            cursor.execute("SELECT id FROM county WHERE name = %s AND state = %s", key)
+            self.county_ids[key] = uuid.UUID(str(cursor.fetchone()[0]))
+        return self.county_ids[key]
+
+    def _load_batch(self, connection, batch: List[PremiseDetails]):
+        premise_rows = io.StringIO()
+        url_rows = io.StringIO()
+        premise_writer = csv.writer(premise_rows)
+        url_writer = csv.writer(url_rows)
+
+        try:
+            with connection.cursor() as cursor:
+                for (seq, r) in enumerate(batch):
+                    premise_id = uuid.uuid4()
+                    county_id = self._get_county_id(cursor, r.county)
+                    premise_writer.writerow(to_premise_row(premise_id, county_id, r) + [seq])
+                    for url in r.assessment_urls:
+                        if url is not None:
+                            url_writer.writerow([uuid.uuid4(), premise_id, url])
+
+                premise_rows.seek(0)
+                url_rows.seek(0)
+                cursor.execute(CREATE_STAGING_SQL)
+                cursor.copy_expert(copy_statement("premise_staging", PREMISE_COLUMNS + ["seq"]), premise_rows)
+                cursor.copy_expert(copy_statement("assessment_url_staging", ASSESSMENT_URL_COLUMNS), url_rows)
+                cursor.execute(UPSERT_PREMISES_SQL)
+                cursor.execute(REPLACE_URLS_SQL)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            # counties inserted in the failed transaction are gone too
+            self.county_ids = {}
+            self._load_county_ids(connection)
+            raise
+
+        self.rows_loaded += len(batch)
+        for r in batch:
+            key = (r.county.name, r.county.state)
+            self.loaded_counties.add(key)
+            self.loaded_years.setdefault(key, set()).add(r.year_assessed)
+
+    def refresh_trend_aggregates(self, cell_miles: float = trend_aggregates.DEFAULT_CELL_MILES) -> int:
+        """
+        Recomputes the trend aggregates of only the counties and years that got new rows
+        """
+        return trend_aggregates.refresh(sorted(self.loaded_counties), self.loaded_years, cell_miles)
+
+def notify_ingested(api_url: str, counties: Iterable[Tuple[str, str]], token: Optional[str] = None):
+    """
+    Tells the api server to drop cached responses for the counties that were just loaded,
+    token is the server's CACHE_INVALIDATE_TOKEN
+    """
+    headers = {"X-Cache-Token": token} if token else {}
+    for (name, state) in counties:
+        query = urllib.parse.urlencode({"county": name, "state": state})
+        request = urllib.request.Request(
+            f"{api_url.rstrip('/')}/cache/invalidate?{query}", method="POST", headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                logger.info(f"Invalidated cache for {name}, {state}: {response.read().decode('utf-8')}")
+        except Exception as e:
+            logger.warning(f"Failed to invalidate api cache for {name}, {state}: {e}")
+
+def copy_statement(table: str, columns: List[str]) -> str:
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+
+def to_premise_row(premise_id: uuid.UUID, county_id: uuid.UUID, r: PremiseDetails) -> list:
+    location = f"SRID=4326;POINT({r.premise_location.lng} {r.premise_location.lat})"
+    return [
+        premise_id,
+        county_id,
+        r.premise_address,
+        r.year_assessed,
+        r.dollar_value,
+        location,
+        null_if_none(r.parcel_number),
+        null_if_none(r.sq_feet),
+        null_if_none(r.year_built),
+        null_if_none(r.bed_count),
+        null_if_none(r.bath_count),
+        null_if_none(r.failure_reason),
+    ]
+
+def null_if_none(v):
+    if v is None:
+        return NULL
+    return v
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def iter_file_results(path: str) -> Iterator[PremiseDetails]:
+    """
+    Reads the output of dataset.py, either 1 json array or json lines
+    """
+    with open(path, 'r') as f:
+        first_char = f.read(1)
+        while first_char.isspace():
+            first_char = f.read(1)
+        f.seek(0)
+
+        if first_char == '[':
+            for r in json.load(f):
+                yield PremiseDetails(**r)
+        else:
+            for line in f:
+                if line.strip():
+                    yield PremiseDetails.model_validate_json(line)
+
+@click.command(help="Bulk loads parsed premise details into the database")
+@click.option("--scraper_name", help="name of scraper to parse and load", default=None)
+@click.option("--data", help="Path to data directory", default="./puppeteer_crawler/data", type=click.Path(exists=True))
+@click.option("--i", "in_path", help="Load output of dataset.py instead of parsing", default=None, type=click.Path(exists=True))
+@click.option("--workers", help="Number of processes to parse homes with", default=1, type=click.IntRange(min=1))
+@click.option("--batch_size", help="Rows per COPY batch", default=10000, type=click.IntRange(min=1))
+@click.option("--notify_url", help="Base url of the api server to invalidate cached counties on", default=None)
+@click.option(
+    "--notify_token",
+    help="The api server's CACHE_INVALIDATE_TOKEN, sent with --notify_url",
+    default=None,
+    envvar="CACHE_INVALIDATE_TOKEN")
+@click.option(
+    "--refresh_trends/--no-refresh_trends",
+    help="Recompute the trend aggregates of the loaded counties and years",
+    default=True)
+@click.option(
+    "--cell_miles",
+    help="Grid cell size of the trend aggregates",
+    default=trend_aggregates.DEFAULT_CELL_MILES,
+    type=click.FloatRange(min=0, min_open=True))
+def cli(
+        scraper_name: Optional[str],
+        data: str,
+        in_path: Optional[str],
+        workers: int,
+        batch_size: int,
+        notify_url: Optional[str],
+        notify_token: Optional[str],
+        refresh_trends: bool,
+        cell_miles: float):
+    if in_path is not None:
+        results = iter_file_results(in_path)
+    elif scraper_name is not None:
+        results = iter_parser_results(scraper_name, data, workers=workers)
+    else:
+        raise click.UsageError("One of --scraper_name or --i is required")
+
+    loader = BulkLoader(batch_size=batch_size)
+    count = loader.load(results)
+    logger.info(f"Finished loading {count} rows in {loader.seconds_loading:.1f}s, {loader.rows_per_second():.0f} rows/sec")
+
+    if refresh_trends:
+        aggregates = loader.refresh_trend_aggregates(cell_miles)
+        logger.info(f"Refreshed {aggregates} trend aggregates")
+
+    if notify_url is not None:
+        notify_ingested(notify_url, sorted(loader.loaded_counties), notify_token)
+
+if __name__ == "__main__":
+    cli()
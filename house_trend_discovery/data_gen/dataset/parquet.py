@@ -0,0 +1,123 @@
+from itertools import chain, repeat
+from typing import Iterable, Iterator, List
+from house_trend_discovery.data_gen.models import PremiseRecord
+from house_trend_discovery.metrics import active
+
+"""
+Writes PremiseRecords as a parquet dataset, 1 row per year assessed like PremiseDetails, partitioned by county and year assessed,
+
+    {out}/county_state=Washington/county_name=King%20County/year_assessed=2020/part-0.parquet
+
+partition values are url encoded in the paths, so queries over a county or a range of years only read those files. Addresses and counties are dictionary
+encoded and locations are stored as float64 lat and lng columns
+
+pyarrow is an optional dependency, only imported when writing or reading parquet
+"""
+
+PARTITION_COLUMNS = ["county_state", "county_name", "year_assessed"]
+
+def get_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("premise_address", pa.dictionary(pa.int32(), pa.string())),
+        ("parcel_number", pa.string()),
+        ("dollar_value", pa.int64()),
+        ("lat", pa.float64()),
+        ("lng", pa.float64()),
+        ("sq_feet", pa.int32()),
+        ("year_built", pa.int32()),
+        ("bed_count", pa.int32()),
+        ("bath_count", pa.float64()),
+        ("assessment_urls", pa.list_(pa.string())),
+        ("failure_reason", pa.string()),
+        ("county_state", pa.dictionary(pa.int32(), pa.string())),
+        ("county_name", pa.dictionary(pa.int32(), pa.string())),
+        ("year_assessed", pa.int32()),
+    ])
+
+def get_partition_schema():
+    import pyarrow as pa
+
+    schema = get_schema()
+    return pa.schema([schema.field(c) for c in PARTITION_COLUMNS])
+
+def to_record_batch(records: List[PremiseRecord], schema):
+    import pyarrow as pa
+
+    def per_year(values: Iterable) -> list:
+        # each premise's value repeated once per year it was assessed
+        return list(chain.from_iterable(repeat(v, len(r)) for (r, v) in zip(records, values)))
+
+    columns = {
+        "premise_address": per_year(r.premise_address for r in records),
+        "parcel_number": per_year(r.parcel_number for r in records),
+        "dollar_value": list(chain.from_iterable(r.dollar_values for r in records)),
+        "lat": per_year(float(r.premise_location.lat) for r in records),
+        "lng": per_year(float(r.premise_location.lng) for r in records),
+        "sq_feet": per_year(r.sq_feet for r in records),
+        "year_built": per_year(r.year_built for r in records),
+        "bed_count": per_year(r.bed_count for r in records),
+        "bath_count": per_year(r.bath_count for r in records),
+        "assessment_urls": per_year(r.assessment_urls for r in records),
+        "failure_reason": per_year(r.failure_reason for r in records),
+        "county_state": per_year(r.county.state for r in records),
+        "county_name": per_year(r.county.name for r in records),
+        "year_assessed": list(chain.from_iterable(r.years_assessed for r in records)),
+    }
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+def iter_record_batches(records: Iterable[PremiseRecord], batch_size: int, schema) -> Iterator:
+    """
+    Batches of about batch_size rows, a premise's years are never split across batches
+    """
+    batch = []
+    rows = 0
+    for r in chain(records, [None]):
+        if r is not None:
+            batch.append(r)
+            rows += len(r)
+        if rows > 0 and (rows >= batch_size or r is None):
+            with active().stage("output"):
+                record_batch = to_record_batch(batch, schema)
+            yield record_batch
+            batch = []
+            rows = 0
+
+def write_parquet(records: Iterable[PremiseRecord], out_dir: str, batch_size: int = 50000) -> int:
+    """
+    Streams records into the dataset batch by batch, returns the number of rows written
+    """
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise Exception("Parquet output needs pyarrow, pip install pyarrow")
+
+    schema = get_schema()
+
+    count = 0
+    def counted(batches):
+        nonlocal count
+        for b in batches:
+            count += b.num_rows
+            yield b
+
+    ds.write_dataset(
+        counted(iter_record_batches(records, batch_size, schema)),
+        out_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(get_partition_schema(), flavor="hive"),
+        existing_data_behavior="delete_matching",
+        max_rows_per_group=batch_size,
+    )
+    return count
+
+def read_parquet(out_dir: str):
+    """
+    Reads the dataset back as a pyarrow Table, partition columns come back dictionary encoded
+    """
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(get_partition_schema(), flavor="hive", dictionaries="infer")
+    return ds.dataset(out_dir, format="parquet", partitioning=partitioning).to_table()
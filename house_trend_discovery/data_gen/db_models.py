@@ -0,0 +1,89 @@
+from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy import BigInteger, Column, Float, ForeignKey, Index, Integer, UniqueConstraint, Uuid, text
+from sqlalchemy.ext.declarative import declarative_base
+from typing import Optional, List
+from geoalchemy2 import Geography
+
+"""
+SQLAlchemy models, the pydantic models the parsers produce live in models.py
+The schema is managed by migrate.py, importing this does not touch the database
+"""
+
+OrmBase = declarative_base()
+
+class CountyModel(OrmBase):
+    __tablename__ = 'county'
+    __table_args__ = (UniqueConstraint('name', 'state'),)
+    id = Column('id', Uuid, primary_key=True)
+    name: Mapped[str]
+    state: Mapped[str]
+    premise_details: Mapped[List["PremiseDetailsModel"]] = relationship(back_populates="county")
+
+class AssessmentUrlModel(OrmBase):
+    __tablename__ = 'assessment_urls'
+    id = Column('id', Uuid, primary_key=True)
+    premise_id = Column(Uuid, ForeignKey('premise_details.id', ondelete="CASCADE"))
+    url: Mapped[str]
+    premise_details: Mapped["PremiseDetailsModel"] = relationship(back_populates="assessment_urls")
+
+class PremiseDetailsModel(OrmBase):
+    __tablename__ = 'premise_details'
+    __table_args__ = (
+        # radius queries, ST_DWithin on premise_location
+        Index('ix_premise_details_premise_location', 'premise_location', postgresql_using='gist'),
+        Index('ix_premise_details_year_assessed', 'year_assessed', 'id'),
+        # lookups by address are case insensitive
+        Index('ix_premise_details_address_key', text('lower(premise_address)'), 'year_assessed'),
+        Index('ix_premise_details_parcel_number', 'parcel_number', 'year_assessed'),
+        # 1 row per premise per year, load.py upserts on it. Premises without a parcel number are keyed by address
+        Index(
+            'ux_premise_details_premise_year',
+            'county_id',
+            text('coalesce(parcel_number, lower(premise_address))'),
+            'year_assessed',
+            unique=True),
+    )
+
+    id = Column('id', Uuid, primary_key=True)
+    assessment_urls: Mapped[List["AssessmentUrlModel"]] = relationship(
+        cascade="all,delete,delete-orphan", back_populates="premise_details", passive_deletes=True
+    )
+    premise_address: Mapped[str]
+    year_assessed: Mapped[int]
+    dollar_value: Mapped[int]
+    county_id = Column(Uuid, ForeignKey('county.id'))
+    county: Mapped["CountyModel"] = relationship(back_populates="premise_details")
+    premise_location = Column('premise_location', Geography('POINT', srid=4326, spatial_index=False))
+
+    parcel_number: Mapped[Optional[str]] = None
+    sq_feet: Mapped[Optional[int]] = None
+    year_built: Mapped[Optional[int]] = None
+    bed_count: Mapped[Optional[int]] = None
+    bath_count: Mapped[Optional[float]] = None
+    failure_reason: Mapped[Optional[str]] = None
+
+class TrendAggregateModel(OrmBase):
+    """
+    dollar_value stats of the premises in 1 grid cell of a county in 1 year, kept up to date by
+    trend_aggregates.py when sessions are loaded. Cells are the grid of trends.grid_cells
+    """
+    __tablename__ = 'trend_aggregates'
+    __table_args__ = (
+        # radius queries, ST_DWithin on the cell center
+        Index('ix_trend_aggregates_cell_center', 'cell_center', postgresql_using='gist'),
+    )
+
+    county_id = Column(Uuid, ForeignKey('county.id', ondelete="CASCADE"), primary_key=True)
+    year_assessed = Column(Integer, primary_key=True)
+    cell_row = Column(BigInteger, primary_key=True)
+    cell_col = Column(BigInteger, primary_key=True)
+    cell_miles = Column(Float, nullable=False)
+    cell_center = Column('cell_center', Geography('POINT', srid=4326, spatial_index=False), nullable=False)
+
+    count = Column(Integer, nullable=False)
+    mean = Column(Float, nullable=False)
+    median = Column(Float, nullable=False)
+    p10 = Column(Float, nullable=False)
+    p25 = Column(Float, nullable=False)
+    p75 = Column(Float, nullable=False)
+    p90 = Column(Float, nullable=False)
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+from house_trend_discovery.data_gen.models import Location
+from house_trend_discovery.data_gen.parsers.archive import ARCHIVE_SUFFIX, SessionArchive
+
+"""
+Drops addresses that would make the crawler scrape the same home twice, either because neighboring
+coordinates reverse geocoded to the same address or because an earlier session already scraped it
+"""
+
+# USPS standard abbreviations for the words that are spelled both ways in geocoded addresses
+ABBREVIATIONS = {
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "ROAD": "RD",
+    "DRIVE": "DR",
+    "BOULEVARD": "BLVD",
+    "LANE": "LN",
+    "PLACE": "PL",
+    "COURT": "CT",
+    "CIRCLE": "CIR",
+    "TERRACE": "TER",
+    "PARKWAY": "PKWY",
+    "HIGHWAY": "HWY",
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+    "NORTHEAST": "NE",
+    "NORTHWEST": "NW",
+    "SOUTHEAST": "SE",
+    "SOUTHWEST": "SW",
+    "APARTMENT": "APT",
+    "SUITE": "STE",
+}
+
+SCRAPED_INDEX_FILE = ".scraped_addresses.json"
+
+def normalize_address(address: str) -> str:
+    """
+    Uppercases, drops punctuation and the country and abbreviates street types and directions,
+    so "123 Main Street, Seattle, WA 98101, USA" and "123 main st seattle wa 98101" match
+    """
+    address = address.upper()
+    address = re.sub(r',\s*(USA|UNITED STATES)\s*$', '', address)
+    address = re.sub(r'[^\w\s]', ' ', address)
+    words = [ABBREVIATIONS.get(w, w) for w in address.split()]
+    return " ".join(words)
+
+def dedupe_locations(locations: Iterable[Location], skip: Set[str] = frozenset()) -> List[Location]:
+    """
+    Keeps the first location for each normalized address, dropping any in skip
+    """
+    seen = set(skip)
+    results = []
+    for l in locations:
+        key = normalize_address(l.address)
+        if key not in seen:
+            seen.add(key)
+            results.append(l)
+    return results
+
+class ScrapedAddresses:
+    """
+    The normalized addresses of every home in the crawler's data directory, persisted next to the sessions
+    so only new or still growing sessions are read again
+    """
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.index_path = os.path.join(data_dir, SCRAPED_INDEX_FILE)
+        # session_id -> {"mtime_ns": session dir mtime, "complete": every home had inputs, "addresses": [...]}
+        self.sessions: Dict[str, dict] = {}
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.sessions = json.load(f)
+
+    def refresh(self) -> Set[str]:
+        """
+        Re-reads sessions that are new or changed since the index was saved, returns every scraped address
+        """
+        if not os.path.isdir(self.data_dir):
+            return set()
+
+        current = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    read_addresses = read_session_addresses
+                elif entry.name.endswith(ARCHIVE_SUFFIX) and entry.is_file():
+                    read_addresses = read_archive_addresses
+                else:
+                    continue
+                mtime_ns = entry.stat().st_mtime_ns
+                indexed = self.sessions.get(entry.name)
+                if indexed is not None and indexed["mtime_ns"] == mtime_ns and indexed["complete"]:
+                    current[entry.name] = indexed
+                else:
+                    (addresses, complete) = read_addresses(entry.path)
+                    current[entry.name] = {"mtime_ns": mtime_ns, "complete": complete, "addresses": addresses}
+
+        self.sessions = current
+        self._save()
+        return set(a for s in self.sessions.values() for a in s["addresses"])
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sessions, f)
+        os.replace(tmp_path, self.index_path)
+
+def read_session_addresses(session_dir: str) -> Tuple[List[str], bool]:
+    """
+    Returns the session's addresses and whether every home had readable inputs
+    """
+    addresses = set()
+    complete = True
+    with os.scandir(session_dir) as homes:
+        for home in homes:
+            if not home.is_dir():
+                continue
+            inputs_path = os.path.join(home.path, "inputs", "inputs.json")
+            try:
+                with open(inputs_path, 'r') as f:
+                    addresses.add(normalize_address(json.load(f)["address"]))
+            except Exception:
+                # the crawler hasn't written inputs for this home yet, read the session again next time
+                complete = False
+    return (sorted(addresses), complete)
+
+def read_archive_addresses(archive_path: str) -> Tuple[List[str], bool]:
+    """
+    Like read_session_addresses for a packed session, see parsers/archive.py. Archives are only written
+    once the session is done, so they're always complete
+    """
+    archive = SessionArchive(archive_path)
+    addresses = set()
+    for member in archive.members.keys():
+        if member.endswith("/inputs/inputs.json"):
+            addresses.add(normalize_address(json.loads(archive.read(member))["address"]))
+    return (sorted(addresses), True)
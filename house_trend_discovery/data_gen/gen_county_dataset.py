@@ -1,20 +1,26 @@
 import click
-import googlemaps
+from functools import lru_cache
 import itertools
 import json
-from latloncalc.latlon import LatLon, Latitude, Longitude
 import os
-from models import Area, LatLng, Location, County
+import sys
+from models import Area, LatLng, Location, LocationList, County
 from dotenv import load_dotenv
 load_dotenv()
 
-gmaps = googlemaps.Client(key=os.environ['GOOGLE_CLOUD_API_KEY'])
+"""
+googlemaps, geocoding and the lattice are imported by the commands that call the api, house_info and --help
+run without GOOGLE_CLOUD_API_KEY set
+"""
+
+@lru_cache(maxsize=1)
+def get_gmaps():
+    import googlemaps
 
-def get_address_from_lat_lng(latlng):
-    addresses = gmaps.reverse_geocode(latlng.to_string())
-    if len(addresses) > 0:
-        return addresses[0]
-    return None
+    key = os.environ.get('GOOGLE_CLOUD_API_KEY')
+    if not key:
+        raise click.UsageError("Set GOOGLE_CLOUD_API_KEY, in the environment or .env, to call the google maps api")
+    return googlemaps.Client(key=key)
 
 def get_county(a):
     county_index = next((i for i in range(len(a['address_components'])) if 'County' in a['address_components'][i]['long_name']), None)
@@ -46,7 +52,7 @@ https://developers.google.com/maps/documentation/geocoding/requests-geocoding#ge
 returns the lat lng of the boundary and the center
 """
 def get_location_data(name: str) -> list[Area]:
-    locations = gmaps.geocode(name)
+    locations = get_gmaps().geocode(name)
     results = [create_area_result(name, l) for l in locations]
     return results
 
@@ -67,8 +73,15 @@ def create_area_result(query, l):
 """
 This generates a house price dataset for a lat lng boundary
 at D increments, retrieves addresses via the google maps reverse geocoding API
+
+grid
+    square, hex - a lattice covering the whole bounding box
+    rays - points along 8 rays from the center of the area
 """
-def get_addresses(d, area):
+def get_addresses(d, area, geocoder, grid: str = "square"):
+    from latloncalc.latlon import LatLon
+    from lattice import generate_lattice
+
     def select_coords_in_heading(d, start, finish):
         # generates coorindates until current coordinate >= finish
         # generates coords until step is longer than start to finish
@@ -115,9 +128,14 @@ def get_addresses(d, area):
 
 
 
-    lat_lngs = generate_lat_lngs(d, area)
+    if grid == "rays":
+        lat_lngs = [(float(l.lat), float(l.lon)) for l in generate_lat_lngs(d, area)]
+    else:
+        lattice = generate_lattice(
+            area.sw_bound.lat, area.sw_bound.lng, area.ne_bound.lat, area.ne_bound.lng, d, shape=grid)
+        lat_lngs = [(lat, lng) for (lat, lng) in lattice.tolist()]
 
-    addresses = [get_address_from_lat_lng(l) for l in lat_lngs]
+    addresses = geocoder.reverse_geocode_all(lat_lngs)
     return [create_location_result(a) for a in addresses if a is not None]
 
 """
@@ -125,16 +143,40 @@ This generates a dataset of house addresses inside an area
 """
 @click.command()
 @click.option('--name', help='Area name', required=True)
-@click.option('--d', help='Mile increments in which to get addresses', default=1)
+@click.option('--d', help='Mile increments in which to get addresses', default=1.0)
+@click.option(
+    '--grid',
+    help='square or hex lattice over the whole area, or rays out from its center',
+    default='square',
+    type=click.Choice(['square', 'hex', 'rays']))
 @click.option('--out', default='/dev/stdout', help='Write out to path')
-def gen_addrs(name, d, out):
+@click.option('--workers', default=8, help='Number of concurrent reverse geocoding requests')
+@click.option('--qps', default=40.0, help='Max reverse geocoding requests per second')
+@click.option('--cache', default='.geocode_cache.sqlite', help='Reverse geocoding cache file, reused across runs')
+@click.option('--data', default='./puppeteer_crawler/data', help='Crawler data directory, to skip already scraped addresses')
+@click.option('--skip_scraped/--no-skip_scraped', default=True, help='Drop addresses earlier sessions already scraped')
+def gen_addrs(name, d, grid, out, workers, qps, cache, data, skip_scraped):
+    from dedupe import ScrapedAddresses, dedupe_locations
+    from geocode import Geocoder, GeocodeCache
+
     results = get_location_data(name)
     area = results[0]
 
+    geocode_cache = GeocodeCache(cache)
+    geocoder = Geocoder(get_gmaps(), cache=geocode_cache, workers=workers, queries_per_second=qps)
+
     # get addresses in increments
-    res = get_addresses(d, area)
+    res = get_addresses(d, area, geocoder, grid)
+    geocode_cache.close()
+    print(f"Reverse geocoded with {geocoder.api_calls} api calls, {geocoder.cache_hits} cache hits", file=sys.stderr)
+
+    scraped = ScrapedAddresses(data).refresh() if skip_scraped else set()
+    unique_res = dedupe_locations(res, skip=scraped)
+    print(f"Kept {len(unique_res)} of {len(res)} addresses after dropping duplicates and already scraped", file=sys.stderr)
+    res = unique_res
+
     with open(out, 'w') as f:
-        f.write(json.dumps([json.loads(r.model_dump_json()) for r in res]))
+        f.write(LocationList.dump_json(res).decode())
 
 @click.command(help='Retrieves historical house data for addresses in input file. Addresses must follow Location schema')
 @click.option('--i', help='File to read Locations data from', type=click.Path(exists=True))
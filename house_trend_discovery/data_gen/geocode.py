@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Protocol, Tuple
+from googlemaps.exceptions import ApiError, HTTPError, Timeout, TransportError
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Reverse geocodes many coordinates at once. Lookups run on a thread pool, are rate limited to the api quota,
+retried with backoff and saved to an on disk cache, so repeat runs don't pay for the same coordinates twice
+"""
+
+LatLngPair = Tuple[float, float]
+
+# api statuses worth retrying, everything else fails the lookup
+RETRYABLE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+class ReverseGeocodeClient(Protocol):
+    """
+    googlemaps.Client, or a fake of it in tests
+    """
+    def reverse_geocode(self, latlng: LatLngPair) -> list:
+        ...
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average, with bursts of up to `capacity`
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class GeocodeCache:
+    """
+    sqlite backed cache of reverse geocoding results keyed by lat lng rounded to `decimals` places.
+    Coordinates with no address are cached too
+    """
+    def __init__(self, path: str, decimals: int = 5):
+        self.decimals = decimals
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS reverse_geocode (key TEXT PRIMARY KEY, result TEXT)")
+        self.conn.commit()
+
+    def key(self, latlng: LatLngPair) -> str:
+        (lat, lng) = latlng
+        return f"{round(lat, self.decimals)},{round(lng, self.decimals)}"
+
+    def get(self, latlng: LatLngPair) -> Tuple[bool, Optional[dict]]:
+        """
+        Returns (found, result)
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM reverse_geocode WHERE key = ?", (self.key(latlng),)).fetchone()
+        if row is None:
+            return (False, None)
+        return (True, json.loads(row[0]))
+
+    def set(self, latlng: LatLngPair, result: Optional[dict]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO reverse_geocode (key, result) VALUES (?, ?)",
+                (self.key(latlng), json.dumps(result)))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class Geocoder:
+    def __init__(self,
+            client: ReverseGeocodeClient,
+            cache: Optional[GeocodeCache] = None,
+            workers: int = 8,
+            queries_per_second: float = 40,
+            max_retries: int = 5,
+            backoff_seconds: float = 0.5):
+        self.client = client
+        self.cache = cache
+        self.workers = workers
+        self.bucket = TokenBucket(queries_per_second)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.cache_hits = 0
+        self.api_calls = 0
+        self.counter_lock = threading.Lock()
+
+    def reverse_geocode_all(self, latlngs: List[LatLngPair]) -> List[Optional[dict]]:
+        """
+        Returns the first address for each coordinate in input order, None if there is none or the lookup failed
+        """
+        if self.workers <= 1:
+            return [self.reverse_geocode(l) for l in latlngs]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.reverse_geocode, latlngs))
+
+    def reverse_geocode(self, latlng: LatLngPair) -> Optional[dict]:
+        if self.cache is not None:
+            (found, cached) = self.cache.get(latlng)
+            if found:
+                with self.counter_lock:
+                    self.cache_hits += 1
+                return cached
+
+        try:
+            addresses = self._call_with_retries(latlng)
+        except Exception as e:
+            logger.error(f"Failed to reverse geocode {latlng}: {e}")
+            return None
+
+        result = addresses[0] if len(addresses) > 0 else None
+        if self.cache is not None:
+            self.cache.set(latlng, result)
+        return result
+
+    def _call_with_retries(self, latlng: LatLngPair) -> list:
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self.counter_lock:
+                self.api_calls += 1
+            try:
+                return self.client.reverse_geocode(latlng)
+            except (ApiError, HTTPError, Timeout, TransportError) as e:
+                retryable = not isinstance(e, ApiError) or e.status in RETRYABLE_STATUSES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                # exponential backoff with jitter so workers don't retry in lockstep
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
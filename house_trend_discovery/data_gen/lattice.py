@@ -0,0 +1,96 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+"""
+Generates evenly spaced coordinates over a lat lng bounding box in one batched numpy computation
+
+Distances use an equirectangular approximation, which is accurate to well under 1% at county scale. Longitude
+spacing is computed per row, so points stay d miles apart at every latitude
+"""
+
+KM_PER_MILE = 1.609344
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG_AT_EQUATOR = 111.320
+
+def generate_lattice(
+        sw_lat: float,
+        sw_lng: float,
+        ne_lat: float,
+        ne_lng: float,
+        d: float,
+        shape: str = "square",
+        tolerance: Optional[float] = None) -> np.ndarray:
+    """
+    Returns an (n, 2) array of [lat, lng] points spaced d miles apart covering the box
+
+    shape
+        square - rows and columns d miles apart
+        hex - every other row is shifted half a step, rows are d * sqrt(3) / 2 apart, so every point
+              is d miles from its 6 neighbors and no spot is further than d / sqrt(3) from a point
+    tolerance
+        points closer than this many miles are deduplicated. Lattice points are d apart by construction, so
+        this is off by default, set it when the lattice is merged with points from elsewhere
+    """
+    if d <= 0:
+        raise ValueError("d must be positive")
+    if shape not in ("square", "hex"):
+        raise ValueError(f"Unknown lattice shape {shape}")
+    if sw_lat > ne_lat or sw_lng > ne_lng:
+        raise ValueError(
+            f"Inverted bounding box, south west ({sw_lat}, {sw_lng}) must be south and west of north east ({ne_lat}, {ne_lng})")
+
+    d_km = d * KM_PER_MILE
+    row_spacing_km = d_km * np.sqrt(3) / 2 if shape == "hex" else d_km
+
+    # rows, south to north
+    lat_step = row_spacing_km / KM_PER_DEGREE_LAT
+    row_count = int(np.floor((ne_lat - sw_lat) / lat_step)) + 1
+    lats = sw_lat + np.arange(row_count) * lat_step
+
+    # each row has its own longitude step since meridians converge toward the poles
+    lng_steps = d_km / (KM_PER_DEGREE_LNG_AT_EQUATOR * np.cos(np.radians(lats)))
+    offsets = np.zeros(row_count)
+    if shape == "hex":
+        offsets[1::2] = lng_steps[1::2] / 2
+
+    col_count = int(np.floor((ne_lng - sw_lng) / lng_steps.min())) + 1
+    lngs = sw_lng + offsets[:, None] + np.arange(col_count)[None, :] * lng_steps[:, None]
+    lat_grid = np.broadcast_to(lats[:, None], lngs.shape)
+
+    in_box = lngs <= ne_lng
+    points = np.column_stack([lat_grid[in_box], lngs[in_box]])
+
+    if tolerance is not None:
+        return dedupe_points(points, tolerance)
+    return points
+
+def dedupe_points(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Drops points closer than tolerance miles to an earlier point that was kept, order is preserved.
+    Points are bucketed into tolerance sized cells and only measured against the kept points of the 9 cells
+    around them, so points on either side of a cell boundary are still compared
+    """
+    if len(points) == 0 or tolerance <= 0:
+        return points
+
+    tolerance_km = tolerance * KM_PER_MILE
+    mean_lat = np.radians(points[:, 0].mean())
+    xs = (points[:, 1] * KM_PER_DEGREE_LNG_AT_EQUATOR * np.cos(mean_lat)).tolist()
+    ys = (points[:, 0] * KM_PER_DEGREE_LAT).tolist()
+    cells = np.floor(np.column_stack([ys, xs]) / tolerance_km).astype(np.int64).tolist()
+
+    kept_by_cell: Dict[Tuple[int, int], List[int]] = {}
+    keep = np.zeros(len(points), dtype=bool)
+    tolerance_sq = tolerance_km * tolerance_km
+    for (i, (row, col)) in enumerate(cells):
+        (x, y) = (xs[i], ys[i])
+        is_near = any(
+            (xs[j] - x) ** 2 + (ys[j] - y) ** 2 < tolerance_sq
+            for dr in (-1, 0, 1)
+            for dc in (-1, 0, 1)
+            for j in kept_by_cell.get((row + dr, col + dc), ()))
+        if not is_near:
+            keep[i] = True
+            kept_by_cell.setdefault((row, col), []).append(i)
+
+    return points[keep]
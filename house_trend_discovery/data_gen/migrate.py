@@ -0,0 +1,113 @@
+import click
+from sqlalchemy import inspect, text
+from house_trend_discovery.data_gen.create_db_engine import get_engine
+from house_trend_discovery.data_gen.db_models import OrmBase
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Manages the database schema. Every command is safe to run more than once
+
+Databases created before the schema was managed here, by importing the old models.py, have no county_id on
+premise_details and no unique (name, state) on county. init-db adds them, their premise rows were never linked to a
+county so they can't be backfilled, init-db stops and asks for reset-db if there are any
+"""
+
+# the name postgres gives the UniqueConstraint on CountyModel
+COUNTY_UNIQUE_CONSTRAINT = "county_name_state_key"
+
+# keeps 1 row of each county, nothing referenced counties before county_id was added
+DELETE_DUPLICATE_COUNTIES_SQL = """
+DELETE FROM county c
+USING county newer
+WHERE c.name = newer.name
+  AND c.state = newer.state
+  AND c.ctid < newer.ctid
+"""
+
+ADD_COUNTY_UNIQUE_SQL = f"ALTER TABLE county ADD CONSTRAINT {COUNTY_UNIQUE_CONSTRAINT} UNIQUE (name, state)"
+
+ADD_PREMISE_COUNTY_ID_SQL = "ALTER TABLE premise_details ADD COLUMN IF NOT EXISTS county_id uuid REFERENCES county (id)"
+
+# keeps 1 row of each premise and year, the one stored last
+DELETE_DUPLICATE_PREMISES_SQL = """
+DELETE FROM premise_details p
+USING premise_details newer
+WHERE p.county_id = newer.county_id
+  AND coalesce(p.parcel_number, lower(p.premise_address)) = coalesce(newer.parcel_number, lower(newer.premise_address))
+  AND p.year_assessed = newer.year_assessed
+  AND p.ctid < newer.ctid
+"""
+
+def init_db():
+    """
+    Creates the postgis extension and any missing tables and indexes, existing data is kept
+    """
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+
+    OrmBase.metadata.create_all(engine, checkfirst=True)
+    upgrade_tables(engine)
+
+    if "ux_premise_details_premise_year" not in [i["name"] for i in inspect(engine).get_indexes("premise_details")]:
+        # loads before the unique index could write a premise's year more than once
+        with engine.begin() as conn:
+            deleted = conn.execute(text(DELETE_DUPLICATE_PREMISES_SQL)).rowcount
+        if deleted > 0:
+            logger.info(f"Deleted {deleted} duplicate premise_details rows")
+
+    # create_all only creates indexes along with new tables, add indexes declared on existing ones
+    for table in OrmBase.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def upgrade_tables(engine):
+    """
+    create_all doesn't change existing tables, adds what tables made by the old models.py are missing
+    """
+    inspector = inspect(engine)
+    county_unique = [set(c["column_names"]) for c in inspector.get_unique_constraints("county")]
+    if {"name", "state"} not in county_unique:
+        with engine.begin() as conn:
+            deleted = conn.execute(text(DELETE_DUPLICATE_COUNTIES_SQL)).rowcount
+            conn.execute(text(ADD_COUNTY_UNIQUE_SQL))
+        logger.info(f"Added unique (name, state) to county, deleted {deleted} duplicate counties")
+
+    if "county_id" not in [c["name"] for c in inspector.get_columns("premise_details")]:
+        with engine.begin() as conn:
+            conn.execute(text(ADD_PREMISE_COUNTY_ID_SQL))
+        logger.info("Added county_id to premise_details")
+
+    with engine.connect() as conn:
+        unlinked = conn.execute(text("SELECT count(*) FROM premise_details WHERE county_id IS NULL")).scalar()
+    if unlinked > 0:
+        raise Exception(
+            f"{unlinked} premise_details rows have no county_id, they were stored before premises were linked to "
+            "counties and can't be upgraded. Run migrate.py reset-db, which deletes all data, and load the sessions again")
+
+def drop_db():
+    OrmBase.metadata.drop_all(get_engine(), checkfirst=True)
+
+@click.command("init-db", help="Creates missing tables and indexes")
+def init_db_command():
+    init_db()
+    logger.info("Database schema is up to date")
+
+@click.command("reset-db", help="Drops every table and recreates the schema, deleting all data")
+@click.confirmation_option(prompt="This deletes all data, continue?")
+def reset_db_command():
+    drop_db()
+    init_db()
+    logger.info("Database schema was reset")
+
+@click.group()
+def cli():
+    pass
+
+cli.add_command(init_db_command)
+cli.add_command(reset_db_command)
+
+if __name__ == "__main__":
+    cli()
@@ -1,13 +1,7 @@
-from pydantic import BaseModel
+from array import array
+from pydantic import BaseModel, TypeAdapter
 from pydantic_extra_types.coordinate import Latitude, Longitude
-from house_trend_discovery.data_gen.create_db_engine import engine
-from sqlalchemy.orm import Mapped, relationship
-from sqlalchemy import Uuid, Column, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from typing import Optional, List
-from geoalchemy2 import Geography
-
-OrmBase = declarative_base()
+from typing import Iterable, Iterator, Optional, List, Tuple, Union
 
 class LatLng(BaseModel):
     lat: Latitude
@@ -54,46 +48,235 @@ class PremiseDetails(BaseModel):
     class Config:
         orm_mode = True
 
-# SQLAlchemy models
+# serializes a whole list in 1 pass, PremiseDetailsList.dump_json(results) -> bytes
+PremiseDetailsList = TypeAdapter(List[PremiseDetails])
+LocationList = TypeAdapter(List[Location])
+
+# PremiseRecord.to_dicts() output, serialized to the same json as the PremiseDetails they stand for
+PremiseDetailsDict = TypeAdapter(dict)
+PremiseDetailsDictList = TypeAdapter(List[dict])
+
+class Premise(BaseModel):
+    """
+    The fields of PremiseDetails that don't change from year to year
+    """
+    assessment_urls: List[Optional[str]]
+    premise_address: str
+    county: County
+    premise_location: LatLng
 
-class CountyModel(OrmBase):
-    __tablename__ = 'county'
-    id = Column('id', Uuid, primary_key=True)
-    name: Mapped[str]
-    state: Mapped[str]
+    parcel_number: Optional[str] = None
+    sq_feet: Optional[int] = None
+    year_built: Optional[int] = None
+    bed_count: Optional[int] = None
+    bath_count: Optional[float] = None
+    failure_reason: Optional[str] = None
 
-class AssessmentUrlModel(OrmBase):
-    __tablename__ = 'assessment_urls'
-    id = Column('id', Uuid, primary_key=True)
-    premise_id = Column(Uuid, ForeignKey('premise_details.id', ondelete="CASCADE"))
-    url: Mapped[str]
+PREMISE_FIELDS = list(Premise.model_fields.keys())
 
-class PremiseDetailsModel(OrmBase):
-    __tablename__ = 'premise_details'
+class PremiseRecord:
+    """
+    1 premise and its assessment history, the compact form parsers build results in. The premise's fields are
+    kept once and the history is 2 packed arrays, instead of a PremiseDetails per year repeating every field.
+    Converted to PremiseDetails, or dicts shaped like them, only when results are output
 
-    id = Column('id', Uuid, primary_key=True)
-    assessment_urls: Mapped[List["AssessmentUrlModel"]] = relationship(
-        cascade="all,delete,delete-orphan", back_populates="premise_details", passive_deletes=True
-    )
-    premise_address: Mapped[str]
-    year_assessed: Mapped[int]
-    dollar_value: Mapped[int]
-    county: Mapped["CountyModel"]  = relationship(
-        cascade="all,delete,delete-orphan", back_populates="premise_details", passive_deletes=True
+    The premise's fields are validated once, when the record is built, years and values must be ints
+    """
+    __slots__ = (
+        "assessment_urls",
+        "premise_address",
+        "county",
+        "premise_location",
+        "parcel_number",
+        "sq_feet",
+        "year_built",
+        "bed_count",
+        "bath_count",
+        "failure_reason",
+        "years_assessed",
+        "dollar_values",
     )
-    premise_location = Column('premise_location', Geography('POINT'))
-
-    parcel_number: Mapped[Optional[str]] = None
-    sq_feet: Mapped[Optional[int]] = None
-    year_built: Mapped[Optional[int]] = None
-    bed_count: Mapped[Optional[int]] = None
-    bath_count: Mapped[Optional[float]] = None
-    failure_reason: Mapped[Optional[str]] = None
-
-CountyModel.__table__.drop(engine)
-AssessmentUrlModel.__table__.drop(engine)
-PremiseDetailsModel.__table__.drop(engine)
-
-PremiseDetailsModel.__table__.create(engine)
-CountyModel.__table__.create(engine)
-AssessmentUrlModel.__table__.create(engine)
+
+    def __init__(self,
+            assessment_urls: List[Optional[str]],
+            premise_address: str,
+            county: Union[County, dict],
+            premise_location: Union[LatLng, dict],
+            parcel_number: Optional[str] = None,
+            sq_feet: Optional[int] = None,
+            year_built: Optional[int] = None,
+            bed_count: Optional[int] = None,
+            bath_count: Optional[float] = None,
+            failure_reason: Optional[str] = None):
+        premise = Premise(
+            assessment_urls=assessment_urls,
+            premise_address=premise_address,
+            county=county,
+            premise_location=premise_location,
+            parcel_number=parcel_number,
+            sq_feet=sq_feet,
+            year_built=year_built,
+            bed_count=bed_count,
+            bath_count=bath_count,
+            failure_reason=failure_reason)
+        for f in PREMISE_FIELDS:
+            setattr(self, f, getattr(premise, f))
+        self.years_assessed = array('i')
+        self.dollar_values = array('q')
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __setstate__(self, state: tuple):
+        for (f, v) in zip(self.__slots__, state):
+            setattr(self, f, v)
+
+    def __len__(self) -> int:
+        return len(self.years_assessed)
+
+    def add(self, year_assessed: int, dollar_value: int):
+        self.years_assessed.append(year_assessed)
+        self.dollar_values.append(dollar_value)
+
+    def assessments(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.years_assessed, self.dollar_values)
+
+    def with_assessments(self, assessments: Iterable[Tuple[int, int]]) -> "PremiseRecord":
+        """
+        A copy of the premise with a different assessment history, the premise's fields are shared
+        """
+        record = PremiseRecord.__new__(PremiseRecord)
+        for f in self.__slots__:
+            setattr(record, f, getattr(self, f))
+        record.years_assessed = array('i')
+        record.dollar_values = array('q')
+        for (year_assessed, dollar_value) in assessments:
+            record.add(year_assessed, dollar_value)
+        return record
+
+    def to_premise_details(self) -> List[PremiseDetails]:
+        return [
+            PremiseDetails(
+                assessment_urls=self.assessment_urls,
+                premise_address=self.premise_address,
+                year_assessed=year_assessed,
+                dollar_value=dollar_value,
+                county=self.county,
+                premise_location=self.premise_location,
+                parcel_number=self.parcel_number,
+                sq_feet=self.sq_feet,
+                year_built=self.year_built,
+                bed_count=self.bed_count,
+                bath_count=self.bath_count,
+                failure_reason=self.failure_reason,
+            )
+            for (year_assessed, dollar_value) in self.assessments()
+        ]
+
+    def to_dicts(self) -> List[dict]:
+        """
+        What model_dump() of each year's PremiseDetails returns, without building them. The dicts share their
+        nested lists and dicts, they are meant to be serialized, not modified
+        """
+        premise = self.to_premise_dict()
+        return [
+            {
+                "assessment_urls": premise["assessment_urls"],
+                "premise_address": premise["premise_address"],
+                "year_assessed": year_assessed,
+                "dollar_value": dollar_value,
+                "county": premise["county"],
+                "premise_location": premise["premise_location"],
+                "parcel_number": premise["parcel_number"],
+                "sq_feet": premise["sq_feet"],
+                "year_built": premise["year_built"],
+                "bed_count": premise["bed_count"],
+                "bath_count": premise["bath_count"],
+                "failure_reason": premise["failure_reason"],
+            }
+            for (year_assessed, dollar_value) in self.assessments()
+        ]
+
+    def to_json_lines(self) -> str:
+        """
+        Each year's PremiseDetails as a json line, the same bytes model_dump_json() writes
+        """
+        return "".join(PremiseDetailsDict.dump_json(d).decode() + "\n" for d in self.to_dicts())
+
+    def dump_json(self) -> str:
+        """
+        1 json object with the premise's fields and its history as years_assessed and dollar_values lists
+        """
+        d = self.to_premise_dict()
+        d["years_assessed"] = self.years_assessed.tolist()
+        d["dollar_values"] = self.dollar_values.tolist()
+        return PremiseDetailsDict.dump_json(d).decode()
+
+    @staticmethod
+    def from_dict(d: dict) -> "PremiseRecord":
+        """
+        Reads dump_json() output back
+        """
+        record = PremiseRecord(**dict([(f, d.get(f)) for f in PREMISE_FIELDS]))
+        for (year_assessed, dollar_value) in zip(d["years_assessed"], d["dollar_values"]):
+            record.add(year_assessed, dollar_value)
+        return record
+
+    def to_premise_dict(self) -> dict:
+        d = dict([(f, getattr(self, f)) for f in PREMISE_FIELDS])
+        d["assessment_urls"] = list(self.assessment_urls)
+        d["county"] = {"name": self.county.name, "state": self.county.state}
+        d["premise_location"] = {"lat": self.premise_location.lat, "lng": self.premise_location.lng}
+        return d
+
+    def premise_key(self) -> tuple:
+        return (
+            tuple(self.assessment_urls),
+            self.premise_address,
+            self.county.name,
+            self.county.state,
+            self.premise_location.lat,
+            self.premise_location.lng,
+            self.parcel_number,
+            self.sq_feet,
+            self.year_built,
+            self.bed_count,
+            self.bath_count,
+            self.failure_reason,
+        )
+
+def to_records(results: Iterable[PremiseDetails]) -> List[PremiseRecord]:
+    """
+    Groups consecutive PremiseDetails of the same premise into records, the inverse of to_premise_details
+    """
+    records: List[PremiseRecord] = []
+    last_key = None
+    for r in results:
+        record = PremiseRecord(
+            assessment_urls=r.assessment_urls,
+            premise_address=r.premise_address,
+            county=r.county,
+            premise_location=r.premise_location,
+            parcel_number=r.parcel_number,
+            sq_feet=r.sq_feet,
+            year_built=r.year_built,
+            bed_count=r.bed_count,
+            bath_count=r.bath_count,
+            failure_reason=r.failure_reason)
+        key = record.premise_key()
+        if key != last_key:
+            records.append(record)
+            last_key = key
+        records[-1].add(r.year_assessed, r.dollar_value)
+    return records
+
+def iter_premise_details(records: Iterable[PremiseRecord]) -> Iterator[PremiseDetails]:
+    for record in records:
+        yield from record.to_premise_details()
+
+def iter_dicts(records: Iterable[PremiseRecord]) -> Iterator[dict]:
+    for record in records:
+        yield from record.to_dicts()
+
+def count_assessments(records: Iterable[PremiseRecord]) -> int:
+    return sum(len(r) for r in records)
@@ -0,0 +1,234 @@
+import click
+from functools import lru_cache
+import importlib.util
+import json
+import mmap
+import os
+import posixpath
+import shutil
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Packs a crawler session dir into 1 file, {data}/{session_id}.pack, so a session is 1 inode instead of
+3 small files per page. Each file is compressed on its own, with zstd if zstandard is installed and zlib
+otherwise, and found through an index at the end of the archive, so any file can be read without reading
+the rest. Archives are memory mapped, reading a file only touches its own bytes
+
+layout:
+    MAGIC
+    compressed file contents, one after another
+    index, json {"codec": ..., "members": {"{key}/page_1.html": [offset, compressed size, size], ...}}
+    index offset, index size as little endian uint64
+    MAGIC
+
+Files in an archive are addressed as if the archive were the session dir,
+{data}/{session_id}.pack/{key}/page_1.html, get_file and the parse manifest read those paths directly.
+Only the files parsers read are packed: pages, urls and inputs. Screenshots are left out
+"""
+
+MAGIC = b"HTDPACK1"
+FOOTER = struct.Struct("<QQ")
+ARCHIVE_SUFFIX = ".pack"
+
+CODECS = ["zstd", "zlib"]
+
+def default_codec() -> str:
+    return "zstd" if importlib.util.find_spec("zstandard") is not None else "zlib"
+
+def get_archive_path(data_base_path: str, session_id: str) -> str:
+    return posixpath.join(data_base_path, f"{session_id}{ARCHIVE_SUFFIX}")
+
+def is_archive_path(path: str) -> bool:
+    """
+    True for paths of files inside an archive
+    """
+    return f"{ARCHIVE_SUFFIX}/" in path
+
+def split_archive_path(path: str) -> Tuple[str, str]:
+    """
+    {data}/{session_id}.pack/{key}/page_1.html -> ({data}/{session_id}.pack, {key}/page_1.html)
+    """
+    i = path.index(f"{ARCHIVE_SUFFIX}/") + len(ARCHIVE_SUFFIX)
+    return (path[:i], path[i + 1:])
+
+class Compressor:
+    def __init__(self, codec: str, level: Optional[int] = None):
+        self.codec = codec
+        if codec == "zstd":
+            import zstandard
+            self.zstd = zstandard.ZstdCompressor(level=level if level is not None else 10)
+        elif codec == "zlib":
+            self.level = level if level is not None else 6
+        else:
+            raise Exception(f"Unknown codec {codec}, expected one of {CODECS}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self.zstd.compress(data)
+        return zlib.compress(data, self.level)
+
+class Decompressor:
+    def __init__(self, codec: str):
+        self.codec = codec
+        if codec == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise Exception("This archive is zstd compressed, reading it needs zstandard, pip install zstandard")
+            self.zstd = zstandard.ZstdDecompressor()
+        elif codec != "zlib":
+            raise Exception(f"Unknown codec {codec}, expected one of {CODECS}")
+
+    def decompress(self, data: bytes, size: int) -> bytes:
+        if self.codec == "zstd":
+            return self.zstd.decompress(data, max_output_size=size)
+        return zlib.decompress(data)
+
+class SessionArchive:
+    """
+    Read only view of an archive
+    """
+    def __init__(self, path: str):
+        self.path = path
+        st = os.stat(path)
+        self.mtime_ns = st.st_mtime_ns
+
+        with open(path, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buf[:len(MAGIC)] != MAGIC or self.buf[-len(MAGIC):] != MAGIC:
+            raise Exception(f"{path} is not a session archive")
+
+        footer_start = len(self.buf) - len(MAGIC) - FOOTER.size
+        (index_offset, index_size) = FOOTER.unpack(self.buf[footer_start:footer_start + FOOTER.size])
+        index = json.loads(self.buf[index_offset:index_offset + index_size])
+
+        self.codec: str = index["codec"]
+        # member name -> [offset, compressed size, size]
+        self.members: Dict[str, List[int]] = index["members"]
+        self.decompressor = Decompressor(self.codec)
+
+    def read(self, member: str) -> bytes:
+        (offset, compressed_size, size) = self.members[member]
+        return self.decompressor.decompress(self.buf[offset:offset + compressed_size], size)
+
+    def size(self, member: str) -> int:
+        return self.members[member][2]
+
+    def __contains__(self, member: str) -> bool:
+        return member in self.members
+
+@lru_cache(maxsize=64)
+def open_archive(path: str, mtime_ns: int) -> SessionArchive:
+    return SessionArchive(path)
+
+def get_archive(path: str) -> SessionArchive:
+    """
+    The open archive at path, archives stay open for the life of the process unless they're rewritten
+    """
+    return open_archive(path, os.stat(path).st_mtime_ns)
+
+def read_member(path: str) -> bytes:
+    (archive_path, member) = split_archive_path(path)
+    return get_archive(archive_path).read(member)
+
+def stat_member(path: str) -> Tuple[int, int]:
+    """
+    (mtime_ns, size) of a file in an archive, the mtime is the archive's
+    """
+    (archive_path, member) = split_archive_path(path)
+    archive = get_archive(archive_path)
+    return (archive.mtime_ns, archive.size(member))
+
+def member_exists(path: str) -> bool:
+    (archive_path, member) = split_archive_path(path)
+    return os.path.exists(archive_path) and member in get_archive(archive_path)
+
+def iter_session_files(session_dir: str) -> Iterator[Tuple[str, str]]:
+    """
+    (member name, file path) of every file parsers read in a session dir
+    """
+    # imported here, session_index reads archives with this module
+    from house_trend_discovery.data_gen.parsers.session_index import scan_session
+
+    for (key, files) in sorted(scan_session(session_dir).items()):
+        for (n, path) in sorted(files.pages.items()):
+            yield (f"{key}/page_{n}.html", path)
+        for (n, path) in sorted(files.urls.items()):
+            yield (f"{key}/urls/url_{n}.txt", path)
+        if files.inputs is not None:
+            yield (f"{key}/inputs/inputs.json", files.inputs)
+
+def pack_session(
+        data_base_path: str,
+        session_id: str,
+        codec: Optional[str] = None,
+        level: Optional[int] = None) -> str:
+    """
+    Writes the session dir to {data}/{session_id}.pack and returns its path
+    """
+    session_dir = posixpath.join(data_base_path, session_id)
+    archive_path = get_archive_path(data_base_path, session_id)
+    compressor = Compressor(codec if codec is not None else default_codec(), level)
+
+    members = {}
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for (member, path) in iter_session_files(session_dir):
+            with open(path, 'rb') as src:
+                data = src.read()
+            compressed = compressor.compress(data)
+            f.write(compressed)
+            members[member] = [offset, len(compressed), len(data)]
+            offset += len(compressed)
+
+        index = json.dumps({"codec": compressor.codec, "members": members}, separators=(',', ':')).encode('utf-8')
+        f.write(index)
+        f.write(FOOTER.pack(offset, len(index)))
+        f.write(MAGIC)
+    os.replace(tmp_path, archive_path)
+    return archive_path
+
+def verify_archive(data_base_path: str, session_id: str) -> bool:
+    """
+    True if every file parsers read in the session dir is in the archive with the same contents
+    """
+    archive = SessionArchive(get_archive_path(data_base_path, session_id))
+    session_dir = posixpath.join(data_base_path, session_id)
+    for (member, path) in iter_session_files(session_dir):
+        with open(path, 'rb') as f:
+            if member not in archive or archive.read(member) != f.read():
+                return False
+    return True
+
+@click.command(help="Packs crawler session dirs into 1 compressed, indexed file each")
+@click.option("--data", help="Path to data directory", default="./puppeteer_crawler/data", type=click.Path(exists=True))
+@click.option("--sid", help="Sessions to pack, repeatable, defaults to every session dir", multiple=True)
+@click.option("--codec", help="Defaults to zstd if zstandard is installed, zlib otherwise", default=None, type=click.Choice(CODECS))
+@click.option("--level", help="Compression level", default=None, type=int)
+@click.option(
+    "--remove",
+    is_flag=True,
+    help="Delete each session dir once its archive is verified, screenshots are not packed and are deleted too",
+    default=False)
+def cli(data: str, sid: tuple, codec: Optional[str], level: Optional[int], remove: bool):
+    with os.scandir(data) as entries:
+        session_dirs = sorted(e.name for e in entries if not e.name.startswith('.') and e.is_dir())
+    for session_id in sid or session_dirs:
+        archive_path = pack_session(data, session_id, codec, level)
+        logger.info(f"Packed {session_id} into {archive_path}")
+        if remove:
+            if not verify_archive(data, session_id):
+                raise Exception(f"{archive_path} doesn't match {session_id}, leaving the session dir in place")
+            shutil.rmtree(posixpath.join(data, session_id))
+            logger.info(f"Removed {session_id}")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import posixpath
+from typing import Dict, List, Tuple
+from house_trend_discovery.data_gen.models import PremiseDetails, PremiseRecord, to_records
+from house_trend_discovery.data_gen.parsers.archive import is_archive_path, read_member, stat_member
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Remembers which home dirs of a session were already parsed, so a re-run only parses new or changed pages
+
+cache layout:
+    {cache_dir}/{session_id}/
+        - manifest.json # {"parser": name, "parser_version": ..., "homes": home key -> {file path -> [mtime_ns, size, sha256]}},
+                        # a packed file's mtime is its archive's
+        - results/
+            - {entry}.jsonl # the parsed PremiseRecords for 1 home, 1 per line
+
+Results are only reused by the parser and parser version that produced them, Parser.cache_version changes with the
+parser's code, so fixing a parser reparses every home
+"""
+
+# [mtime_ns, size, sha256]
+FileFingerprint = List
+HomeFingerprint = Dict[str, FileFingerprint]
+
+# how many homes can be stored before the manifest is flushed to disk
+SAVE_EVERY = 1000
+
+class ParseManifest:
+    def __init__(self, session_cache_dir: str, parser_name: str, parser_version: str):
+        self.session_cache_dir = session_cache_dir
+        self.parser_name = parser_name
+        self.parser_version = parser_version
+        self.manifest_path = posixpath.join(session_cache_dir, "manifest.json")
+        self.results_dir = posixpath.join(session_cache_dir, "results")
+        self.entries: Dict[str, HomeFingerprint] = {}
+        self.unsaved = 0
+
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                if manifest.get("parser") == parser_name and manifest.get("parser_version") == parser_version:
+                    self.entries = manifest["homes"]
+                else:
+                    logger.info(f"Results in {self.manifest_path} are from another parser version, reparsing session")
+            except Exception as e:
+                logger.warning(f"Failed to read manifest {self.manifest_path}, reparsing session: {e}")
+
+    def is_fresh(self, home_key: str, files: List[str]) -> bool:
+        """
+        True if every file of the home matches what was parsed last time. Files whose mtime and size
+        changed are compared by content hash, so touched but unchanged pages are still fresh
+        """
+        entry = self.entries.get(home_key)
+        if entry is None or sorted(entry.keys()) != sorted(files):
+            return False
+
+        for path in files:
+            (mtime_ns, size, digest) = entry[path]
+            (current_mtime_ns, current_size) = stat_file(path)
+            if current_mtime_ns == mtime_ns and current_size == size:
+                continue
+            if current_size != size or hash_file(path) != digest:
+                return False
+            entry[path] = [current_mtime_ns, current_size, digest]
+            self.unsaved += 1
+
+        return os.path.exists(self._results_path(home_key))
+
+    def load(self, home_key: str) -> List[PremiseRecord]:
+        with open(self._results_path(home_key), 'r') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if len(lines) > 0 and "years_assessed" not in lines[0]:
+            # cached before results were records, 1 PremiseDetails per line
+            return to_records(PremiseDetails(**line) for line in lines)
+        return [PremiseRecord.from_dict(line) for line in lines]
+
+    def store(self, home_key: str, files: List[str], records: List[PremiseRecord]):
+        os.makedirs(self.results_dir, exist_ok=True)
+        with open(self._results_path(home_key), 'w') as f:
+            for r in records:
+                f.write(r.dump_json())
+                f.write("\n")
+
+        self.entries[home_key] = dict([(path, fingerprint_file(path)) for path in files])
+        self.unsaved += 1
+        if self.unsaved >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        if self.unsaved == 0:
+            return
+        os.makedirs(self.session_cache_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            manifest = {"parser": self.parser_name, "parser_version": self.parser_version, "homes": self.entries}
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path)
+        self.unsaved = 0
+
+    def _results_path(self, home_key: str) -> str:
+        entry_name = hashlib.sha1(home_key.encode('utf-8')).hexdigest()
+        return posixpath.join(self.results_dir, f"{entry_name}.jsonl")
+
+class ManifestStore:
+    """
+    Opens the manifest of each session lazily, home dirs are looked up by their session
+    """
+    def __init__(self, cache_dir: str, parser_name: str, parser_version: str):
+        self.cache_dir = cache_dir
+        self.parser_name = parser_name
+        self.parser_version = parser_version
+        self.manifests: Dict[str, ParseManifest] = {}
+
+    def get(self, home_dir: str) -> Tuple[ParseManifest, str]:
+        """
+        Returns the manifest of the home's session and the home's key in it
+        """
+        (session_dir, home_key) = posixpath.split(home_dir.rstrip('/'))
+        session_id = posixpath.basename(session_dir)
+        if session_id not in self.manifests:
+            self.manifests[session_id] = ParseManifest(
+                posixpath.join(self.cache_dir, session_id), self.parser_name, self.parser_version)
+        return (self.manifests[session_id], home_key)
+
+    def save(self):
+        for manifest in self.manifests.values():
+            manifest.save()
+
+def stat_file(path: str) -> Tuple[int, int]:
+    if is_archive_path(path):
+        return stat_member(path)
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def hash_file(path: str) -> str:
+    if is_archive_path(path):
+        return hashlib.sha256(read_member(path)).hexdigest()
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint_file(path: str) -> FileFingerprint:
+    (mtime_ns, size) = stat_file(path)
+    return [mtime_ns, size, hash_file(path)]
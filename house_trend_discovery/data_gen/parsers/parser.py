@@ -1,14 +1,28 @@
 from abc import ABC, abstractmethod
 import click
-from glob import glob
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
 import posixpath
 import json
 import os
 import re
-from itertools import groupby
-from typing import List, Optional, Tuple, NewType, TypeAlias
-from house_trend_discovery.data_gen.models import PremiseDetails
+import sys
+from itertools import chain, groupby, islice
+from pydantic import BaseModel
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, NewType, TypeAlias, TypeVar
+from house_trend_discovery.data_gen.models import (
+    PremiseDetails, PremiseDetailsDictList, PremiseRecord, count_assessments, iter_dicts, iter_premise_details, to_records
+)
+from house_trend_discovery.data_gen.parsers.manifest import ManifestStore
+from house_trend_discovery.data_gen.parsers.session_index import list_sessions, load_session_index
+from house_trend_discovery.data_gen.parsers.archive import is_archive_path, member_exists
+from house_trend_discovery.data_gen.parsers.registry import load_parser_class
+from house_trend_discovery.data_gen.parsers.utils import DEFAULT_HTML_BACKEND, HTML_BACKENDS, get_file
 from house_trend_discovery.get_logger import get_logger
+from house_trend_discovery.metrics import Metrics, active
+from house_trend_discovery.profiling import maybe_profiled, profile_options
 
 logger = get_logger(__name__)
 
@@ -26,43 +40,215 @@ PagePath = NewType("PagePath", str)
 ScrapeInputs = NewType("ScrapeInputs", dict)
 HomeScrapeResults: TypeAlias = List[Tuple[PageNumber, UrlPath, PagePath, ScrapeInputs]]
 
+class HomeParseFailure(BaseModel):
+    home: str
+    reason: str
+
+# the records of parsing 1 home, failure is set if the home could not be parsed
+HomeOutcome: TypeAlias = Tuple[List[PremiseRecord], Optional[HomeParseFailure]]
+
 class Parser(ABC):
+    # name of the scraper whose output this parser reads, set by subclasses
+    name: Optional[ScraperName] = None
+    # bump to drop incrementally cached results, changes to the parser's source drop them too
+    version: Optional[str] = None
+
     session_id: Optional[str] = None
     scraper_name: Optional[str] = None
-    results: List[PremiseDetails] = []
+    workers: int = 1
+    cache_dir: Optional[str] = None
+    html_backend: str = DEFAULT_HTML_BACKEND
+    max_homes: Optional[int] = None
+    merge_sessions: bool = False
+    session_ids: Optional[List[str]] = None
+    records: List[PremiseRecord] = []
+    failures: List[HomeParseFailure] = []
+    metrics: Metrics
 
     data_base_path = "house_trend_discovery/data_gen/scraper/data"
 
+    def parse(self, output_file_paths: dict[ScraperName, List[HomeScrapeResults]]) -> List[PremiseDetails]:
+        """
+        Parses every home scraped by this parser's scraper, in a process pool if workers > 1.
+        Results are returned in home order regardless of which worker parsed them.
+        """
+        return list(iter_premise_details(self.parse_records(output_file_paths)))
+
+    def parse_records(self, output_file_paths: dict[ScraperName, List[HomeScrapeResults]]) -> List[PremiseRecord]:
+        """
+        Like parse, without expanding each premise's records into a PremiseDetails per year
+        """
+        return list(chain(*self._parse_homes(self._get_homes(output_file_paths))))
+
     @abstractmethod
-    def parse(self, output_file_paths: dict[str, List[Tuple[int, str, str]]]) -> List[PremiseDetails]:
-        print('parser base class output file paths: \n', output_file_paths)
+    def parse_home(self, home_results: HomeScrapeResults) -> List[PremiseRecord]:
+        """
+        Parses the saved pages for 1 home, usually into 1 PremiseRecord holding every year it was assessed.
+        Returning PremiseDetails works too, they're grouped into records.
+        Raise to report the home as failed, the run continues
+        """
         return []
 
-
     def __init__(self,
             sid: Optional[str] = None,
             scraper_name: Optional[str] = None,
-            data_base_path: Optional[str] = None):
+            data_base_path: Optional[str] = None,
+            workers: int = 1,
+            cache_dir: Optional[str] = None,
+            html_backend: str = DEFAULT_HTML_BACKEND,
+            metrics: Optional[Metrics] = None,
+            max_homes: Optional[int] = None,
+            merge_sessions: bool = False,
+            session_ids: Optional[List[str]] = None):
         """
         if session id provided, parses specific session
         if scraper_name provided, parses the latest session for that parser
+        if workers > 1, homes are parsed in a process pool of that size
+        if cache_dir provided, only homes whose files changed since the last run are parsed,
+        the rest are read from the cache
+        html_backend picks how pages are parsed, see parsers/utils.py
+        metrics collects stage timings and counts for the run, pass one to share it with the caller
+        if max_homes provided, only the first max_homes homes are parsed, to profile a sample of a large session
+        if merge_sessions, every session of the scraper is parsed instead of the latest, or the session_ids if provided.
+        A home in several sessions is parsed from the newest and records are deduplicated on parcel number and year
         """
         self.session_id = sid
         self.scraper_name = scraper_name
         self.data_base_path = data_base_path
-        self.results = []
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.html_backend = html_backend
+        self.records = []
+        self.failures = []
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.max_homes = max_homes
+        self.merge_sessions = merge_sessions
+        self.session_ids = session_ids
 
     def run(self):
-        output_paths = self._get_scraper_output_file_paths()
-        self.results = self.parse(output_paths)
+        with self.metrics.activate(), self.metrics.stage("run"):
+            output_paths = self._get_scraper_output_file_paths()
+            self.failures = []
+            self.records = self.parse_records(output_paths)
+        self._log_failures()
         return self
 
+    def iter_records(self) -> Iterator[PremiseRecord]:
+        """
+        Streams records home by home instead of collecting them in self.records, so memory stays
+        flat no matter how large the session is. Failures are available once the generator is exhausted
+        """
+        with self.metrics.activate():
+            output_paths = self._get_scraper_output_file_paths()
+            self.failures = []
+            for home_records in self._parse_homes(self._get_homes(output_paths)):
+                yield from home_records
+        self._log_failures()
+
+    def iter_results(self) -> Iterator[PremiseDetails]:
+        """
+        iter_records, as a PremiseDetails per year assessed
+        """
+        return iter_premise_details(self.iter_records())
+
+    @property
+    def results(self) -> List[PremiseDetails]:
+        return list(iter_premise_details(self.records))
+
     def to_json(self) -> str:
-        return json.dumps([json.loads(r.model_dump_json()) for r in self.results])
+        return PremiseDetailsDictList.dump_json(list(iter_dicts(self.records))).decode()
 
     def get_results(self) -> List[PremiseDetails]:
         return self.results
 
+    def get_records(self) -> List[PremiseRecord]:
+        return self.records
+
+    def get_failures(self) -> List[HomeParseFailure]:
+        return self.failures
+
+    def _get_homes(self, output_file_paths: dict[ScraperName, List[HomeScrapeResults]]) -> List[HomeScrapeResults]:
+        if self.name is not None:
+            homes = output_file_paths.get(self.name, [])
+        else:
+            homes = list(chain(*output_file_paths.values()))
+        return homes[:self.max_homes] if self.max_homes is not None else homes
+
+    def _parse_homes(self, homes: List[HomeScrapeResults]) -> Iterator[List[PremiseRecord]]:
+        """
+        Yields the records of each home in order, recording failed homes in self.failures
+        """
+        if self.cache_dir is not None:
+            home_results = self._collect(self._parse_outcomes_incrementally(homes))
+        else:
+            home_results = self._collect(self._parse_outcomes(homes))
+
+        if self.merge_sessions:
+            home_results = dedupe_records(home_results)
+        yield from home_results
+
+    def _parse_outcomes(self, homes: List[HomeScrapeResults]) -> Iterator[HomeOutcome]:
+        if self.workers > 1 and len(homes) > 1:
+            chunksize = min(max(1, len(homes) // (self.workers * 4)), MAX_CHUNK_SIZE)
+            with ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self,)) as executor:
+                chunk_results = imap_bounded(
+                    executor, _parse_homes_in_worker, chunked(homes, chunksize), self.workers * 2)
+                for (outcomes, worker_metrics) in chunk_results:
+                    active().merge(worker_metrics)
+                    yield from outcomes
+        else:
+            yield from (parse_home_safely(self, h) for h in homes)
+
+    def cache_version(self) -> str:
+        """
+        Identifies the code results were parsed with, the version attribute and a hash of the source of the
+        parser's modules, utils.py and models.py
+        """
+        return code_hash(type(self), self.version)
+
+    def _parse_outcomes_incrementally(self, homes: List[HomeScrapeResults]) -> Iterator[HomeOutcome]:
+        """
+        Only parses homes whose files changed since they were cached, cached homes are merged
+        back in at their place in the home order. Failed homes are not cached so they are retried next run
+        """
+        manifests = ManifestStore(self.cache_dir, self.name or type(self).__name__, self.cache_version())
+
+        fresh = []
+        for home in homes:
+            (manifest, home_key) = manifests.get(get_home_dir(home))
+            fresh.append(len(home) > 0 and manifest.is_fresh(home_key, get_home_files(home)))
+
+        stale_homes = [home for (home, is_fresh) in zip(homes, fresh) if not is_fresh]
+        active().incr("homes_cached", len(homes) - len(stale_homes))
+        logger.info(f"{len(homes) - len(stale_homes)} homes unchanged since last parse, parsing {len(stale_homes)}")
+
+        parsed = self._parse_outcomes(stale_homes)
+        try:
+            for (home, is_fresh) in zip(homes, fresh):
+                (manifest, home_key) = manifests.get(get_home_dir(home))
+                if is_fresh:
+                    yield (manifest.load(home_key), None)
+                else:
+                    (records, failure) = next(parsed)
+                    if failure is None and len(home) > 0:
+                        manifest.store(home_key, get_home_files(home), records)
+                    yield (records, failure)
+        finally:
+            parsed.close()
+            manifests.save()
+
+    def _collect(self, outcomes: Iterable[HomeOutcome]) -> Iterator[List[PremiseRecord]]:
+        for (records, failure) in outcomes:
+            if failure is not None:
+                logger.error(f"Failed to parse home {failure.home}: {failure.reason}")
+                self.failures.append(failure)
+            yield records
+
+    def _log_failures(self):
+        if len(self.failures) > 0:
+            logger.warning(f"Failed to parse {len(self.failures)} homes")
+
     def _get_scraper_output_file_paths(self) -> dict[ScraperName, List[HomeScrapeResults]]:
         """
         Returns a mapping from scraper name to list (page number, url file path, page file path)
@@ -70,7 +256,10 @@ class Parser(ABC):
         Returns
             scraper_name -> [address_namespaced_scrape_results]
         """
+        with active().stage("discovery"):
+            return self._discover_scraper_output_file_paths()
 
+    def _discover_scraper_output_file_paths(self) -> dict[ScraperName, List[HomeScrapeResults]]:
         sessions = [d for d in self._get_session_dirs()]
 
         # group sessions by scraper name
@@ -81,6 +270,12 @@ class Parser(ABC):
         )
         sessions_outputs = [list(vs) for (_, vs) in session_groups]
 
+        if self.merge_sessions:
+            return dict([
+                (gs[0][0], self._merge_session_homes([sid for (_, sid) in gs]))
+                for gs in sessions_outputs if len(gs) > 0
+            ])
+
         # [(scraper_name, session_id)]
         latest_unique_sessions = [self._get_recent_session_id(gs) for gs in sessions_outputs if len(gs) > 0]
 
@@ -93,68 +288,237 @@ class Parser(ABC):
         if len(sessions_ids) == 0:
             raise Exception("session_ids must not be empty to get recent session_id")
 
-        p = r'.+-(\d+)$'
-        sorted_ids = sorted([(s,  do_cap_match(p, s[1])) for s in sessions_ids], key=lambda x: x[1])
+        # numeric, like _merge_session_homes, so kingcounty-900 is older than kingcounty-2000
+        return sorted(sessions_ids, key=lambda s: get_session_timestamp(s[1]))[-1]
+
+    def _merge_session_homes(self, session_ids: List[str]) -> List[HomeScrapeResults]:
+        """
+        Every home in the sessions, a home crawled in several sessions is taken from the newest one that saved
+        pages for it. Sessions are discovered in parallel threads. Homes are ordered by the newest session
+        they're in, then by key
+        """
+        newest_first = sorted(session_ids, key=get_session_timestamp, reverse=True)
+        with ThreadPoolExecutor(max_workers=min(MAX_DISCOVERY_THREADS, len(newest_first))) as executor:
+            sessions_homes = list(executor.map(self._get_session_homes, newest_first))
 
-        return sorted_ids[-1][0]
+        merged: dict[str, HomeScrapeResults] = {}
+        for homes in sessions_homes:
+            for (key, home) in homes:
+                if key not in merged or (len(merged[key]) == 0 and len(home) > 0):
+                    merged[key] = home
+
+        active().incr("homes_superseded", sum(len(homes) for homes in sessions_homes) - len(merged))
+        return list(merged.values())
 
     def _get_session_dirs(self) -> List[str]:
-        if self.session_id:
-            return glob(f"{self.data_base_path}/{self.session_id}")
+        sessions = list_sessions(self.data_base_path)
+        if self.session_ids:
+            wanted = set(self.session_ids)
+            sessions = [s for s in sessions if s in wanted]
+        elif self.session_id:
+            sessions = [s for s in sessions if s == self.session_id]
         elif self.scraper_name:
-            return glob(f"{self.data_base_path}/{self.scraper_name}*")
-        else:
-            return glob(f"{self.data_base_path}/*")
+            sessions = [s for s in sessions if s.startswith(self.scraper_name)]
+        return [f"{self.data_base_path}/{s}" for s in sessions]
 
     def _get_home_scrape_results(self, session_id: str) -> List[HomeScrapeResults]:
-        page_p = r'\/page_([0-9]+).html$'
-        url_p = r'\/url_([0-9]+).txt$'
+        return [home for (_, home) in self._get_session_homes(session_id)]
+
+    def _get_session_homes(self, session_id: str) -> List[Tuple[str, HomeScrapeResults]]:
+        """
+        The session's homes and their keys, in key order
+        """
+        index = load_session_index(self.data_base_path, session_id)
+        active().incr("sessions")
+        active().incr("homes_discovered", len(index))
 
         home_scrape_results = []
-        home_dirs = glob(f"{self.data_base_path}/{session_id}/*")
-        for home_dir in home_dirs:
+        for key in sorted(index.keys()):
+            home_files = index[key]
 
             # get inputs json if they exist
             inputs_json = None
             try:
-                inputs_file_path = f"{home_dir}/inputs/inputs.json"
-                with open(inputs_file_path, 'r') as f:
-                    inputs_json = json.load(f)
+                inputs_json = json.loads(get_file(home_files.inputs))
             except Exception as e:
-                logger.warn("Failed to get inputs", e)
-
-            pages_path = f"{home_dir}/*.html"
-            urls_path = f"{home_dir}/urls/*.txt"
+                logger.warning(f"Failed to get inputs for {session_id}/{key}: {e}")
 
-            urls = glob(urls_path)
-            pages = glob(pages_path)
-
-            url_map = dict([(int(do_cap_match(url_p, p)), p) for p in urls])
-            page_map = dict([(int(do_cap_match(page_p, p)), p) for p in pages])
-            home_scrape_results.append([(i, url_map[i], page_map[i], inputs_json) for i in range(1, len(urls)+1)])
+            home_scrape_results.append((key, [
+                (i, home_files.urls[i], home_files.pages[i], inputs_json)
+                for i in range(1, len(home_files.urls)+1)
+                if i in home_files.pages
+            ]))
 
         return home_scrape_results
 
+def get_home_dir(home_results: HomeScrapeResults) -> str:
+    if len(home_results) == 0:
+        return ""
+    (_, _, page_path, _) = home_results[0]
+    return posixpath.dirname(page_path)
+
+def get_home_files(home_results: HomeScrapeResults) -> List[str]:
+    """
+    Every file the home's results are parsed from
+    """
+    files = list(chain(*[(url_path, page_path) for (_, url_path, page_path, _) in home_results]))
+    inputs_file_path = f"{get_home_dir(home_results)}/inputs/inputs.json"
+    exists = member_exists if is_archive_path(inputs_file_path) else os.path.exists
+    if exists(inputs_file_path):
+        files.append(inputs_file_path)
+    return files
+
+def parse_home_safely(parser: Parser, home_results: HomeScrapeResults) -> HomeOutcome:
+    metrics = active()
+    metrics.incr("homes_parsed")
+    metrics.incr("pages", len(home_results))
+    try:
+        with metrics.stage("parse_home"):
+            results = parser.parse_home(home_results)
+            records = to_records(results) if any(isinstance(r, PremiseDetails) for r in results) else results
+        metrics.incr("records", count_assessments(records))
+        return (records, None)
+    except Exception as e:
+        metrics.failure(type(e).__name__)
+        return ([], HomeParseFailure(home=get_home_dir(home_results), reason=f"{type(e).__name__}: {e}"))
+
+def dedupe_records(home_records: Iterable[List[PremiseRecord]]) -> Iterator[List[PremiseRecord]]:
+    """
+    Drops the years assessed of a parcel number that were already seen, records without a parcel number are kept
+    """
+    seen = set()
+    for records in home_records:
+        kept = []
+        for r in records:
+            if r.parcel_number is None:
+                kept.append(r)
+                continue
+
+            assessments = []
+            for (year_assessed, dollar_value) in r.assessments():
+                key = (r.parcel_number, year_assessed)
+                if key in seen:
+                    active().incr("duplicate_records")
+                    continue
+                seen.add(key)
+                assessments.append((year_assessed, dollar_value))
+
+            if len(assessments) == len(r):
+                kept.append(r)
+            elif len(assessments) > 0:
+                kept.append(r.with_assessments(assessments))
+        yield kept
+
+# the parser each pool worker process parses homes with, set once per process
+_worker_parser: Optional[Parser] = None
+
+def _init_worker(parser: Parser):
+    global _worker_parser
+    _worker_parser = parser
+
+def _parse_homes_in_worker(homes: List[HomeScrapeResults]) -> Tuple[List[HomeOutcome], dict]:
+    """
+    Returns the homes' outcomes and the metrics collected parsing them, for the parent to merge
+    """
+    metrics = Metrics()
+    with metrics.activate():
+        outcomes = [parse_home_safely(_worker_parser, h) for h in homes]
+    return (outcomes, metrics.to_dict())
+
+# sessions discovered at once when merging, discovery mostly waits on the filesystem
+MAX_DISCOVERY_THREADS = 8
+
+# caps how many homes are sent to a worker at once, bounds the results waiting to be consumed
+MAX_CHUNK_SIZE = 64
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+def imap_bounded(executor: Executor, fn: Callable[[T], R], items: Iterable[T], window: int) -> Iterator[R]:
+    """
+    Like executor.map, but only keeps `window` tasks in flight so finished results
+    don't pile up in memory ahead of a slow consumer. Results are yielded in input order
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 def do_cap_match(p, s) -> Optional[str]:
     m = re.search(p, s)
     if m is not None:
         return m.group(1)
     return None
 
+@lru_cache(maxsize=None)
+def code_hash(parser_class: type, version: Optional[str]) -> str:
+    module_names = [c.__module__ for c in parser_class.__mro__ if issubclass(c, Parser)]
+    module_names += ["house_trend_discovery.data_gen.parsers.utils", "house_trend_discovery.data_gen.models"]
+
+    h = hashlib.sha256(str(version).encode('utf-8'))
+    for module_name in sorted(set(module_names)):
+        path = getattr(sys.modules.get(module_name), "__file__", None)
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+def get_session_timestamp(session_id: str) -> int:
+    ts = do_cap_match(r'.+-(\d+)$', session_id)
+    return int(ts) if ts is not None else 0
+
 def get_scraper_name(dirname: str) -> Optional[str]:
-    p = r'\/(\w+)-.*$'
+    p = r'\/(\w+)-[^/]*$'
     return do_cap_match(p, dirname)
 
 
 @click.command(
-    help="Parses most recent data generated all scrapers, unless single session specified."
+    help="Parses the most recent session of a scraper, or a single session, and prints the results as json"
 )
 @click.option("--sid", help="The override session id", default=None)
 @click.option("--name", help="The override scraper name", default=None)
-def cli(sid: Optional[str], name: Optional[str]):
-    p = Parser(sid, name)
-
-    print(p.run())
+@click.option("--data", help="Path to data directory", default="./puppeteer_crawler/data", type=click.Path(exists=True))
+@click.option("--workers", help="Number of processes to parse homes with", default=1, type=click.IntRange(min=1))
+@click.option(
+    "--html_backend",
+    help="How pages are parsed, all backends give the same results",
+    default=DEFAULT_HTML_BACKEND,
+    type=click.Choice(HTML_BACKENDS))
+@click.option("--max_homes", help="Only parse the first N homes", default=None, type=click.IntRange(min=1))
+@profile_options
+def cli(
+        sid: Optional[str],
+        name: Optional[str],
+        data: str,
+        workers: int,
+        html_backend: str,
+        max_homes: Optional[int],
+        profile: Optional[str],
+        profile_top: int,
+        profiler: str):
+    scraper_name = name or (get_scraper_name(f"/{sid}") if sid is not None else None)
+    if scraper_name is None:
+        raise click.UsageError("Pass the scraper with --name or a session with --sid")
+
+    if profile is not None and workers > 1:
+        logger.warning("Parsing in process while profiling, pool workers aren't profiled")
+        workers = 1
+
+    ParserClass = load_parser_class(scraper_name)
+    p = ParserClass(
+        sid, scraper_name, data_base_path=data, workers=workers, html_backend=html_backend, max_homes=max_homes)
+    with maybe_profiled(profile, profile_top, profiler):
+        p.run()
+
+    print(p.to_json())
 
 if __name__ == "__main__":
     cli()
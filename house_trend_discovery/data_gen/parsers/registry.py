@@ -0,0 +1,143 @@
+import ast
+import importlib
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Finds parsers without importing them, so listing parsers or starting a command doesn't pay for every parser's
+dependencies. A parser is imported only when load_parser_class asks for it
+
+Parsers come from
+    builtin - modules in this package with a class setting name = ScraperName("..."), found by reading the
+        module's source. What each module defines is cached in {cache}/house_trend_discovery/parser_index.json,
+        keyed by the module's mtime and size, so only changed modules are read again
+    entry points - installed packages can add parsers under the house_trend_discovery.parsers group,
+        the entry point name is the scraper name
+
+        [tool.poetry.plugins."house_trend_discovery.parsers"]
+        zillow = "my_package.zillow:Parser"
+
+A builtin parser wins over an entry point with the same name
+"""
+
+ENTRY_POINT_GROUP = "house_trend_discovery.parsers"
+PARSERS_PACKAGE = "house_trend_discovery.data_gen.parsers"
+INDEX_VERSION = 1
+
+class ParserInfo(NamedTuple):
+    name: str
+    # module:Class
+    target: str
+    # builtin, or the distribution an entry point came from
+    source: str
+
+def get_index_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "house_trend_discovery", "parser_index.json")
+
+def find_parser_classes(source: str) -> Dict[str, str]:
+    """
+    scraper name -> class name of the classes in source that set name = ScraperName("...") or name = "..."
+    """
+    found = {}
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for statement in node.body:
+            if not (isinstance(statement, ast.Assign)
+                    and any(isinstance(t, ast.Name) and t.id == "name" for t in statement.targets)):
+                continue
+            value = statement.value
+            if isinstance(value, ast.Call) and len(value.args) == 1:
+                value = value.args[0]
+            if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                found[value.value] = node.name
+    return found
+
+def load_index(path: str, package_dir: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+        # another checkout or install of the package has its own modules
+        if index.get("version") == INDEX_VERSION and index.get("package_dir") == package_dir:
+            return index["modules"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def save_index(path: str, package_dir: str, modules: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "package_dir": package_dir, "modules": modules}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # the index only saves reading sources again, a read only home still works
+        logger.debug(f"Couldn't save the parser index to {path}: {e}")
+
+def builtin_parsers(index_path: Optional[str] = None) -> List[ParserInfo]:
+    index_path = index_path or get_index_path()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    cached = load_index(index_path, package_dir)
+
+    # module -> [mtime_ns, size, {scraper name: class name}]
+    modules = {}
+    with os.scandir(package_dir) as entries:
+        for e in sorted(entries, key=lambda e: e.name):
+            if not e.name.endswith(".py") or e.name.startswith("_") or not e.is_file():
+                continue
+            module = e.name[:-3]
+            st = e.stat()
+            entry = cached.get(module)
+            if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+                with open(e.path, 'r') as f:
+                    entry = [st.st_mtime_ns, st.st_size, find_parser_classes(f.read())]
+            modules[module] = entry
+
+    if modules != cached:
+        save_index(index_path, package_dir, modules)
+
+    parsers = []
+    for (module, (_, _, classes)) in modules.items():
+        for (name, class_name) in classes.items():
+            parsers.append(ParserInfo(name, f"{PARSERS_PACKAGE}.{module}:{class_name}", "builtin"))
+    return parsers
+
+def entry_point_parsers() -> List[ParserInfo]:
+    from importlib.metadata import entry_points
+
+    parsers = []
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        source = ep.dist.name if ep.dist is not None else "entry point"
+        parsers.append(ParserInfo(ep.name, ep.value, source))
+    return parsers
+
+def list_parsers() -> List[ParserInfo]:
+    """
+    Every parser that load_parser_class can load, sorted by name
+    """
+    parsers = dict([(p.name, p) for p in entry_point_parsers()])
+    parsers.update([(p.name, p) for p in builtin_parsers()])
+    return [parsers[name] for name in sorted(parsers)]
+
+def find_parser(scraper_name: str) -> ParserInfo:
+    for p in builtin_parsers():
+        if p.name == scraper_name:
+            return p
+    for p in entry_point_parsers():
+        if p.name == scraper_name:
+            return p
+    known = ", ".join(p.name for p in list_parsers())
+    raise Exception(f"No parser for scraper {scraper_name}, known parsers are {known}")
+
+def load_parser_class(scraper_name: str) -> type:
+    """
+    Imports the module of the scraper's parser and returns the parser class
+    """
+    (module, _, class_name) = find_parser(scraper_name).target.partition(":")
+    return getattr(importlib.import_module(module), class_name or "Parser")
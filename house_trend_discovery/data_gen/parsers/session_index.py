@@ -0,0 +1,101 @@
+import os
+import posixpath
+import re
+from typing import Dict, List, NamedTuple, Optional
+from house_trend_discovery.data_gen.parsers.archive import ARCHIVE_SUFFIX, get_archive, get_archive_path
+
+"""
+Finds every home's saved files in a session with 1 os.scandir walk, instead of globbing and regex matching
+the pages, urls and inputs of each home separately
+
+Sessions packed into an archive, see archive.py, are indexed from the archive's own index
+"""
+
+PAGE_P = re.compile(r'^page_([0-9]+)\.html$')
+URL_P = re.compile(r'^url_([0-9]+)\.txt$')
+
+class HomeFiles(NamedTuple):
+    pages: Dict[int, str] # page number -> page path
+    urls: Dict[int, str] # page number -> url path
+    inputs: Optional[str] # inputs.json path
+
+# home key -> its files
+SessionIndex = Dict[str, HomeFiles]
+
+def scan_session(session_dir: str) -> SessionIndex:
+    index = {}
+    with os.scandir(session_dir) as homes:
+        for home in homes:
+            if home.name.startswith('.') or not home.is_dir():
+                continue
+            index[home.name] = scan_home(home.path)
+    return index
+
+def scan_home(home_dir: str) -> HomeFiles:
+    pages = {}
+    urls = {}
+    inputs = None
+
+    with os.scandir(home_dir) as entries:
+        for entry in entries:
+            page_match = PAGE_P.match(entry.name)
+            if page_match is not None:
+                pages[int(page_match.group(1))] = entry.path
+            elif entry.name == "urls" and entry.is_dir():
+                with os.scandir(entry.path) as url_entries:
+                    for url_entry in url_entries:
+                        url_match = URL_P.match(url_entry.name)
+                        if url_match is not None:
+                            urls[int(url_match.group(1))] = url_entry.path
+            elif entry.name == "inputs" and entry.is_dir():
+                inputs_path = posixpath.join(entry.path, "inputs.json")
+                if os.path.exists(inputs_path):
+                    inputs = inputs_path
+
+    return HomeFiles(pages=pages, urls=urls, inputs=inputs)
+
+def scan_archive(archive_path: str) -> SessionIndex:
+    """
+    Indexes a packed session, paths point inside the archive, {archive_path}/{key}/page_1.html
+    """
+    index: Dict[str, HomeFiles] = {}
+    for member in get_archive(archive_path).members.keys():
+        (key, name) = member.split('/', 1)
+        files = index.setdefault(key, HomeFiles(pages={}, urls={}, inputs=None))
+        path = posixpath.join(archive_path, member)
+
+        page_match = PAGE_P.match(name)
+        url_match = URL_P.match(name[len("urls/"):]) if name.startswith("urls/") else None
+        if page_match is not None:
+            files.pages[int(page_match.group(1))] = path
+        elif url_match is not None:
+            files.urls[int(url_match.group(1))] = path
+        elif name == "inputs/inputs.json":
+            index[key] = files._replace(inputs=path)
+    return index
+
+def load_session_index(data_base_path: str, session_id: str) -> SessionIndex:
+    """
+    Scans the session dir, or the session's archive if it was packed
+    """
+    session_dir = posixpath.join(data_base_path, session_id)
+    if not os.path.isdir(session_dir):
+        archive_path = get_archive_path(data_base_path, session_id)
+        if os.path.exists(archive_path):
+            return scan_archive(archive_path)
+    return scan_session(session_dir)
+
+def list_sessions(data_base_path: str) -> List[str]:
+    """
+    Every session in the data directory, whether it's a dir or packed into an archive
+    """
+    sessions = set()
+    with os.scandir(data_base_path) as entries:
+        for e in entries:
+            if e.name.startswith('.'):
+                continue
+            if e.is_dir():
+                sessions.add(e.name)
+            elif e.name.endswith(ARCHIVE_SUFFIX) and e.is_file():
+                sessions.add(e.name[:-len(ARCHIVE_SUFFIX)])
+    return sorted(sessions)
@@ -1,8 +1,106 @@
+import os
 import re
+from typing import Dict, List, NamedTuple, Optional
+from house_trend_discovery.data_gen.parsers.archive import is_archive_path, read_member
+from house_trend_discovery.metrics import active
 
-def parse_table(soup_table) -> dict[str, list[str]]:
-    headers = [t.get_text().strip() for t in soup_table.find_all('th')]
-    cells = [t.get_text().strip() for t in soup_table.find_all('td')]
+"""
+html backends, they only differ in speed and produce the same tables
+
+    html.parser - builds the whole page with BeautifulSoup
+    strainer - BeautifulSoup, but only keeps the requested tables
+    lxml - parses with libxml2 and reads the tables straight from its tree, needs lxml installed.
+           Pages so malformed that libxml2 and html.parser recover differently can give different tables
+"""
+
+HTML_BACKENDS = ["html.parser", "strainer", "lxml"]
+DEFAULT_HTML_BACKEND = "html.parser"
+
+# BeautifulSoup's get_text leaves out the text in these
+NON_TEXT_TAGS = ("script", "style", "template")
+
+class TableExtract(NamedTuple):
+    """
+    The parts of a <table> that parse_table and parse_sideways_table read
+    """
+    headers: List[str] # stripped text of every th
+    cells: List[str] # stripped text of every td
+    top_row_cell_count: int # number of td in the first tr
+
+def extract_tables(
+        html: str,
+        table_ids: List[str],
+        backend: str = DEFAULT_HTML_BACKEND) -> Dict[str, Optional[TableExtract]]:
+    """
+    Returns the first table with each id, None for ids not on the page
+    """
+    with active().stage("html_parsing"):
+        return _extract_tables(html, table_ids, backend)
+
+def _extract_tables(html: str, table_ids: List[str], backend: str) -> Dict[str, Optional[TableExtract]]:
+    if backend in ("html.parser", "strainer"):
+        # imported on first use, so commands that don't parse html don't pay for bs4
+        from bs4 import BeautifulSoup, SoupStrainer
+
+    if backend == "html.parser":
+        soup = BeautifulSoup(html, 'html.parser')
+        return dict([(i, extract_soup_table(soup.find('table', id=i))) for i in table_ids])
+    elif backend == "strainer":
+        soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table', id=table_ids))
+        return dict([(i, extract_soup_table(soup.find('table', id=i))) for i in table_ids])
+    elif backend == "lxml":
+        return extract_lxml_tables(html, table_ids)
+    else:
+        raise Exception(f"Unknown html backend {backend}, expected one of {HTML_BACKENDS}")
+
+def extract_soup_table(table) -> Optional[TableExtract]:
+    if table is None:
+        return None
+    first_row = table.find('tr')
+    return TableExtract(
+        headers=[t.get_text().strip() for t in table.find_all('th')],
+        cells=[t.get_text().strip() for t in table.find_all('td')],
+        top_row_cell_count=len(first_row.find_all('td')) if first_row is not None else 0,
+    )
+
+def extract_lxml_tables(html: str, table_ids: List[str]) -> Dict[str, Optional[TableExtract]]:
+    try:
+        import lxml.html
+    except ImportError:
+        raise Exception("The lxml html backend needs lxml, pip install lxml")
+
+    root = lxml.html.fromstring(html)
+    tables = dict([(i, None) for i in table_ids])
+    for table in root.iter('table'):
+        table_id = table.get('id')
+        if table_id in tables and tables[table_id] is None:
+            first_row = next(table.iter('tr'), None)
+            tables[table_id] = TableExtract(
+                headers=[lxml_text(t).strip() for t in table.iter('th')],
+                cells=[lxml_text(t).strip() for t in table.iter('td')],
+                top_row_cell_count=len(list(first_row.iter('td'))) if first_row is not None else 0,
+            )
+    return tables
+
+def lxml_text(element) -> str:
+    if next(element.iter(*NON_TEXT_TAGS), None) is None:
+        return "".join(element.itertext())
+    return "".join(element.xpath(".//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]"))
+
+def to_table_extract(table) -> TableExtract:
+    if table is None:
+        raise Exception("Table not found")
+    if isinstance(table, TableExtract):
+        return table
+    return extract_soup_table(table)
+
+def parse_table(table) -> dict[str, list[str]]:
+    """
+    table is a TableExtract or a BeautifulSoup table
+    """
+    table = to_table_extract(table)
+    headers = table.headers
+    cells = table.cells
 
     table_width = len(headers)
 
@@ -18,15 +116,17 @@ def parse_table(soup_table) -> dict[str, list[str]]:
     return dict(result)
 
 def parse_sideways_table(table) -> dict[str, list[str]]:
-    top_row_cells = table.find('tr').find_all('td')
-    if len(top_row_cells) == 0:
-        top_row_cells = table.find_all('th')
-        if len(top_row_cells) == 0:
+    """
+    table is a TableExtract or a BeautifulSoup table
+    """
+    table = to_table_extract(table)
+    table_width = table.top_row_cell_count
+    if table_width == 0:
+        table_width = len(table.headers)
+        if table_width == 0:
             raise Exception("No top row cells found when parsing sideways table")
 
-    table_width = len(top_row_cells)
-
-    cells = [t.get_text().strip() for t in table.find_all('td')]
+    cells = table.cells
     table_map = {}
 
     # parse sideways table
@@ -43,8 +143,21 @@ def combine_results(*argv) -> dict:
     return res
 
 def get_file(filename) -> str:
-    with open(filename, 'r') as f:
-        return f.read()
+    """
+    Reads a file from a session dir or a packed session, see archive.py
+    """
+    metrics = active()
+    with metrics.stage("read_files"):
+        if is_archive_path(filename):
+            data = read_member(filename)
+            size = len(data)
+            text = data.decode('utf-8')
+        else:
+            with open(filename, 'r') as f:
+                size = os.fstat(f.fileno()).st_size
+                text = f.read()
+    metrics.incr("bytes_read", size)
+    return text
 
 def get_nums(s):
     s = s.replace(',', '')
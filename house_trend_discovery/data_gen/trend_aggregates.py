@@ -0,0 +1,162 @@
+import click
+import uuid
+from typing import Iterable, Optional
+from house_trend_discovery.data_gen.create_db_engine import get_engine
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Keeps trend_aggregates, the count, mean, median and percentiles of dollar_value per county per grid cell per year,
+so /trends reads 1 row per cell per year instead of aggregating every premise in the radius on each request
+
+Aggregates are computed by postgres from premise_details. load.py refreshes only the (county, year) pairs it loaded
+rows for, each county's delete and re-insert is 1 transaction so readers see the old or the new aggregates.
+Cells are the square grid of trends.grid_cells, a refresh with a different cell size replaces the county's cells
+
+    python house_trend_discovery/data_gen/trend_aggregates.py --county "King County" --state Washington
+"""
+
+DEFAULT_CELL_MILES = 0.5
+
+# keep in sync with trends.MILES_PER_DEGREE_LAT and trends.grid_cells
+MILES_PER_DEGREE_LAT = 69.0
+
+DELETE_SQL = """
+DELETE FROM trend_aggregates
+WHERE county_id = CAST(%(county_id)s AS uuid)
+  AND (CAST(%(years)s AS integer[]) IS NULL OR year_assessed = ANY(CAST(%(years)s AS integer[])))
+"""
+
+INSERT_SQL = """
+WITH located AS (
+    SELECT
+        p.county_id,
+        p.year_assessed,
+        p.dollar_value,
+        ST_X(p.premise_location::geometry) AS lng,
+        floor(ST_Y(p.premise_location::geometry) / CAST(%(cell_lat)s AS float8))::bigint AS cell_row
+    FROM premise_details p
+    WHERE p.county_id = CAST(%(county_id)s AS uuid)
+      AND (CAST(%(years)s AS integer[]) IS NULL OR p.year_assessed = ANY(CAST(%(years)s AS integer[])))
+      AND p.failure_reason IS NULL
+      AND p.premise_location IS NOT NULL
+), cells AS (
+    SELECT
+        located.*,
+        floor(lng / (CAST(%(cell_lat)s AS float8) / cos(radians((cell_row + 0.5) * CAST(%(cell_lat)s AS float8)))))::bigint
+            AS cell_col
+    FROM located
+), stats AS (
+    SELECT
+        county_id,
+        year_assessed,
+        cell_row,
+        cell_col,
+        count(*) AS count,
+        avg(dollar_value) AS mean,
+        percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY dollar_value) AS q
+    FROM cells
+    GROUP BY county_id, year_assessed, cell_row, cell_col
+), centers AS (
+    SELECT
+        stats.*,
+        (cell_row + 0.5) * CAST(%(cell_lat)s AS float8) AS center_lat
+    FROM stats
+)
+INSERT INTO trend_aggregates
+    (county_id, year_assessed, cell_row, cell_col, cell_miles, cell_center, count, mean, median, p10, p25, p75, p90)
+SELECT
+    county_id,
+    year_assessed,
+    cell_row,
+    cell_col,
+    CAST(%(cell_miles)s AS float8),
+    ST_SetSRID(ST_MakePoint(
+        (cell_col + 0.5) * CAST(%(cell_lat)s AS float8) / cos(radians(center_lat)),
+        center_lat), 4326)::geography,
+    count,
+    mean,
+    q[3],
+    q[1],
+    q[2],
+    q[4],
+    q[5]
+FROM centers
+"""
+
+def refresh_county(
+        connection,
+        county_id: uuid.UUID,
+        years: Optional[Iterable[int]] = None,
+        cell_miles: float = DEFAULT_CELL_MILES) -> int:
+    """
+    Recomputes the county's aggregates for years, every year if None, on a raw psycopg2 connection.
+    Returns the number of aggregate rows written
+    """
+    params = {
+        "county_id": str(county_id),
+        "years": sorted(years) if years is not None else None,
+        "cell_miles": cell_miles,
+        "cell_lat": cell_miles / MILES_PER_DEGREE_LAT,
+    }
+    try:
+        with connection.cursor() as cursor:
+            if cell_miles_changed(cursor, county_id, cell_miles):
+                # cells of a different size can't be mixed, rebuild the whole county
+                params["years"] = None
+            cursor.execute(DELETE_SQL, params)
+            cursor.execute(INSERT_SQL, params)
+            count = cursor.rowcount
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return count
+
+def cell_miles_changed(cursor, county_id: uuid.UUID, cell_miles: float) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM trend_aggregates WHERE county_id = CAST(%s AS uuid) AND cell_miles <> %s LIMIT 1",
+        (str(county_id), cell_miles))
+    return cursor.fetchone() is not None
+
+def refresh(
+        counties: Optional[Iterable[tuple]] = None,
+        years: Optional[dict] = None,
+        cell_miles: float = DEFAULT_CELL_MILES) -> int:
+    """
+    Refreshes the (name, state) counties, every county if None. years maps (name, state) to the years to refresh,
+    counties missing from it are refreshed in full. Returns the number of aggregate rows written
+    """
+    years = years or {}
+    connection = get_engine().raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, name, state FROM county")
+            county_ids = dict([((name, state), county_id) for (county_id, name, state) in cursor.fetchall()])
+
+        total = 0
+        for key in (counties if counties is not None else sorted(county_ids)):
+            if key not in county_ids:
+                logger.warning(f"No county {key[0]}, {key[1]}, skipping its trend aggregates")
+                continue
+            count = refresh_county(connection, county_ids[key], years.get(key), cell_miles)
+            logger.info(f"Refreshed {count} trend aggregates for {key[0]}, {key[1]}")
+            total += count
+    finally:
+        connection.close()
+    return total
+
+@click.command(help="Rebuilds the per grid cell per year trend aggregates /trends reads")
+@click.option("--county", help="With --state, only this county, defaults to every county", default=None)
+@click.option("--state", default=None)
+@click.option("--cell_miles", help="Grid cell size", default=DEFAULT_CELL_MILES, type=click.FloatRange(min=0, min_open=True))
+def cli(county: Optional[str], state: Optional[str], cell_miles: float):
+    if (county is None) != (state is None):
+        raise click.UsageError("--county and --state go together")
+    counties = [(county, state)] if county is not None else None
+    total = refresh(counties, cell_miles=cell_miles)
+    logger.info(f"Wrote {total} trend aggregates")
+
+if __name__ == "__main__":
+    cli()
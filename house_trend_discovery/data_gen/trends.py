@@ -0,0 +1,247 @@
+import click
+import json
+import os
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+from house_trend_discovery.data_gen.models import PremiseDetails
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Price trends over assessment histories, computed on columns instead of looping over records
+
+Records are loaded into a frame with 1 row per parcel per year assessed, sorted by parcel then year,
+from dataset.py output (json, jsonl or a parquet dataset), PremiseDetails or the database. Then
+
+    yoy_changes - each year's change from the parcel's previous assessment, annualized over gaps
+    parcel_cagr - each parcel's compound annual growth between its first and last assessment
+    price_index - the median value per grid cell per year, and that median relative to the cell's first year
+
+    python house_trend_discovery/data_gen/trends.py --i out.jsonl --out_dir trends/
+"""
+
+COLUMNS = ["parcel", "premise_address", "year_assessed", "dollar_value", "lat", "lng", "county_name", "county_state"]
+
+MILES_PER_DEGREE_LAT = 69.0
+
+def to_frame(columns: dict) -> pd.DataFrame:
+    """
+    Builds the trend frame from columns named like COLUMNS, parcel_number may be None and falls back to
+    the lowercased address. A parcel assessed twice in the same year keeps its last record
+    """
+    df = pd.DataFrame(columns)
+    parcel = df["parcel_number"].astype("string")
+    df["parcel"] = parcel.fillna(df["premise_address"].astype("string").str.lower())
+    df = df[COLUMNS].copy()
+
+    df["year_assessed"] = df["year_assessed"].astype(np.int32)
+    df["dollar_value"] = df["dollar_value"].astype(np.float64)
+    df["lat"] = df["lat"].astype(np.float64)
+    df["lng"] = df["lng"].astype(np.float64)
+    for c in ["parcel", "premise_address", "county_name", "county_state"]:
+        df[c] = df[c].astype("category")
+
+    df = df.drop_duplicates(["parcel", "year_assessed"], keep="last")
+    return df.sort_values(["parcel", "year_assessed"], kind="stable").reset_index(drop=True)
+
+def empty_columns() -> dict:
+    return dict([(c, []) for c in ["parcel_number"] + COLUMNS[1:]])
+
+def append_record(columns: dict, r: dict):
+    columns["parcel_number"].append(r.get("parcel_number"))
+    columns["premise_address"].append(r["premise_address"])
+    columns["year_assessed"].append(r["year_assessed"])
+    columns["dollar_value"].append(r["dollar_value"])
+    columns["lat"].append(r["premise_location"]["lat"])
+    columns["lng"].append(r["premise_location"]["lng"])
+    columns["county_name"].append(r["county"]["name"])
+    columns["county_state"].append(r["county"]["state"])
+
+def frame_from_records(records: Iterable[dict]) -> pd.DataFrame:
+    """
+    records are PremiseDetails as dicts, like the json dataset.py writes
+    """
+    columns = empty_columns()
+    for r in records:
+        append_record(columns, r)
+    return to_frame(columns)
+
+def frame_from_results(results: Iterable[PremiseDetails]) -> pd.DataFrame:
+    return frame_from_records(r.model_dump() for r in results)
+
+def frame_from_file(path: str) -> pd.DataFrame:
+    """
+    Reads the output of dataset.py, a json array, json lines or a parquet dataset directory
+    """
+    if os.path.isdir(path):
+        return frame_from_parquet(path)
+
+    with open(path, 'r') as f:
+        first_char = f.read(1)
+        while first_char.isspace():
+            first_char = f.read(1)
+        f.seek(0)
+
+        if first_char == '[':
+            return frame_from_records(json.load(f))
+        return frame_from_records(json.loads(line) for line in f if line.strip())
+
+def frame_from_parquet(path: str) -> pd.DataFrame:
+    from house_trend_discovery.data_gen.dataset.parquet import read_parquet
+
+    table = read_parquet(path).select(
+        ["parcel_number", "premise_address", "year_assessed", "dollar_value", "lat", "lng", "county_name", "county_state"])
+    df = table.to_pandas()
+    return to_frame(dict([(c, df[c].astype(object) if isinstance(df[c].dtype, pd.CategoricalDtype) else df[c])
+        for c in df.columns]))
+
+def frame_from_db(county_name: Optional[str] = None, state: Optional[str] = None) -> pd.DataFrame:
+    from sqlalchemy import text
+    from house_trend_discovery.data_gen.create_db_engine import get_engine
+
+    sql = """
+        SELECT
+            pd.parcel_number,
+            pd.premise_address,
+            pd.year_assessed,
+            pd.dollar_value,
+            ST_Y(pd.premise_location::geometry) AS lat,
+            ST_X(pd.premise_location::geometry) AS lng,
+            c.name AS county_name,
+            c.state AS county_state
+        FROM premise_details pd
+        JOIN county c ON c.id = pd.county_id
+    """
+    params = {}
+    if county_name is not None and state is not None:
+        sql += " WHERE c.name = :county_name AND c.state = :state"
+        params = {"county_name": county_name, "state": state}
+
+    with get_engine().connect() as connection:
+        df = pd.read_sql(text(sql), connection, params=params)
+    return to_frame(dict([(c, df[c]) for c in df.columns]))
+
+def previous_in_parcel(df: pd.DataFrame) -> np.ndarray:
+    """
+    True where the row before is the same parcel, df must be sorted by parcel then year
+    """
+    codes = df["parcel"].cat.codes.to_numpy()
+    same = np.zeros(len(df), dtype=bool)
+    same[1:] = codes[1:] == codes[:-1]
+    return same
+
+def yoy_changes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds years_since_previous and yoy, the change from the parcel's previous assessment as a fraction per year.
+    Gaps of several years are annualized, (value / previous) ** (1 / years) - 1. Each parcel's first year is NaN
+    """
+    values = df["dollar_value"].to_numpy()
+    years = df["year_assessed"].to_numpy()
+    same = previous_in_parcel(df)
+
+    previous_values = np.roll(values, 1)
+    gaps = (years - np.roll(years, 1)).astype(np.float64)
+    valid = same & (previous_values > 0) & (gaps > 0)
+
+    yoy = np.full(len(df), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yoy[valid] = np.power(values[valid] / previous_values[valid], 1.0 / gaps[valid]) - 1.0
+
+    out = df.copy()
+    out["years_since_previous"] = np.where(same, gaps, np.nan)
+    out["yoy"] = yoy
+    return out
+
+def parcel_cagr(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    1 row per parcel with its first and last assessment and the compound annual growth rate between them,
+    NaN for parcels assessed in only 1 year or first assessed at 0
+    """
+    values = df["dollar_value"].to_numpy()
+    years = df["year_assessed"].to_numpy()
+    codes = df["parcel"].cat.codes.to_numpy()
+
+    # df is sorted by parcel, so each parcel's rows are contiguous. [:len(df)] leaves no parcels for an empty df
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])[:len(df)]
+    ends = np.r_[starts[1:], len(df)][:len(starts)] - 1
+
+    first_values = values[starts]
+    last_values = values[ends]
+    spans = (years[ends] - years[starts]).astype(np.float64)
+    valid = (spans > 0) & (first_values > 0)
+
+    cagr = np.full(len(starts), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr[valid] = np.power(last_values[valid] / first_values[valid], 1.0 / spans[valid]) - 1.0
+
+    return pd.DataFrame({
+        "parcel": df["parcel"].to_numpy()[starts],
+        "premise_address": df["premise_address"].to_numpy()[ends],
+        "county_name": df["county_name"].to_numpy()[ends],
+        "county_state": df["county_state"].to_numpy()[ends],
+        "lat": df["lat"].to_numpy()[ends],
+        "lng": df["lng"].to_numpy()[ends],
+        "first_year": years[starts],
+        "last_year": years[ends],
+        "first_value": first_values,
+        "last_value": last_values,
+        "years_assessed": ends - starts + 1,
+        "cagr": cagr,
+    })
+
+def grid_cells(lat: np.ndarray, lng: np.ndarray, cell_miles: float) -> tuple:
+    """
+    (row, col) of the cell_miles square grid cell each point is in. Rows are bands of latitude, columns are
+    sized for the latitude at the middle of the row so cells stay square away from the equator
+    """
+    cell_lat = cell_miles / MILES_PER_DEGREE_LAT
+    rows = np.floor(lat / cell_lat).astype(np.int64)
+    row_centers = (rows + 0.5) * cell_lat
+    cell_lng = cell_lat / np.cos(np.radians(row_centers))
+    cols = np.floor(lng / cell_lng).astype(np.int64)
+    return (rows, cols)
+
+def price_index(df: pd.DataFrame, cell_miles: float = 0.5) -> pd.DataFrame:
+    """
+    1 row per grid cell per year with the count and median value of the parcels assessed in it, and index,
+    the median relative to the cell's first year, 100 in that year
+    """
+    (rows, cols) = grid_cells(df["lat"].to_numpy(), df["lng"].to_numpy(), cell_miles)
+    cells = pd.DataFrame({
+        "county_name": df["county_name"].to_numpy(),
+        "county_state": df["county_state"].to_numpy(),
+        "cell_row": rows,
+        "cell_col": cols,
+        "year_assessed": df["year_assessed"].to_numpy(),
+        "dollar_value": df["dollar_value"].to_numpy(),
+    })
+
+    keys = ["county_name", "county_state", "cell_row", "cell_col"]
+    index = cells.groupby(keys + ["year_assessed"], observed=True, sort=True)["dollar_value"] \
+        .agg(count="count", median="median") \
+        .reset_index()
+
+    base = index.groupby(keys, observed=True, sort=False)["median"].transform("first")
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index["index"] = np.where(base > 0, index["median"] / base * 100.0, np.nan)
+    return index
+
+@click.command(help="Computes per parcel appreciation and a per grid cell price index from parsed premise details")
+@click.option("--i", "in_path", help="dataset.py output, json, jsonl or a parquet directory, reads the database if not set", default=None, type=click.Path(exists=True))
+@click.option("--county", help="With --state, only this county when reading the database", default=None)
+@click.option("--state", default=None)
+@click.option("--cell_miles", help="Grid cell size of the price index", default=0.5, type=click.FloatRange(min=0, min_open=True))
+@click.option("--out_dir", help="Writes yoy.csv, parcel_cagr.csv and price_index.csv here", required=True, type=click.Path())
+def cli(in_path: Optional[str], county: Optional[str], state: Optional[str], cell_miles: float, out_dir: str):
+    df = frame_from_file(in_path) if in_path is not None else frame_from_db(county, state)
+    logger.info(f"Loaded {len(df)} assessments of {df['parcel'].nunique()} parcels")
+
+    os.makedirs(out_dir, exist_ok=True)
+    yoy_changes(df).to_csv(os.path.join(out_dir, "yoy.csv"), index=False)
+    parcel_cagr(df).to_csv(os.path.join(out_dir, "parcel_cagr.csv"), index=False)
+    price_index(df, cell_miles).to_csv(os.path.join(out_dir, "price_index.csv"), index=False)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+import json
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+"""
+Stage timings and counters for a run. Code reports to the active Metrics with
+
+    with active().stage("html_parsing"):
+        ...
+    active().incr("bytes_read", len(text))
+
+and does nothing when no Metrics is active. Pool workers collect their own Metrics per task and send them
+back as dicts, which the parent merges, so stage seconds from workers are summed across processes and can add
+up to more than the run's wall time
+"""
+
+class Metrics:
+    def __init__(self):
+        self.stage_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.failure_reasons: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return self.to_dict()
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+        self.merge(state)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_seconds(name, time.perf_counter() - start)
+
+    def add_seconds(self, name: str, seconds: float):
+        with self.lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def incr(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def failure(self, reason: str):
+        with self.lock:
+            self.failure_reasons[reason] = self.failure_reasons.get(reason, 0) + 1
+
+    def merge(self, other: dict):
+        """
+        Adds in the to_dict() of another Metrics, from a worker process
+        """
+        with self.lock:
+            for (name, seconds) in other["stage_seconds"].items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            for (name, n) in other["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for (reason, n) in other["failure_reasons"].items():
+                self.failure_reasons[reason] = self.failure_reasons.get(reason, 0) + n
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "stage_seconds": dict(self.stage_seconds),
+                "counters": dict(self.counters),
+                "failure_reasons": dict(self.failure_reasons),
+            }
+
+    def summary(self) -> str:
+        d = self.to_dict()
+        lines = ["stage seconds:"]
+        lines += [f"  {name:<24}{seconds:>12.3f}" for (name, seconds) in d["stage_seconds"].items()]
+        lines += ["counters:"]
+        lines += [f"  {name:<24}{n:>12}" for (name, n) in sorted(d["counters"].items())]
+        if len(d["failure_reasons"]) > 0:
+            lines += ["failures:"]
+            lines += [
+                f"  {n:>6}  {reason}"
+                for (reason, n) in sorted(d["failure_reasons"].items(), key=lambda x: -x[1])
+            ]
+        return "\n".join(lines)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @contextmanager
+    def activate(self) -> Iterator["Metrics"]:
+        """
+        Makes this the Metrics active() returns until the block exits
+        """
+        global _active
+        previous = _active
+        _active = self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+class NullMetrics(Metrics):
+    """
+    Reported to when no Metrics is active, records nothing
+    """
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def add_seconds(self, name: str, seconds: float):
+        pass
+
+    def incr(self, name: str, n: int = 1):
+        pass
+
+    def failure(self, reason: str):
+        pass
+
+_null = NullMetrics()
+_active: Optional[Metrics] = None
+
+def active() -> Metrics:
+    return _active if _active is not None else _null
@@ -0,0 +1,102 @@
+import click
+from contextlib import contextmanager, nullcontext
+import cProfile
+import io
+import pstats
+from typing import ContextManager, Iterator, List, Optional
+from house_trend_discovery.get_logger import get_logger
+
+logger = get_logger(__name__)
+
+"""
+Profiles a block of code and saves the profile with a report of its top hotspots
+
+    with profiled("run.prof", top=30):
+        parser.run()
+
+cprofile saves run.prof, readable with pstats or snakeviz, and run.prof.txt with the top functions by cumulative
+and own time. pyinstrument, if installed, saves run.prof.html and run.prof.txt with its call tree, it samples
+so it slows the run down less and shows where time went per call path
+
+Only the current process is profiled, callers parse in process while profiling instead of in a pool
+"""
+
+PROFILERS = ["cprofile", "pyinstrument"]
+DEFAULT_PROFILER = "cprofile"
+
+def profile_options(f):
+    """
+    Adds --profile, --profile_top and --profiler to a click command
+    """
+    f = click.option(
+        "--profiler",
+        help="cprofile, or pyinstrument if it's installed",
+        default=DEFAULT_PROFILER,
+        type=click.Choice(PROFILERS))(f)
+    f = click.option("--profile_top", help="Number of hotspots in the profile report", default=30)(f)
+    f = click.option(
+        "--profile",
+        help="Profile the run and save the profile to this path, homes are parsed in process while profiling",
+        default=None,
+        type=click.Path())(f)
+    return f
+
+def maybe_profiled(out_path: Optional[str], top: int = 30, profiler: str = DEFAULT_PROFILER) -> ContextManager:
+    if out_path is None:
+        return nullcontext()
+    return profiled(out_path, top, profiler)
+
+@contextmanager
+def profiled(out_path: str, top: int = 30, profiler: str = DEFAULT_PROFILER) -> Iterator[None]:
+    if profiler == "pyinstrument":
+        with pyinstrument_profiled(out_path):
+            yield
+    elif profiler == "cprofile":
+        with cprofile_profiled(out_path, top):
+            yield
+    else:
+        raise Exception(f"Unknown profiler {profiler}, expected one of {PROFILERS}")
+
+@contextmanager
+def cprofile_profiled(out_path: str, top: int) -> Iterator[None]:
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(out_path)
+        report_path = f"{out_path}.txt"
+        with open(report_path, 'w') as f:
+            f.write(top_report(profile, top))
+        logger.info(f"Saved profile to {out_path}, top {top} hotspots in {report_path}")
+
+@contextmanager
+def pyinstrument_profiled(out_path: str) -> Iterator[None]:
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise Exception("The pyinstrument profiler needs pyinstrument, pip install pyinstrument")
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        html_path = f"{out_path}.html"
+        report_path = f"{out_path}.txt"
+        with open(html_path, 'w') as f:
+            f.write(profiler.output_html())
+        with open(report_path, 'w') as f:
+            f.write(profiler.output_text(unicode=False, color=False))
+        logger.info(f"Saved profile to {html_path}, call tree in {report_path}")
+
+def top_report(profile: cProfile.Profile, top: int) -> str:
+    sections: List[str] = []
+    for (title, sort_key) in [("cumulative time", "cumulative"), ("own time", "tottime")]:
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats(sort_key).print_stats(top)
+        sections.append(f"top {top} by {title}\n{out.getvalue()}")
+    return "\n".join(sections)
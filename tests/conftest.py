@@ -0,0 +1,32 @@
+import json
+import os
+import pytest
+
+def write_home(session_dir, key, pages, inputs=True):
+    """
+    A home dir the way the crawler saves it, each page with its url
+    """
+    home_dir = os.path.join(session_dir, key)
+    os.makedirs(os.path.join(home_dir, "urls"), exist_ok=True)
+    for (n, html) in enumerate(pages, start=1):
+        with open(os.path.join(home_dir, f"page_{n}.html"), 'w') as f:
+            f.write(html)
+        with open(os.path.join(home_dir, "urls", f"url_{n}.txt"), 'w') as f:
+            f.write(f"https://example.com/{key}/{n}")
+    if inputs:
+        os.makedirs(os.path.join(home_dir, "inputs"), exist_ok=True)
+        with open(os.path.join(home_dir, "inputs", "inputs.json"), 'w') as f:
+            json.dump({"address": f"{key} Main St"}, f)
+    return home_dir
+
+@pytest.fixture
+def session(tmp_path):
+    """
+    (data dir, session id) of a session with 2 homes
+    """
+    data_dir = str(tmp_path / "data")
+    session_id = "1700000000000"
+    session_dir = os.path.join(data_dir, session_id)
+    write_home(session_dir, "home_a", ["<html>a1</html>", "<html>a2 é</html>"])
+    write_home(session_dir, "home_b", ["<html>b1</html>"], inputs=False)
+    return (data_dir, session_id)
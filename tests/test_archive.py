@@ -0,0 +1,79 @@
+import os
+import shutil
+import pytest
+from house_trend_discovery.data_gen.parsers import archive
+from house_trend_discovery.data_gen.parsers.archive import (
+    SessionArchive,
+    default_codec,
+    get_archive_path,
+    is_archive_path,
+    pack_session,
+    read_member,
+    split_archive_path,
+    verify_archive,
+)
+from house_trend_discovery.data_gen.parsers.session_index import load_session_index, scan_session
+from house_trend_discovery.data_gen.parsers.utils import get_file
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize("codec", [None, "zlib", "zstd"])
+def test_pack_round_trips_every_file(session, codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    (data_dir, session_id) = session
+    archive_path = pack_session(data_dir, session_id, codec=codec)
+
+    assert archive_path == get_archive_path(data_dir, session_id)
+    archive = SessionArchive(archive_path)
+    assert sorted(archive.members) == [
+        "home_a/inputs/inputs.json",
+        "home_a/page_1.html",
+        "home_a/page_2.html",
+        "home_a/urls/url_1.txt",
+        "home_a/urls/url_2.txt",
+        "home_b/page_1.html",
+        "home_b/urls/url_1.txt",
+    ]
+    for member in archive.members:
+        assert archive.read(member) == read_bytes(os.path.join(data_dir, session_id, member))
+    assert verify_archive(data_dir, session_id)
+
+def test_verify_fails_when_the_session_changed(session):
+    (data_dir, session_id) = session
+    pack_session(data_dir, session_id, codec="zlib")
+    with open(os.path.join(data_dir, session_id, "home_b", "page_1.html"), 'w') as f:
+        f.write("<html>changed</html>")
+    assert not verify_archive(data_dir, session_id)
+
+def test_files_are_read_through_the_archive_path(session):
+    (data_dir, session_id) = session
+    session_dir = os.path.join(data_dir, session_id)
+    expected = dict([
+        (key, [get_file(p) for (_, p) in sorted(files.pages.items())])
+        for (key, files) in scan_session(session_dir).items()])
+
+    pack_session(data_dir, session_id, codec="zlib")
+    shutil.rmtree(session_dir)
+
+    # with the dir gone, the session is indexed from the archive
+    index = load_session_index(data_dir, session_id)
+    page = index["home_a"].pages[2]
+    assert is_archive_path(page)
+    assert split_archive_path(page) == (get_archive_path(data_dir, session_id), "home_a/page_2.html")
+    assert index["home_a"].inputs is not None and index["home_b"].inputs is None
+    assert dict([(key, [get_file(p) for (_, p) in sorted(files.pages.items())]) for (key, files) in index.items()]) \
+        == expected
+    assert read_member(index["home_b"].urls[1]) == b"https://example.com/home_b/1"
+
+def test_a_file_that_isnt_an_archive_is_rejected(tmp_path):
+    path = tmp_path / "bad.pack"
+    path.write_bytes(b"not an archive at all")
+    with pytest.raises(Exception, match="not a session archive"):
+        SessionArchive(str(path))
+
+def test_default_codec_falls_back_to_zlib(monkeypatch):
+    monkeypatch.setattr(archive.importlib.util, "find_spec", lambda name: None)
+    assert default_codec() == "zlib"
@@ -0,0 +1,37 @@
+import io
+import json
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.dataset.dataset import get_parser, iter_parser_records, write_jsonl, write_records_jsonl
+from house_trend_discovery.data_gen.models import iter_premise_details
+
+def test_records_are_written_as_the_premise_details_lines(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "kingcounty", 5, padding=0)
+    records = list(iter_parser_records("kingcounty", data_dir))
+
+    expected = io.StringIO()
+    count = write_jsonl(iter_premise_details(records), expected)
+    lines = io.StringIO()
+    assert write_records_jsonl(iter(records), lines) == count > 0
+
+    assert lines.getvalue() == expected.getvalue()
+
+def test_to_json_matches_dumping_each_premise_details(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 5, padding=0)
+    parser = get_parser("houseinfo", data_dir).run()
+
+    # how results were written before they were records
+    expected = json.dumps([json.loads(r.model_dump_json()) for r in parser.get_results()])
+    assert json.loads(parser.to_json()) == json.loads(expected)
+    assert len(json.loads(expected)) == 25
+
+def test_streaming_and_collecting_write_the_same_records(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 5, padding=0)
+
+    streamed = io.StringIO()
+    write_records_jsonl(iter_parser_records("houseinfo", data_dir), streamed)
+    collected = get_parser("houseinfo", data_dir).run()
+
+    assert [json.loads(line) for line in streamed.getvalue().splitlines()] == json.loads(collected.to_json())
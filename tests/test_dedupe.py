@@ -0,0 +1,29 @@
+from house_trend_discovery.data_gen.dedupe import dedupe_locations, normalize_address
+from house_trend_discovery.data_gen.models import County, LatLng, Location
+
+def location(address):
+    return Location(address=address, county=County(name="King", state="WA"), location=LatLng(lat=47.6, lng=-122.3))
+
+def test_normalize_address_matches_spellings_of_the_same_address():
+    assert normalize_address("123 Main Street, Seattle, WA 98101, USA") == "123 MAIN ST SEATTLE WA 98101"
+    assert normalize_address("123 main st seattle wa 98101") == "123 MAIN ST SEATTLE WA 98101"
+
+def test_normalize_address_abbreviates_directions_and_units():
+    assert normalize_address("400 North East Avenue, Apartment 2, Seattle, WA, United States") == \
+        "400 N E AVE APT 2 SEATTLE WA"
+
+def test_normalize_address_keeps_the_country_inside_the_address():
+    # only a trailing country is dropped
+    assert normalize_address("1 USA Way, Springfield") == "1 USA WAY SPRINGFIELD"
+
+def test_dedupe_locations_keeps_the_first_of_each_address():
+    locations = [
+        location("123 Main Street, Seattle, WA 98101, USA"),
+        location("9 Pine St, Seattle, WA 98101, USA"),
+        location("123 main st seattle wa 98101"),
+    ]
+    assert dedupe_locations(locations) == locations[:2]
+
+def test_dedupe_locations_drops_skipped_addresses():
+    locations = [location("123 Main Street, Seattle, WA 98101, USA"), location("9 Pine St, Seattle, WA 98101, USA")]
+    assert dedupe_locations(locations, skip={"9 PINE ST SEATTLE WA 98101"}) == locations[:1]
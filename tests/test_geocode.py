@@ -0,0 +1,149 @@
+import threading
+import pytest
+from googlemaps.exceptions import ApiError, Timeout
+from house_trend_discovery.data_gen import geocode
+from house_trend_discovery.data_gen.geocode import GeocodeCache, Geocoder, TokenBucket
+
+class FakeClient:
+    """
+    Stands in for googlemaps.Client, answers with 1 address per coordinate and can fail the first calls
+    """
+    def __init__(self, failures=None, empty=()):
+        self.failures = list(failures or [])
+        self.empty = set(empty)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def reverse_geocode(self, latlng):
+        with self.lock:
+            self.calls.append(latlng)
+            if self.failures:
+                raise self.failures.pop(0)
+        if latlng in self.empty:
+            return []
+        return [{"formatted_address": f"{latlng[0]},{latlng[1]}"}, {"formatted_address": "second"}]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        # a real sleep always lets the clock move on, even when asked for a rounding error's worth
+        self.now += max(seconds, 1e-6)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(geocode.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(geocode.time, "sleep", clock.sleep)
+    return clock
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_rate(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+def test_token_bucket_refills_while_idle(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 1.0
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+def test_token_bucket_holds_the_average_rate(clock):
+    bucket = TokenBucket(rate=5, capacity=1)
+    for _ in range(11):
+        bucket.acquire()
+    # the first is free, the other 10 wait a fifth of a second each
+    assert clock.now == pytest.approx(2.0, abs=1e-3)
+
+def test_cache_misses_then_hits_on_rounded_coordinates(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"), decimals=3)
+    assert cache.get((47.1234, -122.1234)) == (False, None)
+
+    cache.set((47.1234, -122.1234), {"formatted_address": "a"})
+    assert cache.get((47.12341, -122.12339)) == (True, {"formatted_address": "a"})
+    assert cache.get((47.125, -122.1234)) == (False, None)
+    cache.close()
+
+def test_cache_keeps_coordinates_without_an_address(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"))
+    cache.set((1.0, 2.0), None)
+    assert cache.get((1.0, 2.0)) == (True, None)
+    cache.close()
+
+def test_cache_persists_across_runs(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = GeocodeCache(path)
+    cache.set((1.0, 2.0), {"formatted_address": "a"})
+    cache.close()
+
+    reopened = GeocodeCache(path)
+    assert reopened.get((1.0, 2.0)) == (True, {"formatted_address": "a"})
+    reopened.close()
+
+def test_geocoder_keeps_input_order_and_the_first_address(tmp_path):
+    latlngs = [(float(i), float(-i)) for i in range(20)]
+    client = FakeClient(empty=[(3.0, -3.0)])
+    geocoder = Geocoder(client, workers=4, queries_per_second=1000)
+
+    results = geocoder.reverse_geocode_all(latlngs)
+
+    assert [r["formatted_address"] if r is not None else None for r in results] == \
+        [None if l == (3.0, -3.0) else f"{l[0]},{l[1]}" for l in latlngs]
+    assert geocoder.api_calls == 20
+
+def test_geocoder_repeat_run_is_served_from_the_cache(tmp_path):
+    latlngs = [(float(i), 1.0) for i in range(10)]
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"))
+
+    first = Geocoder(FakeClient(), cache=cache, workers=4, queries_per_second=1000)
+    expected = first.reverse_geocode_all(latlngs)
+
+    client = FakeClient()
+    second = Geocoder(client, cache=cache, workers=4, queries_per_second=1000)
+    assert second.reverse_geocode_all(latlngs) == expected
+    assert client.calls == []
+    assert (second.api_calls, second.cache_hits) == (0, 10)
+    cache.close()
+
+def test_geocoder_retries_retryable_errors(clock):
+    client = FakeClient(failures=[ApiError("OVER_QUERY_LIMIT"), Timeout()])
+    geocoder = Geocoder(client, workers=1, queries_per_second=1000, backoff_seconds=0.5)
+
+    assert geocoder.reverse_geocode((1.0, 2.0)) == {"formatted_address": "1.0,2.0"}
+    assert geocoder.api_calls == 3
+    # backoff doubles, with jitter between half and 1.5 times the step
+    backoffs = [s for s in clock.sleeps if s >= 0.25]
+    assert len(backoffs) == 2
+    assert 0.25 <= backoffs[0] <= 0.75
+    assert 0.5 <= backoffs[1] <= 1.5
+
+def test_geocoder_gives_up_on_errors_that_wont_succeed(clock, tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"))
+    client = FakeClient(failures=[ApiError("REQUEST_DENIED")])
+    geocoder = Geocoder(client, cache=cache, workers=1, queries_per_second=1000)
+
+    assert geocoder.reverse_geocode((1.0, 2.0)) is None
+    assert geocoder.api_calls == 1
+    # failed lookups aren't cached, the next run tries again
+    assert cache.get((1.0, 2.0)) == (False, None)
+    cache.close()
+
+def test_geocoder_stops_after_max_retries(clock):
+    client = FakeClient(failures=[Timeout()] * 10)
+    geocoder = Geocoder(client, workers=1, queries_per_second=1000, max_retries=2)
+
+    assert geocoder.reverse_geocode((1.0, 2.0)) is None
+    assert geocoder.api_calls == 3
@@ -0,0 +1,46 @@
+import os
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.parsers.houseinfo import Parser
+
+def parse_session(data_dir):
+    parser = Parser(scraper_name="houseinfo", data_base_path=data_dir).run()
+    return (parser.get_records(), parser.get_failures())
+
+def first_home_dir(data_dir, session_id):
+    session_dir = os.path.join(data_dir, session_id)
+    return os.path.join(session_dir, sorted(os.listdir(session_dir))[0])
+
+def test_parses_every_year_of_each_home(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 3, padding=0)
+
+    (records, failures) = parse_session(data_dir)
+    assert failures == []
+    assert [r.parcel_number for r in records] == ["5000000", "5000001", "5000002"]
+    for r in records:
+        years = [year for (year, _) in r.assessments()]
+        assert years == [2024, 2023, 2022, 2021, 2020]
+        values = [value for (_, value) in r.assessments()]
+        assert [a - b for (a, b) in zip(values, values[1:])] == [15000] * 4
+        assert r.assessment_urls[0].startswith("https://www.snoco.org/")
+        assert (r.county.name, r.premise_address) == ("King County", f"{r.parcel_number[-1]} Main St, Seattle, WA 98101, USA")
+
+def test_an_unparseable_market_value_only_drops_its_year(tmp_path):
+    data_dir = str(tmp_path)
+    session_id = write_session(data_dir, "houseinfo", 2, padding=0)
+    (expected, _) = parse_session(data_dir)
+
+    page_path = os.path.join(first_home_dir(data_dir, session_id), "page_2.html")
+    with open(page_path, 'r') as f:
+        html = f.read()
+    # the 2022 column of the Market Total row
+    row_start = html.index("<td>Market Total</td>")
+    cells = html[row_start:html.index("</tr>", row_start)].split("</td>")
+    html = html.replace(cells[3] + "</td>", "<td>N/A</td>", 1)
+    with open(page_path, 'w') as f:
+        f.write(html)
+
+    (records, failures) = parse_session(data_dir)
+    assert failures == []
+    assert list(records[0].assessments()) == [a for a in expected[0].assessments() if a[0] != 2022]
+    assert list(records[1].assessments()) == list(expected[1].assessments())
@@ -0,0 +1,48 @@
+import pytest
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.parsers.houseinfo import Parser as HouseinfoParser
+from house_trend_discovery.data_gen.parsers.kingcounty import Parser as KingcountyParser
+from house_trend_discovery.data_gen.parsers.utils import HTML_BACKENDS, TableExtract, extract_tables
+
+PAGE = """<html><head><style>td { color: red; }</style></head><body>
+<table id="outer">
+<tr><th> Year </th><th>Value <b>($)</b></th></tr>
+<tr><td>2024</td><td>1,000 <script>var x = "not text";</script></td></tr>
+<tr><td>2023</td><td><span>&amp; 900</span></td></tr>
+</table>
+<table id="empty"></table>
+<table id="outer"><tr><td>the second table with the id</td></tr></table>
+</body></html>"""
+
+PARSERS = {"kingcounty": KingcountyParser, "houseinfo": HouseinfoParser}
+
+@pytest.mark.parametrize("backend", HTML_BACKENDS)
+def test_backends_extract_the_same_tables(backend):
+    tables = extract_tables(PAGE, ["outer", "empty", "missing"], backend)
+
+    assert tables == {
+        "outer": TableExtract(
+            headers=["Year", "Value ($)"],
+            cells=["2024", "1,000", "2023", "& 900"],
+            top_row_cell_count=0),
+        "empty": TableExtract(headers=[], cells=[], top_row_cell_count=0),
+        "missing": None,
+    }
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(Exception, match="Unknown html backend"):
+        extract_tables(PAGE, ["outer"], "html5lib")
+
+@pytest.mark.parametrize("scraper_name", sorted(PARSERS))
+def test_backends_parse_the_same_records(tmp_path, scraper_name):
+    data_dir = str(tmp_path)
+    write_session(data_dir, scraper_name, 5, padding=256)
+
+    outputs = {}
+    for backend in HTML_BACKENDS:
+        parser = PARSERS[scraper_name](scraper_name=scraper_name, data_base_path=data_dir, html_backend=backend).run()
+        assert parser.get_failures() == []
+        outputs[backend] = parser.to_json()
+
+    assert len(set(outputs.values())) == 1
+    assert outputs["html.parser"] != "[]"
@@ -0,0 +1,20 @@
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.parsers.kingcounty import Parser
+
+def test_parses_the_years_since_each_home_was_built(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "kingcounty", 5, padding=0)
+
+    parser = Parser(scraper_name="kingcounty", data_base_path=data_dir).run()
+    records = parser.get_records()
+    assert parser.get_failures() == []
+    assert [r.parcel_number for r in records] == [str(1000000 + i) for i in range(5)]
+    for r in records:
+        years = [year for (year, _) in r.assessments()]
+        # the tax roll goes back to 2005, years before the home was built are dropped
+        assert years == list(range(2024, max(r.year_built, 2005) - 1, -1))
+        values = [value for (_, value) in r.assessments()]
+        assert [a - b for (a, b) in zip(values, values[1:])] == [9000] * (len(values) - 1)
+        assert r.sq_feet > 0 and r.bed_count > 0 and r.bath_count > 0
+        assert r.assessment_urls == [f"https://blue.kingcounty.com/Assessor/eRealProperty/Dashboard.aspx?ParcelNbr={r.parcel_number}"]
+        assert r.county.name == "King County"
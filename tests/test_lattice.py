@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from house_trend_discovery.data_gen import lattice
+from house_trend_discovery.data_gen.lattice import (
+    KM_PER_DEGREE_LAT,
+    KM_PER_DEGREE_LNG_AT_EQUATOR,
+    KM_PER_MILE,
+    dedupe_points,
+    generate_lattice,
+)
+
+def miles_between(a, b):
+    mean_lat = np.radians((a[0] + b[0]) / 2)
+    dy = (a[0] - b[0]) * KM_PER_DEGREE_LAT
+    dx = (a[1] - b[1]) * KM_PER_DEGREE_LNG_AT_EQUATOR * np.cos(mean_lat)
+    return np.hypot(dx, dy) / KM_PER_MILE
+
+def nearest_neighbor_miles(points):
+    return [min(miles_between(p, q) for (j, q) in enumerate(points) if j != i) for (i, p) in enumerate(points)]
+
+@pytest.mark.parametrize("shape", ["square", "hex"])
+def test_points_are_d_miles_apart_and_inside_the_box(shape):
+    (sw_lat, sw_lng, ne_lat, ne_lng) = (47.5, -122.4, 47.6, -122.25)
+    points = generate_lattice(sw_lat, sw_lng, ne_lat, ne_lng, 1.0, shape=shape)
+
+    assert points.shape[1] == 2
+    assert (points[:, 0] >= sw_lat).all() and (points[:, 0] <= ne_lat).all()
+    assert (points[:, 1] >= sw_lng).all() and (points[:, 1] <= ne_lng).all()
+    assert nearest_neighbor_miles(points) == pytest.approx([1.0] * len(points), rel=0.01)
+
+def test_hex_rows_are_closer_and_shifted():
+    points = generate_lattice(47.5, -122.4, 47.6, -122.25, 1.0, shape="hex")
+    lats = np.unique(points[:, 0])
+    assert (lats[1] - lats[0]) * KM_PER_DEGREE_LAT / KM_PER_MILE == pytest.approx(np.sqrt(3) / 2)
+    first_row = points[points[:, 0] == lats[0]]
+    second_row = points[points[:, 0] == lats[1]]
+    assert second_row[0, 1] > first_row[0, 1]
+
+def test_lattice_covers_a_box_smaller_than_d():
+    points = generate_lattice(47.5, -122.4, 47.5001, -122.3999, 5.0)
+    assert points.tolist() == [[47.5, -122.4]]
+
+@pytest.mark.parametrize("kwargs", [
+    dict(d=0),
+    dict(d=1.0, shape="triangle"),
+    dict(d=1.0, sw_lat=47.6, ne_lat=47.5),
+    dict(d=1.0, sw_lng=-122.2, ne_lng=-122.3),
+])
+def test_invalid_arguments_raise(kwargs):
+    args = dict(sw_lat=47.5, sw_lng=-122.4, ne_lat=47.6, ne_lng=-122.3)
+    args.update(kwargs)
+    with pytest.raises(ValueError):
+        generate_lattice(**args)
+
+def test_dedupe_points_drops_points_across_a_cell_boundary():
+    tolerance = 0.25
+    cell_lat = tolerance * KM_PER_MILE / KM_PER_DEGREE_LAT
+    # a hair either side of the boundary between 2 tolerance sized cells
+    boundary = np.ceil(47.5 / cell_lat) * cell_lat
+    points = np.array([[boundary - cell_lat / 100, -122.3], [boundary + cell_lat / 100, -122.3]])
+
+    assert dedupe_points(points, tolerance).tolist() == points[:1].tolist()
+
+def test_dedupe_points_keeps_order_and_the_first_of_each_cluster():
+    points = np.array([
+        [47.50, -122.30],
+        [47.60, -122.30],
+        [47.50001, -122.30001],
+        [47.70, -122.30],
+        [47.60001, -122.30],
+    ])
+    assert dedupe_points(points, 0.1).tolist() == points[[0, 1, 3]].tolist()
+
+@pytest.mark.parametrize("shape", ["square", "hex"])
+def test_dedupe_points_leaves_a_regular_lattice_alone(shape):
+    points = generate_lattice(47.5, -122.4, 47.6, -122.25, 1.0, shape=shape)
+    assert len(dedupe_points(points, 0.25)) == len(points)
+
+def test_lattice_is_only_deduped_with_a_tolerance(monkeypatch):
+    calls = []
+    def record_dedupe(points, tolerance):
+        calls.append(tolerance)
+        return points
+    monkeypatch.setattr(lattice, "dedupe_points", record_dedupe)
+
+    generate_lattice(47.5, -122.4, 47.6, -122.25, 1.0)
+    assert calls == []
+    generate_lattice(47.5, -122.4, 47.6, -122.25, 1.0, tolerance=0.1)
+    assert calls == [0.1]
@@ -0,0 +1,129 @@
+import csv
+import io
+import uuid
+import pytest
+from sqlalchemy.dialects import postgresql
+from house_trend_discovery.data_gen.db_models import PremiseDetailsModel
+from house_trend_discovery.data_gen.dataset.load import (
+    NULL,
+    PREMISE_COLUMNS,
+    PREMISE_KEY,
+    UPSERT_PREMISES_SQL,
+    BulkLoader,
+    batched,
+    to_premise_row,
+)
+from house_trend_discovery.data_gen.models import County, LatLng, PremiseDetails
+
+COUNTY_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        if sql.startswith("SELECT id FROM county"):
+            self.result = [(str(COUNTY_ID),)]
+        elif sql.startswith("SELECT id, name, state FROM county"):
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def copy_expert(self, sql, f):
+        table = sql.split()[1]
+        self.connection.copied[table] = list(csv.reader(io.StringIO(f.read())))
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.copied = {}
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+def make_premise(year: int, dollar_value: int, parcel_number=None, **kwargs) -> PremiseDetails:
+    return PremiseDetails(
+        assessment_urls=["https://example.com/a", None],
+        premise_address="1 Main St",
+        year_assessed=year,
+        dollar_value=dollar_value,
+        county=County(name="King County", state="Washington"),
+        premise_location=LatLng(lat=47.6, lng=-122.3),
+        parcel_number=parcel_number,
+        **kwargs)
+
+def test_premise_key_is_the_unique_index():
+    index = next(i for i in PremiseDetailsModel.__table__.indexes if i.name == "ux_premise_details_premise_year")
+    dialect = postgresql.dialect()
+    # ON CONFLICT only infers the unique index when the expressions match it, expressions are parenthesized
+    columns = [
+        c.name if hasattr(c, "table") else f"({c.compile(dialect=dialect)})"
+        for c in index.expressions
+    ]
+
+    assert PREMISE_KEY == ", ".join(columns)
+    assert f"ON CONFLICT ({PREMISE_KEY})" in UPSERT_PREMISES_SQL
+
+def test_upsert_doesnt_update_the_key_or_id():
+    updates = UPSERT_PREMISES_SQL.split("DO UPDATE SET")[1]
+    for column in ("id", "county_id", "year_assessed"):
+        assert f" {column} = EXCLUDED" not in updates
+    for column in set(PREMISE_COLUMNS) - {"id", "county_id", "year_assessed"}:
+        assert f"{column} = EXCLUDED.{column}" in updates
+
+def test_premise_row_writes_missing_values_as_null():
+    premise_id = uuid.uuid4()
+    row = to_premise_row(premise_id, COUNTY_ID, make_premise(2024, 500000, sq_feet=1200))
+
+    assert len(row) == len(PREMISE_COLUMNS)
+    values = dict(zip(PREMISE_COLUMNS, row))
+    assert values["premise_location"] == "SRID=4326;POINT(-122.3 47.6)"
+    assert values["sq_feet"] == 1200
+    assert values["parcel_number"] == values["year_built"] == values["failure_reason"] == NULL
+
+def test_batch_stages_every_row_in_order():
+    connection = FakeConnection()
+    loader = BulkLoader()
+    batch = [make_premise(2024, 500000, "123"), make_premise(2024, 510000, "123"), make_premise(2023, 480000, "123")]
+    loader._load_batch(connection, batch)
+
+    # the county is looked up once for the batch
+    assert sum(sql.startswith("SELECT id FROM county") for sql in connection.executed) == 1
+    assert connection.commits == 1
+    assert UPSERT_PREMISES_SQL in connection.executed
+
+    staged = connection.copied["premise_staging"]
+    # seq orders duplicates of a premise and year, the upsert keeps the last
+    assert [(r[3], r[4], r[-1]) for r in staged] == [("2024", "500000", "0"), ("2024", "510000", "1"), ("2023", "480000", "2")]
+    assert {r[1] for r in staged} == {str(COUNTY_ID)}
+
+    # None urls are skipped and every url points at its staged premise
+    urls = connection.copied["assessment_url_staging"]
+    assert [u[1] for u in urls] == [r[0] for r in staged]
+    assert loader.rows_loaded == 3
+    assert loader.loaded_years == {("King County", "Washington"): {2023, 2024}}
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_batched(size):
+    batches = list(batched(range(5), size))
+    assert [i for b in batches for i in b] == list(range(5))
+    assert all(len(b) == size for b in batches[:-1])
@@ -0,0 +1,102 @@
+import os
+import posixpath
+from house_trend_discovery.data_gen.models import County, LatLng, PremiseRecord
+from house_trend_discovery.data_gen.parsers.archive import pack_session
+from house_trend_discovery.data_gen.parsers.manifest import ManifestStore
+from house_trend_discovery.data_gen.parsers.session_index import scan_archive, scan_session
+
+def home_files(files):
+    return sorted(list(files.pages.values()) + list(files.urls.values()) + ([files.inputs] if files.inputs else []))
+
+def make_record(parcel_number="0001"):
+    record = PremiseRecord(
+        assessment_urls=["https://example.com/a/1"],
+        premise_address="1 Main St",
+        parcel_number=parcel_number,
+        year_built=1990,
+        county=County(name="King", state="WA"),
+        premise_location=LatLng(lat=47.6, lng=-122.3))
+    record.add(2020, 100)
+    record.add(2021, 110)
+    return record
+
+def store_home(store, home_dir, files, records):
+    (manifest, home_key) = store.get(home_dir)
+    manifest.store(home_key, files, records)
+    store.save()
+
+def test_a_stored_home_is_fresh_in_a_later_run(session, tmp_path):
+    (data_dir, session_id) = session
+    home_dir = posixpath.join(data_dir, session_id, "home_a")
+    files = home_files(scan_session(posixpath.join(data_dir, session_id))["home_a"])
+    cache_dir = str(tmp_path / "cache")
+
+    (manifest, home_key) = ManifestStore(cache_dir, "kingcounty", "v1").get(home_dir)
+    assert home_key == "home_a"
+    assert not manifest.is_fresh(home_key, files)
+
+    store_home(ManifestStore(cache_dir, "kingcounty", "v1"), home_dir, files, [make_record()])
+
+    (manifest, home_key) = ManifestStore(cache_dir, "kingcounty", "v1").get(home_dir)
+    assert manifest.is_fresh(home_key, files)
+    [record] = manifest.load(home_key)
+    assert (record.parcel_number, list(record.assessments())) == ("0001", [(2020, 100), (2021, 110)])
+
+def test_a_touched_but_unchanged_page_is_still_fresh(session, tmp_path):
+    (data_dir, session_id) = session
+    home_dir = posixpath.join(data_dir, session_id, "home_a")
+    files = home_files(scan_session(posixpath.join(data_dir, session_id))["home_a"])
+    store = ManifestStore(str(tmp_path / "cache"), "kingcounty", "v1")
+    store_home(store, home_dir, files, [make_record()])
+
+    page = posixpath.join(home_dir, "page_1.html")
+    st = os.stat(page)
+    os.utime(page, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    (manifest, home_key) = store.get(home_dir)
+    assert manifest.is_fresh(home_key, files)
+
+def test_a_changed_page_misses(session, tmp_path):
+    (data_dir, session_id) = session
+    home_dir = posixpath.join(data_dir, session_id, "home_a")
+    files = home_files(scan_session(posixpath.join(data_dir, session_id))["home_a"])
+    store = ManifestStore(str(tmp_path / "cache"), "kingcounty", "v1")
+    store_home(store, home_dir, files, [make_record()])
+
+    with open(posixpath.join(home_dir, "page_1.html"), 'w') as f:
+        f.write("<html>a1 changed</html>")
+
+    (manifest, home_key) = store.get(home_dir)
+    assert not manifest.is_fresh(home_key, files)
+
+def test_a_new_page_misses(session, tmp_path):
+    (data_dir, session_id) = session
+    home_dir = posixpath.join(data_dir, session_id, "home_b")
+    files = home_files(scan_session(posixpath.join(data_dir, session_id))["home_b"])
+    store = ManifestStore(str(tmp_path / "cache"), "kingcounty", "v1")
+    store_home(store, home_dir, files, [])
+
+    (manifest, home_key) = store.get(home_dir)
+    assert not manifest.is_fresh(home_key, files + [posixpath.join(home_dir, "page_2.html")])
+
+def test_another_parser_version_reparses(session, tmp_path):
+    (data_dir, session_id) = session
+    home_dir = posixpath.join(data_dir, session_id, "home_a")
+    files = home_files(scan_session(posixpath.join(data_dir, session_id))["home_a"])
+    cache_dir = str(tmp_path / "cache")
+    store_home(ManifestStore(cache_dir, "kingcounty", "v1"), home_dir, files, [make_record()])
+
+    for (name, version) in [("kingcounty", "v2"), ("houseinfo", "v1")]:
+        (manifest, home_key) = ManifestStore(cache_dir, name, version).get(home_dir)
+        assert not manifest.is_fresh(home_key, files)
+
+def test_homes_of_a_packed_session_are_fresh(session, tmp_path):
+    (data_dir, session_id) = session
+    index = scan_archive(pack_session(data_dir, session_id, codec="zlib"))
+    home_dir = posixpath.dirname(index["home_a"].pages[1])
+    files = home_files(index["home_a"])
+    cache_dir = str(tmp_path / "cache")
+    store_home(ManifestStore(cache_dir, "kingcounty", "v1"), home_dir, files, [make_record()])
+
+    (manifest, home_key) = ManifestStore(cache_dir, "kingcounty", "v1").get(home_dir)
+    assert manifest.is_fresh(home_key, files)
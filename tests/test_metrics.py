@@ -0,0 +1,63 @@
+import json
+import pickle
+import pytest
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.parsers.houseinfo import Parser
+from house_trend_discovery.metrics import Metrics, NullMetrics, active
+
+def test_nothing_is_recorded_without_an_active_metrics():
+    assert isinstance(active(), NullMetrics)
+    with active().stage("html_parsing"):
+        active().incr("bytes_read", 10)
+    assert active().to_dict() == {"stage_seconds": {}, "counters": {}, "failure_reasons": {}}
+
+def test_activate_reports_to_the_innermost_metrics():
+    outer = Metrics()
+    inner = Metrics()
+    with outer.activate():
+        active().incr("pages")
+        with inner.activate():
+            active().incr("pages", 2)
+            active().failure("KeyError")
+        active().incr("pages")
+
+    assert outer.counters == {"pages": 2}
+    assert inner.counters == {"pages": 2}
+    assert inner.failure_reasons == {"KeyError": 1}
+    assert isinstance(active(), NullMetrics)
+
+def test_merge_sums_worker_metrics():
+    worker = Metrics()
+    worker.add_seconds("parse_home", 1.5)
+    worker.incr("records", 3)
+    worker.failure("KeyError")
+    parent = Metrics()
+    parent.add_seconds("parse_home", 0.5)
+    parent.incr("records")
+
+    parent.merge(worker.to_dict())
+    parent.merge(pickle.loads(pickle.dumps(worker)).to_dict())
+    assert parent.to_dict() == {
+        "stage_seconds": {"parse_home": 3.5},
+        "counters": {"records": 7},
+        "failure_reasons": {"KeyError": 2},
+    }
+    assert "KeyError" in parent.summary()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parser_run_counts_homes_pages_and_records(tmp_path, workers):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 6, padding=0)
+
+    parser = Parser(scraper_name="houseinfo", data_base_path=data_dir, workers=workers).run()
+    counters = parser.metrics.counters
+    assert counters["homes_parsed"] == 6
+    assert counters["pages"] == 12
+    assert counters["records"] == 30
+    assert counters["bytes_read"] > 0
+    assert {"run", "parse_home", "html_parsing", "read_files"} <= set(parser.metrics.stage_seconds)
+
+    path = str(tmp_path / "metrics.json")
+    parser.metrics.save(path)
+    with open(path, 'r') as f:
+        assert json.load(f) == parser.metrics.to_dict()
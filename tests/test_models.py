@@ -0,0 +1,43 @@
+import json
+import pickle
+from house_trend_discovery.data_gen.models import County, LatLng, PremiseRecord, to_records
+
+def make_record(parcel_number, assessments, address="1 Main St"):
+    record = PremiseRecord(
+        assessment_urls=["https://example.com/1", None],
+        premise_address=address,
+        parcel_number=parcel_number,
+        year_built=1990,
+        bath_count=1.5,
+        county=County(name="King", state="WA"),
+        premise_location={"lat": 47.6, "lng": -122.3})
+    for (year_assessed, dollar_value) in assessments:
+        record.add(year_assessed, dollar_value)
+    return record
+
+def test_record_pickles_with_its_history():
+    record = make_record("0001", [(2020, 100), (2021, 110)])
+    copy = pickle.loads(pickle.dumps(record))
+
+    assert list(copy.assessments()) == [(2020, 100), (2021, 110)]
+    assert copy.to_dicts() == record.to_dicts()
+    assert copy.premise_location == LatLng(lat=47.6, lng=-122.3)
+
+def test_record_round_trips_through_json():
+    record = make_record(None, [(2019, 5_000_000_000)])
+    copy = PremiseRecord.from_dict(json.loads(record.dump_json()))
+    assert copy.to_dicts() == record.to_dicts()
+
+def test_record_matches_premise_details():
+    record = make_record("0001", [(2020, 100), (2021, 110)])
+    details = record.to_premise_details()
+
+    assert [d.model_dump() for d in details] == record.to_dicts()
+    [back] = to_records(details)
+    assert back.to_dicts() == record.to_dicts()
+
+def test_with_assessments_shares_the_premise():
+    record = make_record("0001", [(2020, 100), (2021, 110)])
+    copy = record.with_assessments([(2021, 110)])
+    assert (len(record), len(copy)) == (2, 1)
+    assert copy.county is record.county
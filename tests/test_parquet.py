@@ -0,0 +1,72 @@
+import os
+import pytest
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.dataset.dataset import iter_parser_records
+from house_trend_discovery.data_gen.dataset.parquet import iter_record_batches, get_schema, read_parquet, write_parquet
+from house_trend_discovery.data_gen.models import iter_dicts
+
+pytest.importorskip("pyarrow")
+
+def parquet_row(d: dict) -> tuple:
+    return (
+        d["premise_address"],
+        d["parcel_number"],
+        d["year_assessed"],
+        d["dollar_value"],
+        d["county"]["state"],
+        d["county"]["name"],
+        float(d["premise_location"]["lat"]),
+        float(d["premise_location"]["lng"]),
+        d["sq_feet"],
+        d["year_built"],
+        d["assessment_urls"],
+    )
+
+def read_rows(out_dir: str) -> list:
+    table = read_parquet(out_dir).to_pydict()
+    return [
+        (
+            table["premise_address"][i],
+            table["parcel_number"][i],
+            table["year_assessed"][i],
+            table["dollar_value"][i],
+            table["county_state"][i],
+            table["county_name"][i],
+            table["lat"][i],
+            table["lng"][i],
+            table["sq_feet"][i],
+            table["year_built"][i],
+            table["assessment_urls"][i],
+        )
+        for i in range(len(table["dollar_value"]))
+    ]
+
+@pytest.mark.parametrize("scraper_name", ["kingcounty", "houseinfo"])
+def test_parquet_has_the_json_rows(tmp_path, scraper_name):
+    data_dir = str(tmp_path / "data")
+    out_dir = str(tmp_path / "out")
+    write_session(data_dir, scraper_name, 5, padding=0)
+    records = list(iter_parser_records(scraper_name, data_dir))
+
+    count = write_parquet(iter(records), out_dir, batch_size=7)
+    expected = sorted(parquet_row(d) for d in iter_dicts(records))
+    assert count == len(expected) > 0
+    assert sorted(read_rows(out_dir)) == expected
+
+def test_partitioned_by_county_and_year(tmp_path):
+    data_dir = str(tmp_path / "data")
+    out_dir = str(tmp_path / "out")
+    write_session(data_dir, "houseinfo", 2, padding=0)
+
+    write_parquet(iter_parser_records("houseinfo", data_dir), out_dir)
+    county_dir = os.path.join(out_dir, "county_state=Washington", "county_name=King%20County")
+    assert sorted(os.listdir(county_dir)) == [f"year_assessed={y}" for y in range(2020, 2025)]
+
+def test_batches_dont_split_a_premise(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 5, padding=0)
+    records = list(iter_parser_records("houseinfo", data_dir))
+
+    # each premise has 5 years, a batch closes once it reaches 7 rows
+    batches = list(iter_record_batches(records, 7, get_schema()))
+    assert [b.num_rows for b in batches] == [10, 10, 5]
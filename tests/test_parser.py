@@ -0,0 +1,151 @@
+import json
+import os
+import pytest
+from house_trend_discovery.data_gen.models import County, PremiseRecord
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.parsers import houseinfo
+from house_trend_discovery.data_gen.parsers.parser import (
+    Parser, ScraperName, dedupe_records, get_scraper_name, parse_home_safely
+)
+from house_trend_discovery.data_gen.parsers.utils import get_file
+
+class FakeParser(Parser):
+    """
+    Reads pages holding 1 assessment as json, {"parcel": ..., "year": ..., "value": ...}
+    """
+    name = ScraperName("fake")
+
+    def parse_home(self, home_results):
+        record = None
+        for (_, _, page_path, _) in home_results:
+            page = json.loads(get_file(page_path))
+            if record is None:
+                record = make_record(page["parcel"], [], address=page.get("address", "1 Main St"))
+            record.add(page["year"], page["value"])
+        return [record] if record is not None else []
+
+def write_fake_home(data_dir, session_id, key, pages):
+    home_dir = os.path.join(data_dir, session_id, key)
+    os.makedirs(os.path.join(home_dir, "urls"))
+    for (n, page) in enumerate(pages, start=1):
+        with open(os.path.join(home_dir, f"page_{n}.html"), 'w') as f:
+            f.write(page if isinstance(page, str) else json.dumps(page))
+        with open(os.path.join(home_dir, "urls", f"url_{n}.txt"), 'w') as f:
+            f.write(f"https://example.com/{key}/{n}")
+
+def parsed(parser):
+    return [(r.parcel_number, r.premise_address, list(r.assessments())) for r in parser.run().get_records()]
+
+def make_record(parcel_number, assessments, address="1 Main St"):
+    record = PremiseRecord(
+        assessment_urls=["https://example.com/1"],
+        premise_address=address,
+        parcel_number=parcel_number,
+        county=County(name="King", state="WA"),
+        premise_location={"lat": 47.6, "lng": -122.3})
+    for (year_assessed, dollar_value) in assessments:
+        record.add(year_assessed, dollar_value)
+    return record
+
+def test_dedupe_records_drops_years_already_seen():
+    homes = [
+        [make_record("0001", [(2020, 100), (2021, 110)])],
+        # the same parcel reached from another address, 2022 is new
+        [make_record("0001", [(2021, 110), (2022, 120)], address="1 Main Street")],
+        [make_record("0001", [(2020, 100)]), make_record("0002", [(2020, 50)])],
+    ]
+    deduped = list(dedupe_records(homes))
+
+    assert [[(r.parcel_number, list(r.assessments())) for r in records] for records in deduped] == [
+        [("0001", [(2020, 100), (2021, 110)])],
+        [("0001", [(2022, 120)])],
+        [("0002", [(2020, 50)])],
+    ]
+    assert deduped[1][0].premise_address == "1 Main Street"
+
+def test_dedupe_records_keeps_records_without_a_parcel_number():
+    homes = [[make_record(None, [(2020, 100)])], [make_record(None, [(2020, 100)])]]
+    assert [len(records) for records in dedupe_records(homes)] == [1, 1]
+
+def test_latest_session_is_picked_by_timestamp(tmp_path):
+    data_dir = str(tmp_path)
+    write_fake_home(data_dir, "fake-900", "home_a", [{"parcel": "0001", "year": 2020, "value": 1}])
+    write_fake_home(data_dir, "fake-2000", "home_a", [{"parcel": "0001", "year": 2020, "value": 2}])
+
+    assert parsed(FakeParser(scraper_name="fake", data_base_path=data_dir)) == [("0001", "1 Main St", [(2020, 2)])]
+
+def test_merge_parses_every_session_and_the_newest_copy_of_a_home(tmp_path):
+    data_dir = str(tmp_path)
+    write_fake_home(data_dir, "fake-900", "home_a", [{"parcel": "0001", "year": 2020, "value": 1}])
+    write_fake_home(data_dir, "fake-900", "home_b", [
+        {"parcel": "0002", "year": 2019, "value": 5},
+        {"parcel": "0002", "year": 2020, "value": 6},
+    ])
+    write_fake_home(data_dir, "fake-2000", "home_a", [{"parcel": "0001", "year": 2020, "value": 2}])
+    # the same parcel crawled again under another address, only its new year is kept
+    write_fake_home(data_dir, "fake-2000", "home_c", [
+        {"parcel": "0002", "year": 2020, "value": 7, "address": "2 Main St"},
+        {"parcel": "0002", "year": 2021, "value": 8, "address": "2 Main St"},
+    ])
+
+    parser = FakeParser(scraper_name="fake", data_base_path=data_dir, merge_sessions=True)
+    assert parsed(parser) == [
+        ("0001", "1 Main St", [(2020, 2)]),
+        ("0002", "2 Main St", [(2020, 7), (2021, 8)]),
+        ("0002", "1 Main St", [(2019, 5)]),
+    ]
+
+def test_merge_only_the_sessions_asked_for(tmp_path):
+    data_dir = str(tmp_path)
+    write_fake_home(data_dir, "fake-900", "home_a", [{"parcel": "0001", "year": 2020, "value": 1}])
+    write_fake_home(data_dir, "fake-2000", "home_a", [{"parcel": "0001", "year": 2020, "value": 2}])
+
+    parser = FakeParser(scraper_name="fake", data_base_path=data_dir, merge_sessions=True, session_ids=["fake-900"])
+    assert parsed(parser) == [("0001", "1 Main St", [(2020, 1)])]
+
+def test_scraper_name_is_read_from_the_session_dir():
+    assert get_scraper_name("/tmp/pytest-of-root/data/kingcounty-1700000000000") == "kingcounty"
+
+def write_fake_session(data_dir, homes, broken=()):
+    for i in range(homes):
+        page = "not json" if i in broken else {"parcel": f"{i:04}", "year": 2020, "value": i}
+        write_fake_home(data_dir, "fake-1000", f"home_{i:03}", [page])
+
+def test_parse_home_safely_reports_a_failed_home():
+    parser = FakeParser()
+    (records, failure) = parse_home_safely(parser, [(1, "/data/fake-1000/home_a/urls/url_1.txt", "/missing/home_a/page_1.html", None)])
+    assert records == []
+    assert failure.home == "/missing/home_a"
+    assert failure.reason.startswith("FileNotFoundError")
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_a_failed_home_doesnt_stop_the_others(tmp_path, workers):
+    data_dir = str(tmp_path)
+    write_fake_session(data_dir, 10, broken={3, 7})
+
+    parser = FakeParser(scraper_name="fake", data_base_path=data_dir, workers=workers).run()
+    assert [r.parcel_number for r in parser.get_records()] == [f"{i:04}" for i in range(10) if i not in {3, 7}]
+    assert sorted(os.path.basename(f.home) for f in parser.get_failures()) == ["home_003", "home_007"]
+    assert all(f.reason.startswith("JSONDecodeError") for f in parser.get_failures())
+
+def test_pool_output_matches_parsing_in_process(tmp_path):
+    data_dir = str(tmp_path)
+    write_session(data_dir, "houseinfo", 40, padding=0)
+
+    outputs = [
+        houseinfo.Parser(scraper_name="houseinfo", data_base_path=data_dir, workers=workers).run().to_json()
+        for workers in (1, 2, 4)]
+    assert len(json.loads(outputs[0])) == 200
+    assert outputs[1] == outputs[0] and outputs[2] == outputs[0]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streamed_records_match_collected_ones(tmp_path, workers):
+    data_dir = str(tmp_path)
+    write_fake_session(data_dir, 25, broken={4})
+
+    collected = FakeParser(scraper_name="fake", data_base_path=data_dir, workers=workers).run()
+    streaming = FakeParser(scraper_name="fake", data_base_path=data_dir, workers=workers)
+    streamed = list(streaming.iter_records())
+
+    assert [r.to_dicts() for r in streamed] == [r.to_dicts() for r in collected.get_records()]
+    assert streaming.get_failures() == collected.get_failures()
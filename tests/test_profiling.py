@@ -0,0 +1,57 @@
+import json
+import os
+import pstats
+import pytest
+from click.testing import CliRunner
+from benchmarks.synthetic import write_session
+from house_trend_discovery.data_gen.dataset.dataset import cli
+from house_trend_discovery.profiling import maybe_profiled, profiled
+
+def work() -> int:
+    return sum(i * i for i in range(1000))
+
+def test_nothing_is_saved_without_a_path(tmp_path):
+    with maybe_profiled(None):
+        work()
+    assert os.listdir(tmp_path) == []
+
+def test_cprofile_saves_the_profile_and_report(tmp_path):
+    out_path = str(tmp_path / "run.prof")
+    with maybe_profiled(out_path, top=5):
+        work()
+
+    assert any(f[2] == "work" for f in pstats.Stats(out_path).stats)
+    with open(f"{out_path}.txt", 'r') as f:
+        report = f.read()
+    assert "top 5 by cumulative time" in report and "top 5 by own time" in report
+
+def test_unknown_profiler_is_rejected(tmp_path):
+    with pytest.raises(Exception, match="Unknown profiler"):
+        with profiled(str(tmp_path / "run.prof"), profiler="yappi"):
+            work()
+
+def test_profiling_a_sample_of_a_session(tmp_path):
+    data_dir = str(tmp_path / "data")
+    write_session(data_dir, "houseinfo", 5, padding=0)
+    out = str(tmp_path / "out.json")
+    profile = str(tmp_path / "run.prof")
+    metrics_out = str(tmp_path / "metrics.json")
+
+    result = CliRunner().invoke(cli, [
+        "--scraper_name", "houseinfo",
+        "--data", data_dir,
+        "--out", out,
+        "--workers", "2",
+        "--max_homes", "2",
+        "--profile", profile,
+        "--metrics_out", metrics_out,
+    ])
+    assert result.exit_code == 0, result.output
+
+    with open(out, 'r') as f:
+        assert len(json.load(f)) == 10
+    with open(metrics_out, 'r') as f:
+        assert json.load(f)["counters"]["homes_parsed"] == 2
+    # parsed in process, so the parser's own functions show up in the profile
+    assert any(f[2] == "parse_home" for f in pstats.Stats(profile).stats)
+    assert os.path.exists(f"{profile}.txt")
@@ -0,0 +1,88 @@
+import importlib.metadata
+import json
+import sys
+from types import SimpleNamespace
+import pytest
+from house_trend_discovery.data_gen.parsers import registry
+from house_trend_discovery.data_gen.parsers.kingcounty import Parser as KingcountyParser
+from house_trend_discovery.data_gen.parsers.registry import (
+    ParserInfo,
+    builtin_parsers,
+    find_parser,
+    find_parser_classes,
+    list_parsers,
+    load_parser_class,
+)
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    eps = []
+    def fake_entry_points(group):
+        assert group == registry.ENTRY_POINT_GROUP
+        return eps
+    monkeypatch.setattr(importlib.metadata, "entry_points", fake_entry_points)
+    return eps
+
+def make_entry_point(name: str, value: str):
+    return SimpleNamespace(name=name, value=value, dist=SimpleNamespace(name="my-parsers"))
+
+def test_finds_parser_classes_without_importing():
+    source = '''
+class Parser(BaseParser):
+    name = ScraperName("zillow")
+
+class Other:
+    name = "redfin"
+
+class NotAParser:
+    name = get_name()
+'''
+    assert find_parser_classes(source) == {"zillow": "Parser", "redfin": "Other"}
+
+def test_builtin_parsers():
+    parsers = dict((p.name, p) for p in builtin_parsers())
+    assert parsers["kingcounty"] == ParserInfo(
+        "kingcounty", "house_trend_discovery.data_gen.parsers.kingcounty:Parser", "builtin")
+    assert parsers["houseinfo"].target == "house_trend_discovery.data_gen.parsers.houseinfo:Parser"
+
+def test_unchanged_modules_are_read_from_the_index(tmp_path):
+    index_path = str(tmp_path / "index.json")
+    builtin_parsers(index_path)
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+
+    # a cached entry is trusted while the module's mtime and size match
+    index["modules"]["kingcounty"][2] = {"cached": "Parser"}
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    assert "cached" in [p.name for p in builtin_parsers(index_path)]
+
+    index["modules"]["kingcounty"][1] += 1
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    names = [p.name for p in builtin_parsers(index_path)]
+    assert "cached" not in names and "kingcounty" in names
+
+def test_entry_point_parsers_are_listed_and_loaded(tmp_path, monkeypatch, entry_points):
+    (tmp_path / "zillow_parsers.py").write_text('class ZillowParser:\n    name = "zillow"\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "zillow_parsers", raising=False)
+    entry_points.append(make_entry_point("zillow", "zillow_parsers:ZillowParser"))
+    entry_points.append(make_entry_point("kingcounty", "zillow_parsers:ZillowParser"))
+
+    parsers = dict((p.name, p) for p in list_parsers())
+    assert parsers["zillow"] == ParserInfo("zillow", "zillow_parsers:ZillowParser", "my-parsers")
+    # builtin parsers win over entry points with the same name
+    assert parsers["kingcounty"].source == "builtin"
+
+    assert load_parser_class("zillow").__qualname__ == "ZillowParser"
+    assert load_parser_class("kingcounty") is KingcountyParser
+
+def test_unknown_parser(entry_points):
+    with pytest.raises(Exception, match="No parser for scraper redfin, known parsers are .*kingcounty"):
+        find_parser("redfin")
@@ -0,0 +1,46 @@
+import os
+from house_trend_discovery.data_gen.parsers.archive import pack_session
+from house_trend_discovery.data_gen.parsers.session_index import list_sessions, load_session_index, scan_session
+
+def test_scan_finds_pages_urls_and_inputs(session):
+    (data_dir, session_id) = session
+    index = scan_session(os.path.join(data_dir, session_id))
+
+    assert sorted(index) == ["home_a", "home_b"]
+    assert sorted(index["home_a"].pages) == [1, 2]
+    assert sorted(index["home_a"].urls) == [1, 2]
+    assert index["home_a"].pages[2] == os.path.join(data_dir, session_id, "home_a", "page_2.html")
+    assert index["home_a"].inputs.endswith("home_a/inputs/inputs.json")
+    assert index["home_b"].inputs is None
+
+def test_scan_skips_hidden_entries_and_other_files(session):
+    (data_dir, session_id) = session
+    session_dir = os.path.join(data_dir, session_id)
+    os.makedirs(os.path.join(session_dir, ".parse_cache"))
+    with open(os.path.join(session_dir, "home_a", "screenshot_1.png"), 'wb') as f:
+        f.write(b"png")
+
+    index = scan_session(session_dir)
+    assert sorted(index) == ["home_a", "home_b"]
+    assert sorted(index["home_a"].pages) == [1, 2]
+
+def test_a_packed_session_is_indexed_like_its_dir(session):
+    (data_dir, session_id) = session
+    session_dir = os.path.join(data_dir, session_id)
+    scanned = load_session_index(data_dir, session_id)
+    archive_path = pack_session(data_dir, session_id, codec="zlib")
+    os.rename(session_dir, os.path.join(data_dir, ".unpacked"))
+
+    packed = load_session_index(data_dir, session_id)
+    assert packed == dict([(key, files._replace(
+        pages=dict([(n, p.replace(session_dir, archive_path)) for (n, p) in files.pages.items()]),
+        urls=dict([(n, p.replace(session_dir, archive_path)) for (n, p) in files.urls.items()]),
+        inputs=files.inputs.replace(session_dir, archive_path) if files.inputs else None,
+    )) for (key, files) in scanned.items()])
+
+def test_list_sessions_finds_dirs_and_archives(session):
+    (data_dir, session_id) = session
+    pack_session(data_dir, session_id, codec="zlib")
+    os.makedirs(os.path.join(data_dir, "houseinfo-1700000000001"))
+
+    assert list_sessions(data_dir) == [session_id, "houseinfo-1700000000001"]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from house_trend_discovery.data_gen.trends import frame_from_records, parcel_cagr, price_index, yoy_changes
+
+def record(parcel_number, year_assessed, dollar_value, lat=47.6, lng=-122.3, address=None):
+    return {
+        "parcel_number": parcel_number,
+        "premise_address": address or f"{parcel_number} Main St",
+        "year_assessed": year_assessed,
+        "dollar_value": dollar_value,
+        "premise_location": {"lat": lat, "lng": lng},
+        "county": {"name": "King", "state": "WA"},
+    }
+
+def test_frame_sorts_by_parcel_and_year_and_keeps_the_last_duplicate():
+    df = frame_from_records([record("b", 2021, 5), record("a", 2021, 2), record("a", 2020, 1), record("a", 2021, 3)])
+    assert list(zip(df["parcel"], df["year_assessed"], df["dollar_value"])) == \
+        [("a", 2020, 1.0), ("a", 2021, 3.0), ("b", 2021, 5.0)]
+
+def test_frame_falls_back_to_the_address_without_a_parcel_number():
+    df = frame_from_records([record(None, 2020, 1, address="9 Pine St"), record(None, 2021, 2, address="9 PINE ST")])
+    assert list(df["parcel"]) == ["9 pine st", "9 pine st"]
+
+def test_yoy_annualizes_gaps_and_starts_each_parcel_at_nan():
+    df = yoy_changes(frame_from_records([
+        record("a", 2018, 100),
+        record("a", 2019, 110),
+        record("a", 2021, 133.1),
+        record("b", 2020, 50),
+        record("b", 2021, 40),
+    ]))
+
+    assert df["years_since_previous"].tolist()[1:3] == [1.0, 2.0]
+    assert np.isnan(df["years_since_previous"][0]) and np.isnan(df["years_since_previous"][3])
+    assert df["yoy"].tolist()[1:3] == pytest.approx([0.1, 0.1])
+    assert df["yoy"][4] == pytest.approx(-0.2)
+    assert np.isnan(df["yoy"][0]) and np.isnan(df["yoy"][3])
+
+def test_yoy_is_nan_after_a_zero_value():
+    df = yoy_changes(frame_from_records([record("a", 2020, 0), record("a", 2021, 100)]))
+    assert np.isnan(df["yoy"]).all()
+
+def test_parcel_cagr():
+    cagr = parcel_cagr(frame_from_records([
+        record("a", 2010, 100),
+        record("a", 2015, 150),
+        record("a", 2020, 200),
+        record("b", 2020, 50),
+    ]))
+
+    a = cagr[cagr["parcel"] == "a"].iloc[0]
+    assert (a["first_year"], a["last_year"], a["first_value"], a["last_value"], a["years_assessed"]) == \
+        (2010, 2020, 100.0, 200.0, 3)
+    assert a["cagr"] == pytest.approx(2 ** (1 / 10) - 1)
+    # assessed once, no growth to measure
+    assert np.isnan(cagr[cagr["parcel"] == "b"].iloc[0]["cagr"])
+
+def test_parcel_cagr_of_an_empty_frame():
+    df = frame_from_records([record("a", 2020, 1)]).iloc[0:0]
+    assert len(parcel_cagr(df)) == 0
+
+def test_price_index_is_100_in_each_cells_first_year():
+    index = price_index(frame_from_records([
+        record("a", 2020, 100),
+        record("b", 2020, 300),
+        record("a", 2021, 150),
+        record("b", 2021, 250),
+        # miles away, its own cell
+        record("c", 2021, 80, lat=47.7),
+        record("c", 2022, 120, lat=47.7),
+    ]), cell_miles=0.5)
+
+    assert len(index.groupby(["cell_row", "cell_col"])) == 2
+    near = index[index["count"] == 2].sort_values("year_assessed")
+    assert near["median"].tolist() == [200.0, 200.0]
+    assert near["index"].tolist() == [100.0, 100.0]
+
+    far = index[index["cell_row"] == index["cell_row"].max()].sort_values("year_assessed")
+    assert far["year_assessed"].tolist() == [2021, 2022]
+    assert far["index"].tolist() == pytest.approx([100.0, 150.0])